@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+# mede o tempo de boot (spawn até o primeiro 200 em GET /) e o tempo de
+# shutdown do fastapi_course.serve para diferentes números de workers, com e
+# sem preload. Com --poetry também mede o mesmo boot através de `poetry run`
+# para comparar com o CMD antigo da imagem.
+#
+#   python -m benchmarks.cold_start --workers 1 2 4 --runs 5
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url).status_code == httpx.codes.OK:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def measure(prefix: list[str], workers: int, preload: bool):
+    port = free_port()
+    command = [
+        *prefix,
+        '-m',
+        'fastapi_course.serve',
+        '--host',
+        '127.0.0.1',
+        '--port',
+        str(port),
+        '--workers',
+        str(workers),
+        '--preload' if preload else '--no-preload',
+    ]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(f'http://127.0.0.1:{port}/', timeout=60)
+        ready = time.perf_counter() - start
+    finally:
+        start = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+        stopped = time.perf_counter() - start
+
+    return ready, stopped
+
+
+def summarize_runs(samples):
+    ready = sorted(r for r, _ in samples)
+    stopped = sorted(s for _, s in samples)
+    return {
+        'runs': len(samples),
+        'ready_ms_min': round(ready[0] * 1000, 1),
+        'ready_ms_median': round(ready[len(ready) // 2] * 1000, 1),
+        'shutdown_ms_median': round(stopped[len(stopped) // 2] * 1000, 1),
+    }
+
+
+def main(args):
+    launchers = {'python': [sys.executable]}
+    if args.poetry:
+        poetry = shutil.which('poetry')
+        if poetry is None:
+            sys.exit('poetry not found on PATH')
+        launchers['poetry run'] = [poetry, 'run', 'python']
+
+    results = {}
+    for name, prefix in launchers.items():
+        for workers in args.workers:
+            for preload in (True, False):
+                samples = [
+                    measure(prefix, workers, preload) for _ in range(args.runs)
+                ]
+                key = f'{name} workers={workers} preload={preload}'
+                results[key] = summarize_runs(samples)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1]
+    )
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--poetry', action='store_true')
+    main(parser.parse_args())
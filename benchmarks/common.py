@@ -0,0 +1,78 @@
+import statistics
+from contextlib import asynccontextmanager
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from testcontainers.postgres import PostgresContainer
+
+from fastapi_course.app import app
+from fastapi_course.cache import response_cache
+from fastapi_course.database import get_read_session, get_session
+from fastapi_course.models import table_registry
+from fastapi_course.throttling import login_throttle
+
+# utilitários compartilhados pelos benchmarks: sobem um postgres descartável
+# (o mesmo testcontainer dos testes), criam as tabelas e expõem a aplicação
+# através de um cliente ASGI em processo
+
+
+@asynccontextmanager
+async def benchmark_app(
+    response_cache_entries: int = 0, login_throttling: bool = False
+):
+    with PostgresContainer('postgres:18', driver='psycopg') as postgres:
+        engine = create_async_engine(postgres.get_connection_url())
+
+        async with engine.begin() as conn:
+            await conn.run_sync(table_registry.metadata.create_all)
+
+        # diferente dos testes, cada requisição ganha a sua própria sessão,
+        # como acontece em produção
+        async def get_session_override():
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                yield session
+
+        # leituras e escritas vão para o mesmo banco descartável
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+
+        # os benchmarks repetem as mesmas requisições: com o cache de
+        # respostas ligado eles mediriam só hits. Desligado por padrão
+        max_entries = response_cache.max_entries
+        response_cache.max_entries = response_cache_entries
+        response_cache.clear()
+
+        # todos os clientes do benchmark vêm do mesmo "IP" e repetem logins:
+        # com o limite de tentativas ligado eles mediriam só os 429
+        throttling_enabled = login_throttle.enabled
+        login_throttle.enabled = login_throttling
+        login_throttle.clear()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url='http://benchmark'
+        ) as client:
+            yield client, engine
+
+        app.dependency_overrides.clear()
+        response_cache.max_entries = max_entries
+        login_throttle.enabled = throttling_enabled
+        await engine.dispose()
+
+
+def summarize(samples: list[float]):
+    # amostras em segundos, resumo em milissegundos
+    ordered = sorted(samples)
+
+    def percentile(p):
+        index = min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
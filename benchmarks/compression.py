@@ -0,0 +1,113 @@
+import argparse
+import json
+import random
+import time
+from datetime import UTC, datetime
+
+from fastapi_course.compression import (
+    ENCODINGS,
+    BrotliCompressor,
+    GzipCompressor,
+    ZstdCompressor,
+)
+from fastapi_course.models import TodoState
+from fastapi_course.serializers import todo_list_json
+
+# custo de CPU x bytes economizados em vários níveis, sobre uma página de
+# TodoList com descrições longas. Para cada nível mostra o tempo de
+# compressão, a razão e o tempo estimado (compressão + transferência) num
+# link de --mbps. "streaming" comprime em pedaços de --chunk-kb com flush,
+# como na exportação
+#
+#   python -m benchmarks.compression --todos 1000 --mbps 20
+
+LEVELS = {
+    'gzip': (GzipCompressor, [1, 3, 6, 9]),
+    'br': (BrotliCompressor, [1, 4, 8, 11]),
+    'zstd': (ZstdCompressor, [1, 3, 9, 19]),
+}
+VOCABULARY = [f'word{i}' for i in range(2000)]
+ROUNDS = 20
+
+
+def make_body(todos: int):
+    rng = random.Random(42)
+    now = datetime.now(UTC)
+    return todo_list_json([
+        (
+            ' '.join(rng.choices(VOCABULARY, k=4)),
+            ' '.join(rng.choices(VOCABULARY, k=60)),
+            rng.choice(list(TodoState)),
+            i,
+            now,
+            now,
+        )
+        for i in range(todos)
+    ])
+
+
+def compress(compressor_class, level: int, body: bytes, chunk_size: int):
+    compressor = compressor_class(level)
+    if not chunk_size:
+        return compressor.compress(body) + compressor.finish()
+
+    parts = [
+        compressor.compress(body[i : i + chunk_size], flush=True)
+        for i in range(0, len(body), chunk_size)
+    ]
+    return b''.join(parts) + compressor.finish()
+
+
+def measure(compressor_class, level: int, body: bytes, chunk_size: int):
+    compressed = compress(compressor_class, level, body, chunk_size)
+
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        compress(compressor_class, level, body, chunk_size)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    return timings[len(timings) // 2], len(compressed)
+
+
+def main(args):
+    body = make_body(args.todos)
+    bytes_per_second = args.mbps * 1_000_000 / 8
+    chunk_size = args.chunk_kb * 1024
+
+    results = {
+        'body_bytes': len(body),
+        'identity_transfer_ms': round(len(body) / bytes_per_second * 1000, 2),
+        'levels': [],
+    }
+
+    for encoding, (compressor_class, levels) in LEVELS.items():
+        if encoding not in ENCODINGS:
+            continue
+
+        for level in levels:
+            for mode, size in (('buffered', 0), ('streaming', chunk_size)):
+                seconds, compressed = measure(
+                    compressor_class, level, body, size
+                )
+                transfer = compressed / bytes_per_second
+                results['levels'].append({
+                    'encoding': encoding,
+                    'level': level,
+                    'mode': mode,
+                    'compress_ms': round(seconds * 1000, 2),
+                    'bytes': compressed,
+                    'ratio': round(len(body) / compressed, 2),
+                    'total_ms': round((seconds + transfer) * 1000, 2),
+                })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--todos', type=int, default=1000)
+    parser.add_argument('--mbps', type=float, default=20)
+    parser.add_argument('--chunk-kb', type=int, default=64)
+    main(parser.parse_args())
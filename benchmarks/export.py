@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from http import HTTPStatus
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi_course.app import app
+from fastapi_course.models import User
+from fastapi_course.security import create_access_token, get_password_hash
+
+from .common import benchmark_app
+
+# exporta todas as tarefas de um usuário com muitas linhas e acompanha o
+# pico de RSS do processo durante o streaming. O corpo é consumido direto
+# pela interface ASGI e descartado a cada pedaço (o cliente httpx em
+# processo acumularia a resposta inteira e mediria a si mesmo)
+#
+#   python -m benchmarks.export --todos 1000000 --max-rss-mb 64
+
+STATM = Path('/proc/self/statm')
+PAGE_SIZE = 4096
+
+
+def rss_bytes():
+    return int(STATM.read_text(encoding='ascii').split()[1]) * PAGE_SIZE
+
+
+class PeakRSS:
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.baseline = rss_bytes()
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def _watch(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+    @property
+    def growth_mb(self):
+        return round((self.peak - self.baseline) / 1024 / 1024, 1)
+
+
+async def seed(engine, todos: int):
+    async with AsyncSession(engine) as session:
+        user = User(
+            username='bench',
+            email='bench@bench.com',
+            password=get_password_hash('Bench@123'),
+        )
+        session.add(user)
+        await session.flush()
+
+        # gerado no próprio banco: o processo do benchmark não segura as
+        # linhas antes de medir
+        await session.execute(
+            text(
+                'INSERT INTO todos (title, description, state, user_id) '
+                "SELECT 'todo ' || i, 'exported todo ' || i, 'todo', :user_id "
+                'FROM generate_series(1, :todos) AS i'
+            ),
+            {'user_id': user.id, 'todos': todos},
+        )
+        await session.commit()
+
+
+async def export(token: str, export_format: str):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': '/todos/export',
+        'raw_path': b'/todos/export',
+        'root_path': '',
+        'query_string': f'format={export_format}'.encode(),
+        'headers': [(b'authorization', f'Bearer {token}'.encode())],
+        'client': ('benchmark', 0),
+        'server': ('benchmark', 80),
+    }
+    stats = {'status': None, 'bytes': 0, 'lines': 0, 'chunks': 0}
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        # o corpo da requisição vem uma vez; depois disso o StreamingResponse
+        # fica esperando um disconnect, que só chega quando a resposta acaba
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            stats['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            body = message.get('body', b'')
+            stats['bytes'] += len(body)
+            stats['lines'] += body.count(b'\n')
+            stats['chunks'] += 1
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+
+    return stats
+
+
+async def main(args):
+    if not STATM.exists():
+        sys.exit('this benchmark reads RSS from /proc (Linux only)')
+
+    results = {}
+
+    async with benchmark_app() as (_, engine):
+        start = time.perf_counter()
+        await seed(engine, args.todos)
+        results['seed_seconds'] = round(time.perf_counter() - start, 1)
+
+        token = create_access_token({'sub': 'bench'})
+
+        for export_format in ('ndjson', 'csv'):
+            start = time.perf_counter()
+            with PeakRSS() as rss:
+                stats = await export(token, export_format)
+
+            # o csv tem uma linha de cabeçalho
+            rows = stats['lines'] - (export_format == 'csv')
+            results[export_format] = {
+                **stats,
+                'rows': rows,
+                'seconds': round(time.perf_counter() - start, 1),
+                'rss_growth_mb': rss.growth_mb,
+            }
+
+    print(json.dumps(results, indent=2))
+
+    for export_format in ('ndjson', 'csv'):
+        result = results[export_format]
+        assert result['status'] == HTTPStatus.OK, result
+        assert result['rows'] == args.todos, result
+        assert result['rss_growth_mb'] <= args.max_rss_mb, (
+            f'{export_format} export grew RSS by {result["rss_growth_mb"]} '
+            f'MB (limit {args.max_rss_mb} MB)'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--todos', type=int, default=1_000_000)
+    parser.add_argument('--max-rss-mb', type=float, default=64)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import json
+import time
+from http import HTTPStatus
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi_course.models import User
+from fastapi_course.security import get_password_hash
+
+from .common import benchmark_app
+
+# compara a importação via POST /todos/import (COPY em lotes) com o caminho
+# antigo de um POST /todos/ por linha
+#
+#   python -m benchmarks.import_todos --todos 200000 --single 500
+
+PASSWORD = 'Bench@123'
+
+
+async def seed_user(engine):
+    async with AsyncSession(engine) as session:
+        session.add(
+            User(
+                username='bench',
+                email='bench@bench.com',
+                password=get_password_hash(PASSWORD),
+            )
+        )
+        await session.commit()
+
+
+def ndjson_body(todos: int):
+    return ''.join(
+        json.dumps({
+            'title': f'imported {i}',
+            'description': f'todo migrated from another tool #{i}',
+            'state': 'todo',
+        })
+        + '\n'
+        for i in range(todos)
+    ).encode()
+
+
+async def main(args):
+    results = {}
+
+    async with benchmark_app() as (client, engine):
+        await seed_user(engine)
+        response = await client.post(
+            '/auth/login/', data={'username': 'bench', 'password': PASSWORD}
+        )
+        headers = {
+            'Authorization': f'Bearer {response.json()["access_token"]}'
+        }
+
+        body = ndjson_body(args.todos)
+        start = time.perf_counter()
+        response = await client.post(
+            '/todos/import', headers=headers, content=body
+        )
+        elapsed = time.perf_counter() - start
+        assert response.status_code == HTTPStatus.CREATED, response.text
+
+        results['import'] = {
+            'rows': response.json()['imported'],
+            'rows_per_second': round(response.json()['imported'] / elapsed),
+            'server_rows_per_second': response.json()['rows_per_second'],
+        }
+
+        start = time.perf_counter()
+        for i in range(args.single):
+            response = await client.post(
+                '/todos/',
+                headers=headers,
+                json={
+                    'title': f'single {i}',
+                    'description': '',
+                    'state': 'todo',
+                },
+            )
+            assert response.status_code == HTTPStatus.CREATED
+        elapsed = time.perf_counter() - start
+
+        results['post_per_row'] = {
+            'rows': args.single,
+            'rows_per_second': round(args.single / elapsed),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--todos', type=int, default=200_000)
+    parser.add_argument('--single', type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
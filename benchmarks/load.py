@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from http import HTTPStatus
+from pathlib import Path
+
+from .common import benchmark_app, summarize
+from .seed import PASSWORD, STATE_WEIGHTS, seed
+
+# carga mista de ponta a ponta sobre a base semeada (benchmarks/seed.py):
+# --concurrency clientes, cada um logado como um usuário diferente, sorteiam
+# operações segundo WORKLOAD até --duration segundos. O resultado (vazão e
+# p50/p95/p99 por operação) sai em JSON para comparar execuções
+#
+#   python -m benchmarks.load --users 10000 --todos 1000000 \
+#       --concurrency 10 --duration 60 --output load.json
+
+# operação -> peso no sorteio
+WORKLOAD = {
+    'login': 5,
+    'list': 35,
+    'filter': 20,
+    'create': 15,
+    'patch': 15,
+    'delete': 10,
+}
+OK_STATUSES = {HTTPStatus.OK, HTTPStatus.CREATED}
+MIN_FILTER_LENGTH = 3
+MAX_FILTER_LENGTH = 30
+# parte dos filtros que usa título (o resto filtra por estado)
+TITLE_FILTER_SHARE = 0.5
+REMEMBERED = 100
+
+
+class Worker:
+    def __init__(self, client, username: str, rng: random.Random):
+        self.client = client
+        self.username = username
+        self.rng = rng
+        self.headers = {}
+        # ids e palavras dos títulos vistos nas respostas, para os PATCH,
+        # DELETE e filtros mirarem tarefas que existem
+        self.todo_ids = []
+        self.words = []
+
+    async def login(self):
+        response = await self.client.post(
+            '/auth/login/',
+            data={'username': self.username, 'password': PASSWORD},
+        )
+        if response.status_code == HTTPStatus.OK:
+            token = response.json()['access_token']
+            self.headers = {'Authorization': f'Bearer {token}'}
+        return response
+
+    def remember(self, todos):
+        for todo in todos:
+            if todo['id'] not in self.todo_ids:
+                self.todo_ids.append(todo['id'])
+            self.words.extend(
+                word
+                for word in todo['title'].split()
+                if len(word) >= MIN_FILTER_LENGTH
+            )
+        del self.todo_ids[:-REMEMBERED]
+        del self.words[:-REMEMBERED]
+
+    async def list(self):
+        response = await self.client.get(
+            '/todos/',
+            params={'offset': self.rng.randrange(50)},
+            headers=self.headers,
+        )
+        if response.status_code == HTTPStatus.OK:
+            self.remember(response.json()['todos'])
+        return response
+
+    async def filter(self):
+        if self.words and self.rng.random() < TITLE_FILTER_SHARE:
+            word = self.rng.choice(self.words)
+            params = {'title': word[:MAX_FILTER_LENGTH]}
+        else:
+            params = {'state': self.rng.choice(list(STATE_WEIGHTS)).value}
+
+        return await self.client.get(
+            '/todos/', params=params, headers=self.headers
+        )
+
+    async def create(self):
+        response = await self.client.post(
+            '/todos/',
+            json={
+                'title': f'load test {self.rng.randrange(10**6)}',
+                'description': 'created by benchmarks.load',
+                'state': 'todo',
+            },
+            headers=self.headers,
+        )
+        if response.status_code == HTTPStatus.CREATED:
+            self.remember([response.json()])
+        return response
+
+    async def patch(self):
+        if not self.todo_ids:
+            return await self.list()
+
+        return await self.client.patch(
+            f'/todos/{self.rng.choice(self.todo_ids)}',
+            json={'state': self.rng.choice(list(STATE_WEIGHTS)).value},
+            headers=self.headers,
+        )
+
+    async def delete(self):
+        if not self.todo_ids:
+            return await self.list()
+
+        todo_id = self.todo_ids.pop(self.rng.randrange(len(self.todo_ids)))
+        return await self.client.delete(
+            f'/todos/{todo_id}', headers=self.headers
+        )
+
+
+async def run_worker(worker: Worker, deadline: float, results):
+    operations = list(WORKLOAD)
+    weights = list(WORKLOAD.values())
+
+    while time.perf_counter() < deadline:
+        operation = worker.rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        response = await getattr(worker, operation)()
+        elapsed = time.perf_counter() - start
+
+        results[operation]['samples'].append(elapsed)
+        if response.status_code not in OK_STATUSES:
+            results[operation]['errors'] += 1
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    results = defaultdict(lambda: {'samples': [], 'errors': 0})
+
+    async with benchmark_app() as (client, engine):
+        start = time.perf_counter()
+        usernames = await seed(engine, args.users, args.todos, args.seed)
+        seed_seconds = time.perf_counter() - start
+
+        workers = [
+            Worker(
+                client,
+                username,
+                random.Random(rng.randrange(2**32)),
+            )
+            for username in rng.sample(usernames, args.concurrency)
+        ]
+        for worker in workers:
+            response = await worker.login()
+            assert response.status_code == HTTPStatus.OK, response.text
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(
+            *(run_worker(worker, deadline, results) for worker in workers)
+        )
+        elapsed = time.perf_counter() - start
+
+    requests = sum(len(result['samples']) for result in results.values())
+    report = {
+        'config': vars(args),
+        'seed_seconds': round(seed_seconds, 2),
+        'seconds': round(elapsed, 2),
+        'requests': requests,
+        'requests_per_second': round(requests / elapsed, 1),
+        'operations': {
+            operation: {
+                **summarize(results[operation]['samples']),
+                'errors': results[operation]['errors'],
+                'requests_per_second': round(
+                    len(results[operation]['samples']) / elapsed, 1
+                ),
+            }
+            for operation in WORKLOAD
+            if results[operation]['samples']
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--todos', type=int, default=1_000_000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import Executor, Future
+from http import HTTPStatus
+from typing import override
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi_course import security
+from fastapi_course.models import Todo, TodoState, User
+from fastapi_course.security import PasswordHashPool, get_password_hash
+from fastapi_course.throttling import login_throttle
+
+from .common import benchmark_app, summarize
+
+# mede a latência do GET /todos/ com e sem uma tempestade de logins em
+# paralelo. O modo 'inline' reproduz o comportamento antigo (Argon2 rodando
+# no próprio event loop) para comparação com o pool de hash; o modo
+# 'throttled' liga o limite de tentativas de login (throttling.py).
+#
+#   python -m benchmarks.login_storm --requests 300 --storm-concurrency 16
+
+PASSWORD = 'Bench@123'
+
+
+class InlineExecutor(Executor):
+    @override
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+async def seed(engine, todos: int):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = User(
+            username='bench',
+            email='bench@bench.com',
+            password=get_password_hash(PASSWORD),
+        )
+        session.add(user)
+        await session.flush()
+        session.add_all(
+            Todo(
+                title=f'todo {i}',
+                description='benchmark todo',
+                state=TodoState.todo,
+                user_id=user.id,
+            )
+            for i in range(todos)
+        )
+        await session.commit()
+
+
+async def login(client):
+    return await client.post(
+        '/auth/login/', data={'username': 'bench', 'password': PASSWORD}
+    )
+
+
+async def sample_list_latency(client, headers, requests: int):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get('/todos/', headers=headers)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == HTTPStatus.OK
+    return samples
+
+
+async def storm(client, stop: asyncio.Event, statuses: list[int]):
+    while not stop.is_set():
+        response = await login(client)
+        statuses.append(response.status_code)
+
+
+async def run_with_storm(client, headers, args):
+    stop = asyncio.Event()
+    statuses = []
+    workers = [
+        asyncio.create_task(storm(client, stop, statuses))
+        for _ in range(args.storm_concurrency)
+    ]
+    # deixa a tempestade começar antes de medir
+    await asyncio.sleep(0.2)
+
+    samples = await sample_list_latency(client, headers, args.requests)
+
+    stop.set()
+    await asyncio.gather(*workers)
+
+    return {
+        'list_todos': summarize(samples),
+        'logins': len(statuses),
+        'logins_rejected_503': statuses.count(HTTPStatus.SERVICE_UNAVAILABLE),
+        'logins_rejected_429': statuses.count(HTTPStatus.TOO_MANY_REQUESTS),
+    }
+
+
+async def main(args):
+    results = {}
+
+    async with benchmark_app() as (client, engine):
+        await seed(engine, args.todos)
+        token = (await login(client)).json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        results['baseline'] = {
+            'list_todos': summarize(
+                await sample_list_latency(client, headers, args.requests)
+            )
+        }
+        results['storm_pool'] = await run_with_storm(client, headers, args)
+
+        # a mesma tempestade com o limite de tentativas: passado o burst, os
+        # logins voltam 429 sem chegar ao Argon2
+        login_throttle.clear()
+        login_throttle.enabled = True
+        try:
+            results['storm_throttled'] = await run_with_storm(
+                client, headers, args
+            )
+        finally:
+            login_throttle.enabled = False
+
+        pool = security.password_hash_pool
+        security.password_hash_pool = PasswordHashPool(
+            InlineExecutor(), max_pending=args.storm_concurrency
+        )
+        try:
+            results['storm_inline'] = await run_with_storm(
+                client, headers, args
+            )
+        finally:
+            security.password_hash_pool = pool
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--storm-concurrency', type=int, default=8)
+    parser.add_argument('--todos', type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
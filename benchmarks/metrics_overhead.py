@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import time
+from http import HTTPStatus
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi_course import metrics
+from fastapi_course.metrics import (
+    MetricsMiddleware,
+    after_cursor_execute,
+    before_cursor_execute,
+)
+from fastapi_course.models import Todo, User
+from fastapi_course.security import get_password_hash
+
+from .common import benchmark_app, summarize
+
+# custo da instrumentação: o middleware em volta de um app ASGI vazio e os
+# eventos do SQLAlchemy chamados direto, comparados com a latência de um
+# GET /todos/ de verdade. Falha se o custo passar de --max-overhead-pct
+#
+#   python -m benchmarks.metrics_overhead --iterations 100000
+
+PASSWORD = 'Bench@123'
+TODOS = 50
+
+
+async def noop_app(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': HTTPStatus.OK})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def noop_send(message):
+    pass
+
+
+async def per_call(app, iterations: int):
+    route = SimpleNamespace(path='/todos/')
+    start = time.perf_counter()
+    for _ in range(iterations):
+        scope = {'type': 'http', 'method': 'GET', 'route': route}
+        await app(scope, None, noop_send)
+    return (time.perf_counter() - start) / iterations
+
+
+def hooks_per_statement(iterations: int):
+    conn = SimpleNamespace(info={})
+    start = time.perf_counter()
+    for _ in range(iterations):
+        before_cursor_execute(conn, None, None)
+        after_cursor_execute(conn, None, None)
+    return (time.perf_counter() - start) / iterations
+
+
+async def seed(engine):
+    async with AsyncSession(engine) as session:
+        user = User(
+            username='bench',
+            email='bench@bench.com',
+            password=get_password_hash(PASSWORD),
+        )
+        session.add(user)
+        await session.flush()
+        await session.execute(
+            insert(Todo),
+            [
+                {
+                    'title': f'todo {i}',
+                    'description': 'description',
+                    'state': 'todo',
+                    'user_id': user.id,
+                }
+                for i in range(TODOS)
+            ],
+        )
+        await session.commit()
+
+
+async def request_latency(requests: int):
+    async with benchmark_app() as (client, engine):
+        await seed(engine)
+        response = await client.post(
+            '/auth/login/', data={'username': 'bench', 'password': PASSWORD}
+        )
+        headers = {
+            'Authorization': f'Bearer {response.json()["access_token"]}'
+        }
+
+        statements = metrics.db_statements.value
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get('/todos/?limit=50', headers=headers)
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == HTTPStatus.OK
+
+        statements = metrics.db_statements.value - statements
+        return summarize(samples), statements / requests
+
+
+async def main(args):
+    bare = await per_call(noop_app, args.iterations)
+    instrumented = await per_call(MetricsMiddleware(noop_app), args.iterations)
+    middleware = instrumented - bare
+    hooks = hooks_per_statement(args.iterations)
+
+    latency, statements = await request_latency(args.requests)
+    overhead = middleware + hooks * statements
+    overhead_pct = overhead * 1000 / latency['p50_ms'] * 100
+
+    print(
+        json.dumps(
+            {
+                'middleware_us': round(middleware * 1e6, 2),
+                'hooks_per_statement_us': round(hooks * 1e6, 2),
+                'statements_per_request': statements,
+                'get_todos': latency,
+                'overhead_us_per_request': round(overhead * 1e6, 2),
+                'overhead_pct_of_p50': round(overhead_pct, 3),
+            },
+            indent=2,
+        )
+    )
+
+    assert overhead_pct <= args.max_overhead_pct, (
+        f'metrics overhead {overhead_pct:.2f}% above {args.max_overhead_pct}%'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--max-overhead-pct', type=float, default=2)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import json
+import time
+from http import HTTPStatus
+
+from fastapi_course.security import settings
+
+from .common import benchmark_app, summarize
+from .import_todos import PASSWORD, seed_user
+
+# custo de manter um cliente autenticado durante uma sessão de --hours
+# horas: o access token expira a cada ACCESS_TOKEN_EXPIRE_MINUTES e precisa
+# ser renovado. Sem refresh token cada renovação é um login (um verify do
+# Argon2); com ele é um login só e depois POST /auth/refresh. O CPU é o do
+# processo inteiro (process_time), o que inclui as threads do pool de hash
+#
+#   python -m benchmarks.refresh_tokens --sessions 20 --hours 8
+
+
+async def login(client):
+    response = await client.post(
+        '/auth/login/', data={'username': 'bench', 'password': PASSWORD}
+    )
+    assert response.status_code == HTTPStatus.OK, response.text
+    return response.json()
+
+
+async def session_with_logins(client, renewals: int):
+    samples = []
+    for _ in range(1 + renewals):
+        start = time.perf_counter()
+        await login(client)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def session_with_refresh(client, renewals: int):
+    start = time.perf_counter()
+    tokens = await login(client)
+    samples = [time.perf_counter() - start]
+
+    for _ in range(renewals):
+        start = time.perf_counter()
+        response = await client.post(
+            '/auth/refresh', json={'refresh_token': tokens['refresh_token']}
+        )
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == HTTPStatus.OK, response.text
+        tokens = response.json()
+
+    return samples
+
+
+async def measure(client, pattern, sessions: int, renewals: int):
+    samples = []
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+
+    for _ in range(sessions):
+        samples.extend(await pattern(client, renewals))
+
+    cpu = time.process_time() - cpu_start
+
+    return {
+        'seconds': round(time.perf_counter() - start, 3),
+        'cpu_seconds': round(cpu, 3),
+        'cpu_ms_per_session': round(cpu / sessions * 1000, 3),
+        'requests': summarize(samples),
+    }
+
+
+async def main(args):
+    renewals = int(args.hours * 60 // settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+    async with benchmark_app() as (client, engine):
+        await seed_user(engine)
+        # aquece conexões e o pool de hash antes de medir
+        await session_with_refresh(client, 1)
+
+        logins = await measure(
+            client, session_with_logins, args.sessions, renewals
+        )
+        refresh = await measure(
+            client, session_with_refresh, args.sessions, renewals
+        )
+
+    print(
+        json.dumps(
+            {
+                'sessions': args.sessions,
+                'renewals_per_session': renewals,
+                'password_logins': logins,
+                'refresh_tokens': refresh,
+                'cpu_reduction': round(
+                    1 - refresh['cpu_seconds'] / logins['cpu_seconds'], 3
+                ),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--hours', type=float, default=8)
+    asyncio.run(main(parser.parse_args()))
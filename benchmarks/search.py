@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from http import HTTPStatus
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi_course.models import Todo, TodoState, User
+from fastapi_course.security import get_password_hash
+
+from .common import benchmark_app, summarize
+
+# compara o filtro antigo por substring (?title= / ?description=, LIKE
+# '%x%') com a busca textual (/todos/search?q=) numa base semeada com
+# palavras de frequências diferentes
+#
+#   python -m benchmarks.search --todos 100000 --requests 50
+
+PASSWORD = 'Bench@123'
+VOCABULARY = [f'word{i}' for i in range(2000)]
+# palavra -> fração das tarefas que a contém
+PROBES = {'rareterm': 0.001, 'mediumterm': 0.05, 'commonterm': 0.3}
+BATCH_SIZE = 5000
+
+
+def random_text(rng: random.Random, words: int):
+    text = rng.choices(VOCABULARY, k=words)
+    for probe, frequency in PROBES.items():
+        if rng.random() < frequency:
+            text[rng.randrange(words)] = probe
+    return ' '.join(text)
+
+
+async def seed(engine, todos: int):
+    rng = random.Random(42)
+
+    async with AsyncSession(engine) as session:
+        user = User(
+            username='bench',
+            email='bench@bench.com',
+            password=get_password_hash(PASSWORD),
+        )
+        session.add(user)
+        await session.flush()
+
+        batch = []
+        for _ in range(todos):
+            batch.append({
+                'title': random_text(rng, 4),
+                'description': random_text(rng, 30),
+                'state': rng.choice(list(TodoState)),
+                'user_id': user.id,
+            })
+            if len(batch) == BATCH_SIZE:
+                await session.execute(insert(Todo), batch)
+                batch = []
+        if batch:
+            await session.execute(insert(Todo), batch)
+
+        await session.commit()
+
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql('ANALYZE todos')
+
+
+async def sample(client, headers, url: str, requests: int):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == HTTPStatus.OK
+    return summarize(samples)
+
+
+async def main(args):
+    results = {}
+
+    async with benchmark_app() as (client, engine):
+        await seed(engine, args.todos)
+        response = await client.post(
+            '/auth/login/', data={'username': 'bench', 'password': PASSWORD}
+        )
+        headers = {
+            'Authorization': f'Bearer {response.json()["access_token"]}'
+        }
+
+        for probe in PROBES:
+            results[probe] = {
+                'contains_description': await sample(
+                    client,
+                    headers,
+                    f'/todos/?description={probe}',
+                    args.requests,
+                ),
+                'search': await sample(
+                    client, headers, f'/todos/search?q={probe}', args.requests
+                ),
+            }
+
+    print(json.dumps({'todos': args.todos, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--todos', type=int, default=50_000)
+    parser.add_argument('--requests', type=int, default=30)
+    asyncio.run(main(parser.parse_args()))
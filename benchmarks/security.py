@@ -0,0 +1,136 @@
+import argparse
+import json
+import statistics
+import sys
+import timeit
+from importlib.metadata import version
+from pathlib import Path
+
+from jwt import decode
+
+from fastapi_course.security import (
+    create_access_token,
+    get_password_hash,
+    settings,
+    token_cache,
+    verify_password,
+)
+from fastapi_course.services import validate_password
+
+# microbenchmarks dos caminhos quentes de segurança e validação. Cada caso
+# é aquecido e calibrado (timeit.autorange) e depois medido em --rounds
+# rodadas; o número reportado é a mediana por chamada. Com --save-baseline
+# o resultado vira a referência; com --compare o script falha (exit 1) se
+# algum caso ficar mais de --threshold acima dela
+#
+#   python -m benchmarks.security --save-baseline baseline.json
+#   python -m benchmarks.security --compare baseline.json --threshold 0.2
+
+PASSWORD = 'Bench@123'
+PACKAGES = ('pwdlib', 'argon2-cffi', 'pyjwt')
+
+TOKEN = create_access_token({'sub': 'benchmark-user@example.com'})
+PASSWORD_HASH = get_password_hash(PASSWORD)
+# o token verificado fica no cache; as próximas requisições só consultam
+token_cache.set(
+    TOKEN,
+    {'id': 1, 'username': 'benchmark-user@example.com', 'email': None},
+    decode(TOKEN, settings.SECRET_KEY, settings.ALGORITHM)['exp'],
+    token_cache.version(),
+)
+
+CASES = {
+    'create_access_token': lambda: create_access_token({
+        'sub': 'benchmark-user@example.com'
+    }),
+    # o mesmo decode feito em get_current_user a cada requisição
+    'decode_access_token': lambda: decode(
+        TOKEN, settings.SECRET_KEY, settings.ALGORITHM
+    ),
+    'token_cache_hit': lambda: token_cache.get(TOKEN),
+    'get_password_hash': lambda: get_password_hash(PASSWORD),
+    'verify_password': lambda: verify_password(PASSWORD, PASSWORD_HASH),
+    'verify_password_wrong': lambda: verify_password(
+        'Wrong@123', PASSWORD_HASH
+    ),
+    'validate_password_strong': lambda: validate_password(PASSWORD),
+    'validate_password_weak': lambda: validate_password('password'),
+    'validate_password_long': lambda: validate_password('Aa1@' * 32),
+}
+
+
+def measure(func, rounds: int):
+    timer = timeit.Timer(func)
+    # autorange aquece e acha quantas chamadas enchem ~0,2 s
+    number, _ = timer.autorange()
+    timings = [elapsed / number for elapsed in timer.repeat(rounds, number)]
+
+    return {
+        'median_us': round(statistics.median(timings) * 1e6, 3),
+        'min_us': round(min(timings) * 1e6, 3),
+        'stdev_us': round(statistics.stdev(timings) * 1e6, 3),
+        'calls_per_round': number,
+    }
+
+
+def regressions(results, baseline, threshold: float):
+    for name, result in results.items():
+        reference = baseline['cases'].get(name)
+        if reference is None:
+            continue
+
+        ratio = result['median_us'] / reference['median_us']
+        if ratio > 1 + threshold:
+            yield name, reference['median_us'], result['median_us'], ratio
+
+
+def main(args):
+    results = {
+        name: measure(func, args.rounds)
+        for name, func in CASES.items()
+        if not args.only or name in args.only
+    }
+    report = {
+        'versions': {package: version(package) for package in PACKAGES},
+        'cases': results,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(
+            json.dumps(report, indent=2) + '\n', encoding='utf-8'
+        )
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        if baseline['versions'] != report['versions']:
+            print(
+                f'versions changed: {baseline["versions"]} -> '
+                f'{report["versions"]}',
+                file=sys.stderr,
+            )
+
+        failed = list(regressions(results, baseline, args.threshold))
+        for name, before, after, ratio in failed:
+            print(
+                f'REGRESSION {name}: {before} us -> {after} us ({ratio:.2f}x)',
+                file=sys.stderr,
+            )
+
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--only', nargs='*', choices=list(CASES))
+    parser.add_argument('--save-baseline')
+    parser.add_argument('--compare')
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.2,
+        help='allowed slowdown over the baseline median (0.2 = 20%%)',
+    )
+    main(parser.parse_args())
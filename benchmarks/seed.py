@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import factory.random
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.schema import CreateIndex, DropIndex
+from testcontainers.postgres import PostgresContainer
+
+from fastapi_course.models import (
+    TODO_SEARCH_CONFIG,
+    Todo,
+    TodoState,
+    table_registry,
+)
+from fastapi_course.security import get_password_hash
+from tests.conftest import TodoFactory, UserFactory
+
+# base semeada e reproduzível para os benchmarks de carga: os mesmos
+# UserFactory/TodoFactory dos testes, gravados com COPY em vez de INSERTs.
+# Poucos usuários concentram a maior parte das tarefas (distribuição de
+# Pareto) e os estados seguem STATE_WEIGHTS, como numa base real
+#
+#   python -m benchmarks.seed --users 10000 --todos 1000000
+
+PASSWORD = 'Bench@123'
+STATE_WEIGHTS = {
+    TodoState.draft: 10,
+    TodoState.todo: 40,
+    TodoState.doing: 20,
+    TodoState.done: 25,
+    TodoState.trash: 5,
+}
+# gerar texto com o Faker é o passo mais caro: as tarefas são sorteadas de
+# um conjunto de modelos produzidos pela TodoFactory
+TODO_TEMPLATES = 1000
+PARETO_ALPHA = 1.2
+HISTORY_SECONDS = 365 * 86_400
+
+COPY_USERS = 'COPY users (username, email, password) FROM STDIN'
+# as tarefas passam por tabelas temporárias: o COPY leva só (modelo,
+# estado, usuário, idade) e o INSERT ... SELECT monta as linhas no servidor,
+# com o search_vector calculado uma vez por modelo (o mesmo cálculo do
+# trigger todos_search_vector_update) em vez de uma vez por linha
+STAGING_TABLES = """
+    CREATE TEMP TABLE seed_templates (
+        template_id int, title varchar, description varchar,
+        search_vector tsvector
+    ) ON COMMIT DROP;
+    CREATE TEMP TABLE seed_todos (
+        template_id int, state todostate, user_id int, age_seconds int
+    ) ON COMMIT DROP;
+"""
+COPY_TEMPLATES = (
+    'COPY seed_templates (template_id, title, description) FROM STDIN'
+)
+TEMPLATE_SEARCH_VECTORS = f"""
+    UPDATE seed_templates SET search_vector =
+        setweight(to_tsvector('{TODO_SEARCH_CONFIG}', title), 'A') ||
+        setweight(to_tsvector('{TODO_SEARCH_CONFIG}', description), 'B')
+"""
+COPY_STAGED_TODOS = (
+    'COPY seed_todos (template_id, state, user_id, age_seconds) FROM STDIN'
+)
+INSERT_TODOS = """
+    INSERT INTO todos (
+        title, description, state, user_id, created_at, updated_at,
+        search_vector
+    )
+    SELECT
+        t.title, t.description, s.state, s.user_id,
+        now() - make_interval(secs => s.age_seconds),
+        now() - make_interval(secs => s.age_seconds),
+        t.search_vector
+    FROM seed_todos s
+    JOIN seed_templates t USING (template_id)
+"""
+COPY_BLOCK_ROWS = 50_000
+
+
+def todos_per_user(rng: random.Random, users: int, todos: int):
+    weights = [rng.paretovariate(PARETO_ALPHA) for _ in range(users)]
+    scale = todos / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+
+    # o arredondamento para baixo sobra algumas tarefas
+    for index in rng.sample(range(users), todos - sum(counts)):
+        counts[index] += 1
+
+    return counts
+
+
+async def copy_rows(cursor, statement: str, rows):
+    async with cursor.copy(statement) as copy:
+        for row in rows:
+            await copy.write_row(row)
+
+
+async def seed(engine, users: int, todos: int, seed: int = 42):
+    rng = random.Random(seed)
+    factory.random.reseed_random(seed)
+    # todos os usuários com a mesma senha: um hash Argon2 só
+    password = get_password_hash(PASSWORD)
+    built_users = UserFactory.build_batch(users)
+    templates = TodoFactory.build_batch(TODO_TEMPLATES)
+    states = [state.value for state in STATE_WEIGHTS]
+    state_weights = list(STATE_WEIGHTS.values())
+
+    def todo_blocks(user_ids):
+        counts = todos_per_user(rng, len(user_ids), todos)
+        block = []
+
+        for user_id, count in zip(user_ids, counts):
+            for state in rng.choices(states, state_weights, k=count):
+                block.append(
+                    f'{rng.randrange(TODO_TEMPLATES)}\t{state}\t{user_id}'
+                    f'\t{rng.randrange(HISTORY_SECONDS)}\n'
+                )
+
+                if len(block) == COPY_BLOCK_ROWS:
+                    yield ''.join(block)
+                    block = []
+
+        if block:
+            yield ''.join(block)
+
+    # carga em massa: sem o trigger (o search_vector já vem pronto) e com
+    # os índices secundários recriados no fim, de uma vez.
+    # begin(): o commit no fim vale também para o COPY feito no driver
+    indexes = list(Todo.__table__.indexes)
+
+    async with engine.begin() as connection:
+        raw_connection = await connection.get_raw_connection()
+
+        async with raw_connection.driver_connection.cursor() as cursor:
+            await copy_rows(
+                cursor,
+                COPY_USERS,
+                (
+                    (user.username, user.email, password)
+                    for user in built_users
+                ),
+            )
+            await cursor.execute('SELECT id FROM users ORDER BY id')
+            user_ids = [user_id for (user_id,) in await cursor.fetchall()]
+
+            await cursor.execute(STAGING_TABLES)
+            await copy_rows(
+                cursor,
+                COPY_TEMPLATES,
+                (
+                    (template_id, todo.title, todo.description)
+                    for template_id, todo in enumerate(templates)
+                ),
+            )
+            await cursor.execute(TEMPLATE_SEARCH_VECTORS)
+            async with cursor.copy(COPY_STAGED_TODOS) as copy:
+                for block in todo_blocks(user_ids):
+                    await copy.write(block)
+
+            await cursor.execute(
+                'ALTER TABLE todos DISABLE TRIGGER todos_search_vector_update'
+            )
+            for index in indexes:
+                await connection.execute(DropIndex(index))
+
+            await cursor.execute(INSERT_TODOS)
+
+            await cursor.execute("SET LOCAL maintenance_work_mem = '256MB'")
+            for index in indexes:
+                await connection.execute(CreateIndex(index))
+            await cursor.execute(
+                'ALTER TABLE todos ENABLE TRIGGER todos_search_vector_update'
+            )
+
+    async with engine.begin() as connection:
+        await connection.exec_driver_sql('ANALYZE users')
+        await connection.exec_driver_sql('ANALYZE todos')
+
+    return [user.username for user in built_users]
+
+
+async def main(args):
+    with PostgresContainer('postgres:18', driver='psycopg') as postgres:
+        engine = create_async_engine(postgres.get_connection_url())
+
+        async with engine.begin() as conn:
+            await conn.run_sync(table_registry.metadata.create_all)
+
+        start = time.perf_counter()
+        await seed(engine, args.users, args.todos, args.seed)
+        elapsed = time.perf_counter() - start
+
+        async with AsyncSession(engine) as session:
+            rows = await session.scalar(select(func.count()).select_from(Todo))
+
+        print(
+            json.dumps(
+                {
+                    'users': args.users,
+                    'todos': rows,
+                    'seconds': round(elapsed, 2),
+                    'rows_per_second': round(rows / elapsed),
+                },
+                indent=2,
+            )
+        )
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--todos', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
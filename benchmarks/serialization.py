@@ -0,0 +1,136 @@
+import argparse
+import json
+import time
+from datetime import UTC, datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from fastapi_course.models import Todo, TodoState
+from fastapi_course.schemas import TodoList
+from fastapi_course.serializers import TODO_FIELDS, orjson, todo_list_json
+
+# tempo de serialização de uma página de tarefas, sem banco nem HTTP:
+#
+#   response_model: objetos do ORM validados em TodoList e codificados
+#                   com jsonable_encoder + json (o que o FastAPI faz quando
+#                   a rota devolve os objetos e declara response_model)
+#   model_dump_json: validação em TodoList + encoder do pydantic
+#   row_tuples: tuplas do banco direto para bytes (serializers.py)
+#
+#   python -m benchmarks.serialization --todos 1000 --rounds 200
+
+START = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def make_rows(todos: int):
+    states = list(TodoState)
+    return [
+        (
+            f'todo {i}',
+            f'description of the todo number {i}',
+            states[i % len(states)],
+            i,
+            START + timedelta(seconds=i),
+            START + timedelta(seconds=i, microseconds=i),
+        )
+        for i in range(todos)
+    ]
+
+
+def make_todos(rows):
+    todos = []
+    for row in rows:
+        fields = dict(zip(TODO_FIELDS, row))
+        todo = Todo(
+            title=fields['title'],
+            description=fields['description'],
+            state=fields['state'],
+            user_id=1,
+        )
+        todo.id = fields['id']
+        todo.created_at = fields['created_at']
+        todo.updated_at = fields['updated_at']
+        todos.append(todo)
+    return todos
+
+
+def response_model(rows, todos):
+    content = TodoList.model_validate(
+        {'todos': todos, 'next_cursor': None}, from_attributes=True
+    )
+    return json.dumps(
+        jsonable_encoder(content), separators=(',', ':')
+    ).encode()
+
+
+def model_dump_json(rows, todos):
+    return (
+        TodoList
+        .model_validate(
+            {'todos': todos, 'next_cursor': None}, from_attributes=True
+        )
+        .model_dump_json()
+        .encode()
+    )
+
+
+def row_tuples(rows, todos):
+    return todo_list_json(rows)
+
+
+SERIALIZERS = {
+    'response_model': response_model,
+    'model_dump_json': model_dump_json,
+    'row_tuples': row_tuples,
+}
+
+
+def measure(serializer, rows, todos, rounds: int):
+    # aquecimento antes de medir
+    serializer(rows, todos)
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        serializer(rows, todos)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main(args):
+    rows = make_rows(args.todos)
+    todos = make_todos(rows)
+    per_thousand = 1000 / args.todos
+
+    assert json.loads(row_tuples(rows, todos)) == json.loads(
+        model_dump_json(rows, todos)
+    )
+
+    results = {
+        name: round(
+            measure(serializer, rows, todos, args.rounds)
+            * 1000
+            * per_thousand,
+            3,
+        )
+        for name, serializer in SERIALIZERS.items()
+    }
+
+    print(
+        json.dumps(
+            {
+                'encoder': 'orjson' if orjson else 'pydantic-core',
+                'ms_per_1000_todos': results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--todos', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=200)
+    main(parser.parse_args())
@@ -1,7 +1,7 @@
 #!/bin/sh
 
 # Executar migrações
-poetry run alembic upgrade head
+alembic upgrade head
 
 # Iniciar aplicação
-poetry run uvicorn --host 0.0.0.0 --port 8000 fastapi_course.app:app
\ No newline at end of file
+exec python -m fastapi_course.serve --host 0.0.0.0 --port 8000
\ No newline at end of file
@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+# relatório de atividade a partir do rollup diário (todo_daily_activity):
+# as linhas de cada dia são somadas no período do bucket e os períodos sem
+# nenhuma linha aparecem zerados, para o gráfico não ter buracos
+
+BUCKET_SIZES = {'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+
+
+def bucket_start(day: date, granularity: str):
+    # semanas começam na segunda-feira (ISO 8601)
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def activity_buckets(rows, start: date, end: date, granularity: str):
+    totals = {}
+
+    for day, created, completed in rows:
+        bucket = totals.setdefault(bucket_start(day, granularity), [0, 0])
+        bucket[0] += created
+        bucket[1] += completed
+
+    buckets = []
+    current = bucket_start(start, granularity)
+
+    while current <= end:
+        created, completed = totals.get(current, (0, 0))
+        buckets.append({
+            'start': current,
+            'created': created,
+            'completed': completed,
+        })
+        current += BUCKET_SIZES[granularity]
+
+    return buckets
@@ -1,21 +1,42 @@
 import asyncio
 import sys
+from contextlib import asynccontextmanager
 from http import HTTPStatus
 
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse, JSONResponse
 
-from fastapi_course.routers import auth, todos, users
+from fastapi_course.compression import CompressionMiddleware
+from fastapi_course.consistency import ReadYourWritesMiddleware
+from fastapi_course.database import engine, read_engine
+from fastapi_course.metrics import MetricsMiddleware
+from fastapi_course.routers import auth, health, metrics, todos, users
 from fastapi_course.schemas import Message
 
 # para sistemas windows
 if sys.platform == 'win32':  # pragma: no cover
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-app = FastAPI(title='Curso FastAPI')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # no shutdown do worker fecha as conexões do pool
+    await engine.dispose()
+    await read_engine.dispose()
+
+
+app = FastAPI(title='Curso FastAPI', lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
+# comprime o que as camadas internas produzirem
+app.add_middleware(CompressionMiddleware)
+# por fora de tudo: a latência medida inclui a compressão
+app.add_middleware(MetricsMiddleware)
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(todos.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
 
 
 @app.get(
@@ -0,0 +1,212 @@
+import json
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Protocol
+
+from fastapi_course.settings import Settings
+
+# cache de respostas dos endpoints de leitura. O valor guardado já é o corpo
+# JSON pronto (mais o ETag), então um hit não toca no banco, no Pydantic nem
+# no encoder. Cada entrada tem tags ('todos:{user_id}', 'user:{id}',
+# 'users') e as escritas invalidam só as tags afetadas
+#
+# o backend padrão é um LRU em memória, por worker. Com vários workers a
+# invalidação só acontece no worker que atendeu a escrita: os outros podem
+# servir uma entrada antiga por até RESPONSE_CACHE_TTL segundos (o cliente
+# que escreveu não é afetado, o cookie de read-your-writes faz as leituras
+# dele pularem o cache). Quem precisa de invalidação imediata em todos os
+# workers deve usar um backend compartilhado (Redis, memcached...), que só
+# precisa implementar ResponseCache
+#
+# uma leitura lenta não pode gravar no cache um corpo anterior a uma escrita
+# que terminou no meio dela: a rota pega version() antes da consulta e o
+# set() descarta o valor se alguma das tags foi invalidada depois disso
+
+
+def cache_key(prefix: str, params: dict | None = None):
+    # parâmetros normalizados: a mesma consulta com query string em outra
+    # ordem (ou com os valores padrão explícitos) cai na mesma entrada
+    if params is None:
+        return prefix
+
+    return f'{prefix}?{json.dumps(params, sort_keys=True, default=str)}'
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+
+class ResponseCache(Protocol):
+    def get(self, key: str) -> Optional[CachedResponse]: ...
+
+    def version(self) -> int: ...
+
+    def set(
+        self,
+        key: str,
+        value: CachedResponse,
+        tags: tuple[str, ...],
+        version: int,
+    ): ...
+
+    def invalidate(self, *tags: str): ...
+
+    def clear(self): ...
+
+    def stats(self) -> dict: ...
+
+
+class _Entry(NamedTuple):
+    value: CachedResponse
+    tags: tuple[str, ...]
+    size: int
+    expires_at: float
+
+
+class MemoryResponseCache:
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._keys_by_tag = {}
+        self._bytes = 0
+
+        # número de sequência da última invalidação de cada tag. Só as mais
+        # recentes ficam guardadas; _forgotten é a sequência da mais nova que
+        # já foi descartada (versões anteriores a ela não dá mais para checar)
+        self._sequence = 0
+        self._invalidated_at = OrderedDict()
+        self._forgotten = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def version(self):
+        return self._sequence
+
+    def set(
+        self,
+        key: str,
+        value: CachedResponse,
+        tags: tuple[str, ...],
+        version: int,
+    ):
+        size = len(key) + len(value.body) + len(value.etag)
+
+        # uma resposta maior que o cache inteiro não é guardada
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+
+        if self._invalidated_since(tags, version):
+            self.stale_writes += 1
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = _Entry(
+            value, tags, size, time.monotonic() + self.ttl
+        )
+        self._bytes += size
+
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+
+        # descarta as menos usadas recentemente até caber nos limites
+        while (
+            len(self._entries) > self.max_entries
+            or self._bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, *tags: str):
+        self._sequence += 1
+
+        for tag in tags:
+            self._invalidated_at.pop(tag, None)
+            self._invalidated_at[tag] = self._sequence
+
+        while len(self._invalidated_at) > max(self.max_entries, 1):
+            _, self._forgotten = self._invalidated_at.popitem(last=False)
+
+        for tag in tags:
+            for key in self._keys_by_tag.pop(tag, set()):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_tag.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'stale_writes': self.stale_writes,
+        }
+
+    def _invalidated_since(self, tags: tuple[str, ...], version: int):
+        if version < self._forgotten:
+            return True
+
+        return any(self._invalidated_at.get(tag, 0) > version for tag in tags)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+
+            if keys is not None:
+                keys.discard(key)
+
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+def create_response_cache():
+    settings = Settings()
+
+    return MemoryResponseCache(
+        ttl=settings.RESPONSE_CACHE_TTL,
+        max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    )
+
+
+response_cache: ResponseCache = create_response_cache()
@@ -0,0 +1,306 @@
+import zlib
+from threading import Lock
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from fastapi_course.database import settings
+
+# compressão das respostas negociada pelo Accept-Encoding. gzip sempre está
+# disponível; brotli e zstd entram quando a biblioteca estiver instalada.
+# Respostas menores que COMPRESSION_MINIMUM_SIZE vão sem compressão (o
+# ganho não paga o custo). Em respostas em streaming (/todos/export) cada
+# pedaço é comprimido e enviado com flush, sem juntar o corpo inteiro
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:  # pragma: no cover - dependência opcional
+    zstd = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependência opcional
+    zstandard = None
+
+# zlib com cabeçalho e trailer gzip
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/x-ndjson',
+    'application/problem+json',
+)
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+
+    def compress(self, data: bytes, *, flush: bool = False):
+        # flush: entrega já o que foi comprimido (streaming)
+        compressed = self._compressor.compress(data)
+        if flush:
+            compressed += self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return compressed
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor:  # pragma: no cover - depende do brotli
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes, *, flush: bool = False):
+        compressed = self._compressor.process(data)
+        if flush:
+            compressed += self._compressor.flush()
+        return compressed
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdCompressor:  # pragma: no cover - depende do zstd
+    def __init__(self, level: int):
+        if zstd is not None:
+            self._compressor = zstd.ZstdCompressor(level=level)
+            self._flush_block = zstd.ZstdCompressor.FLUSH_BLOCK
+        else:
+            self._compressor = zstandard.ZstdCompressor(
+                level=level
+            ).compressobj()
+            self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+    def compress(self, data: bytes, *, flush: bool = False):
+        compressed = self._compressor.compress(data)
+        if flush:
+            compressed += self._compressor.flush(self._flush_block)
+        return compressed
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# codificação -> (compressor, nível); a ordem é a preferência do servidor
+# quando o cliente aceita mais de uma com o mesmo peso
+ENCODINGS = {}
+
+if brotli is not None:  # pragma: no cover
+    ENCODINGS['br'] = (BrotliCompressor, settings.COMPRESSION_BROTLI_LEVEL)
+
+if zstd is not None or zstandard is not None:  # pragma: no cover
+    ENCODINGS['zstd'] = (ZstdCompressor, settings.COMPRESSION_ZSTD_LEVEL)
+
+ENCODINGS['gzip'] = (GzipCompressor, settings.COMPRESSION_GZIP_LEVEL)
+
+
+def negotiate(accept_encoding: str, encodings=ENCODINGS):
+    # escolhe a codificação de maior q aceita pelo cliente; q=0 recusa
+    weights = {}
+
+    for item in accept_encoding.split(','):
+        name, *params = item.split(';')
+        weight = 1.0
+
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+
+        if name.strip():
+            weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+
+    return best
+
+
+def compressible(headers: Headers):
+    content_type = headers.get('content-type', '')
+
+    return 'content-encoding' not in headers and content_type.startswith(
+        COMPRESSIBLE_TYPES
+    )
+
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.compressed = 0
+            self.skipped = 0
+            self.by_encoding = {}
+
+    def _totals(self, encoding: str):
+        return self.by_encoding.setdefault(
+            encoding, {'responses': 0, 'bytes_in': 0, 'bytes_out': 0}
+        )
+
+    def record_skipped(self):
+        with self._lock:
+            self.skipped += 1
+
+    def record_compressed(self, encoding: str):
+        with self._lock:
+            self.compressed += 1
+            self._totals(encoding)['responses'] += 1
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int):
+        with self._lock:
+            totals = self._totals(encoding)
+            totals['bytes_in'] += bytes_in
+            totals['bytes_out'] += bytes_out
+
+    def stats(self):
+        with self._lock:
+            bytes_in = sum(t['bytes_in'] for t in self.by_encoding.values())
+            bytes_out = sum(t['bytes_out'] for t in self.by_encoding.values())
+
+            return {
+                'encodings': list(ENCODINGS),
+                'minimum_size': settings.COMPRESSION_MINIMUM_SIZE,
+                'compressed': self.compressed,
+                'skipped': self.skipped,
+                'bytes_in': bytes_in,
+                'bytes_out': bytes_out,
+                'saved_bytes': bytes_in - bytes_out,
+                'by_encoding': {
+                    encoding: dict(totals)
+                    for encoding, totals in self.by_encoding.items()
+                },
+            }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = settings.COMPRESSION_MINIMUM_SIZE,
+        encodings=ENCODINGS,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = encodings
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(
+            request_headers.get('accept-encoding', ''), self.encodings
+        )
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressedResponder(
+            send, encoding, self.encodings[encoding], self.minimum_size
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class CompressedResponder:
+    def __init__(self, send, encoding: str, compressor, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.compressor_class, self.level = compressor
+        self.minimum_size = minimum_size
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+        # corpo guardado só até decidir se compensa comprimir
+        self.buffer = bytearray()
+
+    async def send(self, message):
+        if self.passthrough:
+            await self._send(message)
+
+        elif message['type'] == 'http.response.start':
+            if compressible(Headers(raw=message['headers'])):
+                self.start = message
+            else:
+                self.passthrough = True
+                await self._send(message)
+
+        elif message['type'] == 'http.response.body':
+            await self.send_body(
+                message.get('body', b''), message.get('more_body', False)
+            )
+
+        else:
+            await self._send(message)
+
+    async def send_body(self, body: bytes, more_body: bool):
+        if self.compressor is not None:
+            compressed = self.compress(body, more_body)
+
+        else:
+            self.buffer.extend(body)
+
+            if len(self.buffer) < self.minimum_size:
+                if more_body:
+                    return
+
+                # pequena demais: vai como veio
+                self.passthrough = True
+                compression_stats.record_skipped()
+                await self._send(self.start)
+                await self._send({
+                    'type': 'http.response.body',
+                    'body': bytes(self.buffer),
+                })
+                return
+
+            self.compressor = self.compressor_class(self.level)
+            compressed = self.compress(bytes(self.buffer), more_body)
+            self.buffer.clear()
+
+            headers = MutableHeaders(scope=self.start)
+            headers['content-encoding'] = self.encoding
+            headers.add_vary_header('Accept-Encoding')
+
+            if more_body:
+                # streaming: o tamanho final não é conhecido
+                del headers['content-length']
+            else:
+                headers['content-length'] = str(len(compressed))
+
+            compression_stats.record_compressed(self.encoding)
+            await self._send(self.start)
+
+        await self._send({
+            'type': 'http.response.body',
+            'body': compressed,
+            'more_body': more_body,
+        })
+
+    def compress(self, body: bytes, more_body: bool):
+        compressed = self.compressor.compress(body, flush=more_body)
+        if not more_body:
+            compressed += self.compressor.finish()
+
+        compression_stats.record(self.encoding, len(body), len(compressed))
+        return compressed
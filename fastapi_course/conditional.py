@@ -0,0 +1,47 @@
+import hashlib
+import json
+from http import HTTPStatus
+
+from fastapi import Response
+
+# GETs condicionais: o ETag é fraco (W/) porque é derivado de um resumo
+# barato dos dados, e não dos bytes da resposta. Quando o If-None-Match do
+# cliente bate, a rota devolve 304 sem montar (nem validar) o corpo
+
+
+def make_etag(*parts):
+    payload = json.dumps(parts, default=str, separators=(',', ':'))
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str):
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == '*':
+        return True
+
+    # comparação fraca: ignora o prefixo W/ dos dois lados
+    opaque = etag.removeprefix('W/')
+    return any(
+        candidate.strip().removeprefix('W/') == opaque
+        for candidate in if_none_match.split(',')
+    )
+
+
+def not_modified(etag: str):
+    return Response(
+        status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag}
+    )
+
+
+def json_response(body: bytes, etag: str, if_none_match: str | None = None):
+    # corpo JSON já serializado (por exemplo, vindo do cache de respostas)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    return Response(
+        body, media_type='application/json', headers={'ETag': etag}
+    )
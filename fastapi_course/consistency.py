@@ -0,0 +1,95 @@
+import hashlib
+import hmac
+import math
+import time
+from contextvars import ContextVar
+from http import HTTPStatus
+from typing import Annotated, Optional
+
+from fastapi import Cookie
+from starlette.datastructures import MutableHeaders
+
+from fastapi_course.settings import Settings
+
+# read-your-own-writes entre workers: o RecentWrites só enxerga as escritas
+# do próprio processo, e com vários workers a leitura seguinte pode cair em
+# outro. Por isso toda resposta de uma escrita devolve um cookie assinado
+# com o prazo até quando as leituras desse cliente devem ir ao primário;
+# qualquer worker consegue validar o cookie sem estado compartilhado
+
+settings = Settings()
+
+READ_PRIMARY_COOKIE = 'read_primary_until'
+
+# lista criada pelo middleware a cada requisição; as escritas só anotam nela
+_request_writes: ContextVar[Optional[list]] = ContextVar(
+    'request_writes', default=None
+)
+
+
+def _sign(value: str):
+    return hmac.new(
+        settings.SECRET_KEY.encode(), value.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def pin_reads_to_primary():
+    writes = _request_writes.get()
+
+    if writes is not None:
+        writes.append(True)
+
+
+def read_primary_cookie(window: float):
+    deadline = str(math.ceil((time.time() + window) * 1000))
+    return (
+        f'{READ_PRIMARY_COOKIE}={deadline}.{_sign(deadline)}; '
+        f'Max-Age={math.ceil(window)}; Path=/; HttpOnly; SameSite=Lax'
+    )
+
+
+async def client_pinned_to_primary(
+    read_primary_until: Annotated[Optional[str], Cookie()] = None,
+):
+    if not read_primary_until:
+        return False
+
+    deadline, _, signature = read_primary_until.partition('.')
+
+    if not hmac.compare_digest(signature, _sign(deadline)):
+        return False
+
+    try:
+        return int(deadline) / 1000 > time.time()
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app, window: float = settings.READ_YOUR_WRITES_WINDOW):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        writes = []
+        token = _request_writes.set(writes)
+
+        async def send_with_cookie(message):
+            if (
+                message['type'] == 'http.response.start'
+                and writes
+                and message['status'] < HTTPStatus.BAD_REQUEST
+            ):
+                headers = MutableHeaders(scope=message)
+                headers.append('set-cookie', read_primary_cookie(self.window))
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_writes.reset(token)
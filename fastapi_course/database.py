@@ -1,8 +1,138 @@
+import time
+from collections import OrderedDict
+from typing import override
+
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from fastapi_course.settings import Settings
 
-engine = create_async_engine(Settings().DATABASE_URL)
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # o mesmo pool padrão das engines async, contando quanto tempo cada
+    # checkout levou até ter uma conexão em mãos (e quantos desistiram no
+    # pool_timeout), para o /health/ready mostrar quando o pool vira gargalo.
+    # Mede no connect() público: o _do_get do QueuePool chama a si mesmo e
+    # contaria o mesmo checkout mais de uma vez
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_count = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+
+    @override
+    def connect(self):
+        start = time.perf_counter()
+
+        try:
+            return super().connect()
+
+        except exc.TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+
+        finally:
+            elapsed = time.perf_counter() - start
+            self.checkout_count += 1
+            self.checkout_wait_total += elapsed
+            self.checkout_wait_max = max(self.checkout_wait_max, elapsed)
+
+    @property
+    def max_overflow(self):
+        return self._max_overflow
+
+
+def create_engine(settings: Settings, url: str | None = None):
+    return create_async_engine(
+        url or settings.DATABASE_URL,
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+
+settings = Settings()
+
+engine = create_engine(settings)
+
+read_engine = (
+    create_engine(settings, settings.READ_DATABASE_URL)
+    if settings.READ_DATABASE_URL
+    else engine
+)
+
+
+class RecentWrites:
+    # lembra, por alguns segundos, quais recursos foram escritos neste
+    # processo. Leituras desses recursos vão para o primário enquanto a
+    # réplica pode ainda não ter recebido a escrita (read-your-own-writes)
+    def __init__(self, window: float, max_keys: int = 10_000):
+        self.window = window
+        self.max_keys = max_keys
+        self._deadlines = OrderedDict()
+
+    def mark(self, *keys: str):
+        deadline = time.monotonic() + self.window
+
+        for key in keys:
+            self._deadlines.pop(key, None)
+            self._deadlines[key] = deadline
+
+        # as chaves ficam em ordem de escrita: descarta as expiradas (e as
+        # mais antigas, se passar do limite) pelo começo
+        now = time.monotonic()
+        while self._deadlines and (
+            len(self._deadlines) > self.max_keys
+            or next(iter(self._deadlines.values())) <= now
+        ):
+            self._deadlines.popitem(last=False)
+
+    def __contains__(self, key: str):
+        deadline = self._deadlines.get(key)
+        return deadline is not None and deadline > time.monotonic()
+
+    def clear(self):
+        self._deadlines.clear()
+
+
+recent_writes = RecentWrites(settings.READ_YOUR_WRITES_WINDOW)
+
+
+def pick_session(session, read_session, *keys: str, pinned: bool = False):
+    # pinned: o cliente escreveu há pouco (cookie de read-your-writes)
+    if pinned or any(key in recent_writes for key in keys):
+        return session
+
+    return read_session
+
+
+def pool_status(engine):
+    pool = engine.pool
+    checked_out = pool.checkedout()
+
+    # max_overflow negativo significa overflow ilimitado
+    exhausted = (
+        pool.max_overflow >= 0
+        and checked_out >= pool.size() + pool.max_overflow
+    )
+
+    return {
+        'size': pool.size(),
+        'max_overflow': pool.max_overflow,
+        'checked_in': pool.checkedin(),
+        'checked_out': checked_out,
+        'overflow': max(pool.overflow(), 0),
+        'exhausted': exhausted,
+        'checkout_count': pool.checkout_count,
+        'checkout_timeouts': pool.checkout_timeouts,
+        'checkout_wait_seconds_total': pool.checkout_wait_total,
+        'checkout_wait_seconds_max': pool.checkout_wait_max,
+    }
 
 
 async def get_session():  # pragma: no cover
@@ -10,6 +140,11 @@ async def get_session():  # pragma: no cover
         yield session
 
 
+async def get_read_session():  # pragma: no cover
+    async with AsyncSession(read_engine, expire_on_commit=False) as session:
+        yield session
+
+
 # nao faz sentido esse get_session ser testado, pois estamos usando uma fixture
 # para criar uma session pro nosso db em memória
 
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+
+from fastapi_course.models import Todo
+
+# exportação completa das tarefas de um usuário. As linhas chegam do banco
+# em lotes (cursor no servidor + yield_per) e cada lote vira um pedaço do
+# corpo da resposta, então a memória usada não depende do total de linhas
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = (
+    Todo.id,
+    Todo.title,
+    Todo.description,
+    Todo.state,
+    Todo.created_at,
+    Todo.updated_at,
+)
+
+EXPORT_FIELDS = tuple(column.key for column in EXPORT_COLUMNS)
+
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def _export_row(row):
+    # state vem como TodoState e as datas como datetime
+    todo_id, title, description, state, created_at, updated_at = row
+    return (
+        todo_id,
+        title,
+        description,
+        state.value,
+        created_at.isoformat(),
+        updated_at.isoformat(),
+    )
+
+
+async def ndjson_chunks(partitions):
+    async for rows in partitions:
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_FIELDS, _export_row(row)))) + '\n'
+            for row in rows
+        )
+
+
+async def csv_chunks(partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_export_row(row) for row in rows)
+        yield buffer.getvalue()
+
+
+EXPORT_WRITERS = {'ndjson': ndjson_chunks, 'csv': csv_chunks}
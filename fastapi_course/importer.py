@@ -0,0 +1,143 @@
+import csv
+import json
+
+from pydantic import ValidationError
+
+from fastapi_course.schemas import TodoSchema
+
+# importação em massa: o corpo da requisição é lido em pedaços, cada linha é
+# validada com o TodoSchema assim que chega e as válidas vão para o banco
+# pelo protocolo COPY em lotes. Linhas inválidas são contadas e reportadas,
+# sem abortar o resto do arquivo
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+COPY_TODOS = 'COPY todos (title, description, state, user_id) FROM STDIN'
+
+
+async def read_lines(chunks):
+    # (número da linha, bytes da linha), sem segurar o arquivo inteiro
+    buffer = b''
+    number = 0
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+
+        for line in lines:
+            number += 1
+            yield number, line
+
+    if buffer:
+        yield number + 1, buffer
+
+
+def _validation_detail(error: ValidationError):
+    return '; '.join(
+        f'{".".join(map(str, item["loc"])) or "row"}: {item["msg"]}'
+        for item in error.errors()
+    )
+
+
+def _validate(line_number: int, data):
+    try:
+        return line_number, TodoSchema.model_validate(data), None
+    except ValidationError as error:
+        return line_number, None, _validation_detail(error)
+
+
+async def _ndjson_records(lines):
+    async for line_number, line in lines:
+        if not line.strip():
+            continue
+
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, f'Invalid JSON: {error}'
+            continue
+
+        yield _validate(line_number, data)
+
+
+async def _csv_records(lines):
+    header = None
+    record = []
+    first_line = None
+
+    async for line_number, line in lines:
+        try:
+            text = line.decode().removesuffix('\r')
+        except UnicodeDecodeError:
+            yield line_number, None, 'Invalid UTF-8'
+            continue
+
+        # um campo entre aspas pode ter quebras de linha: o registro só está
+        # completo quando o número de aspas é par
+        record.append(text)
+        first_line = first_line or line_number
+        if sum(part.count('"') for part in record) % 2:
+            continue
+
+        record_line, first_line = first_line, None
+        (fields,) = csv.reader(['\n'.join(record)])
+        record = []
+
+        if header is None:
+            header = fields
+            continue
+
+        if not any(fields):
+            continue
+
+        if len(fields) != len(header):
+            yield record_line, None, 'Wrong number of columns'
+            continue
+
+        yield _validate(record_line, dict(zip(header, fields)))
+
+    if record:
+        yield first_line, None, 'Unterminated quoted field'
+
+
+IMPORT_READERS = {'ndjson': _ndjson_records, 'csv': _csv_records}
+
+
+def parse_todos(chunks, import_format: str):
+    return IMPORT_READERS[import_format](read_lines(chunks))
+
+
+class TodoCopyLoader:
+    def __init__(self, session, user_id: int):
+        self.session = session
+        self.user_id = user_id
+        self.batch = []
+        self.count = 0
+
+    async def add(self, todo: TodoSchema):
+        self.batch.append((
+            todo.title,
+            todo.description,
+            todo.state.value,
+            self.user_id,
+        ))
+
+        if len(self.batch) >= IMPORT_CHUNK_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        if not self.batch:
+            return
+
+        # COPY direto pela conexão do psycopg, dentro da transação da sessão
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+
+        async with raw_connection.driver_connection.cursor() as cursor:
+            async with cursor.copy(COPY_TODOS) as copy:
+                for row in self.batch:
+                    await copy.write_row(row)
+
+        self.count += len(self.batch)
+        self.batch = []
@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+
+from sqlalchemy import (
+    Date,
+    and_,
+    cast,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi_course.database import engine
+from fastapi_course.models import (
+    RefreshToken,
+    Todo,
+    TodoCounter,
+    TodoDailyActivity,
+    TodoState,
+)
+
+# rotinas de manutenção rodadas fora da API (cron, deploy):
+#
+#   python -m fastapi_course.maintenance repair-counters [--user-id 42]
+#   python -m fastapi_course.maintenance backfill-activity [--user-id 42]
+#   python -m fastapi_course.maintenance prune-refresh-tokens
+
+
+def drift_query(actual, stored, keys, values):
+    # compara as linhas reais (actual) com as guardadas (stored), que têm as
+    # mesmas colunas: devolve as chaves e a diferença de cada valor, só onde
+    # alguma diverge
+    join_on = and_(*(actual.c[key] == stored.c[key] for key in keys))
+    diffs = [
+        (
+            func.coalesce(actual.c[value], 0)
+            - func.coalesce(stored.c[value], 0)
+        ).label(value)
+        for value in values
+    ]
+
+    return (
+        select(
+            *(
+                func.coalesce(actual.c[key], stored.c[key]).label(key)
+                for key in keys
+            ),
+            *diffs,
+        )
+        .select_from(actual.join(stored, join_on, full=True))
+        .where(or_(*(diff != 0 for diff in diffs)))
+    )
+
+
+async def add_drift(session: AsyncSession, model, keys, values, drift):
+    # um statement só: a diferença é calculada sobre um snapshot único da
+    # origem e do agregado e somada (não atribuída) às linhas, então
+    # escritas concorrentes, que os triggers também só somam, continuam
+    # valendo. Devolve as linhas corrigidas, com os valores novos
+    drift = drift.subquery('drift')
+    statement = insert(model).from_select(
+        [*keys, *values],
+        select(drift).order_by(*(drift.c[key] for key in keys)),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={
+            value: getattr(model, value) + statement.excluded[value]
+            for value in values
+        },
+    ).returning(*(getattr(model, column) for column in (*keys, *values)))
+
+    repaired = (await session.execute(statement)).all()
+    await session.commit()
+
+    return repaired
+
+
+COUNTER_KEYS = ('user_id', 'state')
+COUNTER_VALUES = ('count',)
+
+
+def counter_drift(user_id: int | None = None):
+    actual = select(
+        Todo.user_id, Todo.state, func.count().label('count')
+    ).group_by(Todo.user_id, Todo.state)
+    stored = select(TodoCounter.user_id, TodoCounter.state, TodoCounter.count)
+
+    if user_id is not None:
+        actual = actual.where(Todo.user_id == user_id)
+        stored = stored.where(TodoCounter.user_id == user_id)
+
+    return drift_query(
+        actual.subquery('actual'),
+        stored.subquery('stored'),
+        COUNTER_KEYS,
+        COUNTER_VALUES,
+    )
+
+
+async def repair_todo_counters(session: AsyncSession, user_id=None):
+    # devolve (user_id, state, contagem corrigida) dos contadores errados
+    return await add_drift(
+        session,
+        TodoCounter,
+        COUNTER_KEYS,
+        COUNTER_VALUES,
+        counter_drift(user_id),
+    )
+
+
+ACTIVITY_KEYS = ('user_id', 'day')
+ACTIVITY_VALUES = ('created', 'completed')
+
+
+def activity_drift(user_id: int | None = None):
+    # a mesma definição dos triggers: criação pelo dia do created_at e
+    # conclusão (estado done) pelo dia do updated_at
+    created = select(
+        Todo.user_id,
+        cast(Todo.created_at, Date).label('day'),
+        literal(1).label('created'),
+        literal(0).label('completed'),
+    )
+    completed = select(
+        Todo.user_id, cast(Todo.updated_at, Date), literal(0), literal(1)
+    ).where(Todo.state == TodoState.done)
+    stored = select(
+        TodoDailyActivity.user_id,
+        TodoDailyActivity.day,
+        TodoDailyActivity.created,
+        TodoDailyActivity.completed,
+    )
+
+    if user_id is not None:
+        created = created.where(Todo.user_id == user_id)
+        completed = completed.where(Todo.user_id == user_id)
+        stored = stored.where(TodoDailyActivity.user_id == user_id)
+
+    events = union_all(created, completed).subquery('events')
+    actual = select(
+        events.c.user_id,
+        events.c.day,
+        func.sum(events.c.created).label('created'),
+        func.sum(events.c.completed).label('completed'),
+    ).group_by(events.c.user_id, events.c.day)
+
+    return drift_query(
+        actual.subquery('actual'),
+        stored.subquery('stored'),
+        ACTIVITY_KEYS,
+        ACTIVITY_VALUES,
+    )
+
+
+async def backfill_todo_activity(session: AsyncSession, user_id=None):
+    # constrói o histórico das tarefas que já existiam antes do rollup e
+    # corrige dias que tenham divergido; rodar de novo não muda nada.
+    # Devolve (user_id, day, created, completed) dos dias escritos
+    return await add_drift(
+        session,
+        TodoDailyActivity,
+        ACTIVITY_KEYS,
+        ACTIVITY_VALUES,
+        activity_drift(user_id),
+    )
+
+
+async def prune_refresh_tokens(session: AsyncSession):
+    # tokens usados e revogados ficam até expirar: enquanto valeriam, são
+    # eles que denunciam o reuso. Depois disso não servem para mais nada
+    deleted = await session.execute(
+        delete(RefreshToken).where(RefreshToken.expires_at <= func.now())
+    )
+    await session.commit()
+
+    return deleted.rowcount
+
+
+async def repair_counters_command(args):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        repaired = await repair_todo_counters(session, args.user_id)
+
+    for user_id, state, count in repaired:
+        print(f'user {user_id} {state.value}: {count}')
+    print(f'{len(repaired)} counters repaired')
+
+
+async def backfill_activity_command(args):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        written = await backfill_todo_activity(session, args.user_id)
+
+    print(f'{len(written)} activity days written')
+
+
+async def prune_refresh_tokens_command(args):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        deleted = await prune_refresh_tokens(session)
+
+    print(f'{deleted} expired refresh tokens deleted')
+
+
+COMMANDS = {
+    'repair-counters': repair_counters_command,
+    'backfill-activity': backfill_activity_command,
+    'prune-refresh-tokens': prune_refresh_tokens_command,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fastapi_course.maintenance'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    repair = commands.add_parser(
+        'repair-counters',
+        help='recompute todo_counters from todos and fix drifted counts',
+    )
+    repair.add_argument('--user-id', type=int)
+
+    backfill = commands.add_parser(
+        'backfill-activity',
+        help='build todo_daily_activity from the existing todos',
+    )
+    backfill.add_argument('--user-id', type=int)
+
+    commands.add_parser(
+        'prune-refresh-tokens', help='delete expired refresh tokens'
+    )
+
+    return parser.parse_args(argv)
+
+
+async def run(args):
+    try:
+        await COMMANDS[args.command](args)
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
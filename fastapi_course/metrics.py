@@ -0,0 +1,266 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from http import HTTPStatus
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# métricas no formato texto do Prometheus, expostas em /metrics. Cada
+# worker tem os próprios contadores (o Prometheus soma as instâncias).
+# Observar é só uma busca binária nos buckets e alguns incrementos, o que
+# mantém o custo por requisição na casa dos microssegundos
+# (benchmarks/metrics_overhead.py)
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# rotas sem correspondência viram um só rótulo: o caminho cru deixaria a
+# cardinalidade nas mãos de quem faz as requisições
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+
+    pairs = ','.join(
+        f'{name}="{escape(value)}"' for name, value in zip(names, values)
+    )
+    return f'{{{pairs}}}'
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # rótulos -> [contagem por bucket..., +Inf], soma
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                ]
+
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def collect(self):
+        with self._lock:
+            series = {
+                labels: (list(counts), total)
+                for labels, (counts, total) in self._series.items()
+            }
+
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                bucket_labels = format_labels(
+                    (*self.labels, 'le'), (*labels, bound)
+                )
+                yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+
+            label_text = format_labels(self.labels, labels)
+            yield f'{self.name}_sum{label_text} {total}'
+            yield f'{self.name}_count{label_text} {cumulative}'
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} {self.type}'
+        yield f'{self.name} {self.value}'
+
+    def clear(self):
+        with self._lock:
+            self.value = 0
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+
+REQUEST_LABELS = ('method', 'route', 'status')
+
+request_duration = Histogram(
+    'http_request_duration_seconds',
+    'Request latency, including streamed bodies',
+    REQUEST_LABELS,
+    LATENCY_BUCKETS,
+)
+request_db_statements = Histogram(
+    'http_request_db_statements',
+    'Database statements executed per request',
+    REQUEST_LABELS,
+    STATEMENT_BUCKETS,
+)
+request_db_duration = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in database statements per request',
+    REQUEST_LABELS,
+    LATENCY_BUCKETS,
+)
+requests_in_flight = Gauge('http_requests_in_flight', 'Requests being handled')
+db_statements = Counter('db_statements_total', 'Database statements executed')
+db_statement_duration = Counter(
+    'db_statement_duration_seconds_total',
+    'Time spent in database statements',
+)
+password_hash_duration = Histogram(
+    'password_hash_duration_seconds',
+    'Time spent computing Argon2 hashes, excluding queue wait',
+    ('operation',),
+    LATENCY_BUCKETS,
+)
+
+METRICS = (
+    request_duration,
+    request_db_statements,
+    request_db_duration,
+    requests_in_flight,
+    db_statements,
+    db_statement_duration,
+    password_hash_duration,
+)
+
+
+def render():
+    lines = [line for metric in METRICS for line in metric.collect()]
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    for metric in METRICS:
+        metric.clear()
+
+
+class RequestStats:
+    __slots__ = ('statements', 'db_seconds')
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+# estatísticas da requisição em andamento; os eventos do SQLAlchemy rodam
+# no mesmo contexto da tarefa que fez a consulta
+_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    'request_stats', default=None
+)
+
+
+# vale para todas as engines (primário, réplica e as dos testes)
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, *args):
+    conn.info.setdefault('statement_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, *args):
+    elapsed = time.perf_counter() - conn.info['statement_start'].pop()
+    db_statements.inc()
+    db_statement_duration.inc(elapsed)
+
+    if stats := _request_stats.get():
+        stats.statements += 1
+        stats.db_seconds += elapsed
+
+
+@event.listens_for(Engine, 'handle_error')
+def handle_error(context):
+    # o after_cursor_execute não roda quando a consulta falha
+    if context.connection is not None:
+        starts = context.connection.info.get('statement_start')
+        if starts:
+            starts.pop()
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        # sem resposta iniciada (exceção no app) conta como 500
+        status_code = HTTPStatus.INTERNAL_SERVER_ERROR
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        requests_in_flight.inc()
+        start = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_with_status)
+
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_in_flight.dec()
+            _request_stats.reset(token)
+
+            # o roteador deixa a rota no scope: o rótulo é o template
+            # (/todos/{todo_id}), não o caminho com o id
+            route = scope.get('route')
+            labels = (
+                scope['method'],
+                route.path if route else UNMATCHED_ROUTE,
+                int(status_code),
+            )
+            request_duration.observe(elapsed, *labels)
+            request_db_statements.observe(stats.statements, *labels)
+            request_db_duration.observe(stats.db_seconds, *labels)
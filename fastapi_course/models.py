@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-from datetime import datetime
+import uuid
+from datetime import date, datetime
 from enum import Enum
+from typing import Optional
 
-from sqlalchemy import ForeignKey, func
+from sqlalchemy import DDL, ForeignKey, Index, LargeBinary, event, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, registry, relationship
 
 
@@ -43,9 +46,34 @@ class User:
     # excluir um usuarios, os todos dele precisam ser excluidos também
 
 
+# configuração de texto usada na busca (sem stemming, serve para qualquer
+# idioma)
+TODO_SEARCH_CONFIG = 'simple'
+
+
 @table_registry.mapped_as_dataclass
 class Todo:
     __tablename__ = 'todos'
+    # índices dos caminhos de acesso dos routers: toda query filtra por
+    # user_id, a listagem ordena por (created_at, id) com ou sem filtro de
+    # state e o ETag/relatórios olham o updated_at mais recente do usuário
+    __table_args__ = (
+        Index('ix_todos_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index(
+            'ix_todos_user_id_state_created_at_id',
+            'user_id',
+            'state',
+            'created_at',
+            'id',
+        ),
+        Index('ix_todos_user_id_updated_at', 'user_id', 'updated_at'),
+        Index(
+            'ix_todos_search_vector', 'search_vector', postgresql_using='gin'
+        ),
+    )
+    # valores gerados pelo banco (id, created_at, updated_at) voltam no
+    # RETURNING do próprio INSERT/UPDATE, sem um SELECT extra depois
+    __mapper_args__ = {'eager_defaults': True}
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
     title: Mapped[str]
@@ -58,3 +86,206 @@ class Todo:
         init=False, server_default=func.now(), onupdate=func.now()
     )
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
+
+    # mantido pelo trigger abaixo a partir de title e description; deferred
+    # para nunca ser carregado nos selects comuns
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        init=False,
+        nullable=True,
+        deferred=True,
+        repr=False,
+        compare=False,
+    )
+
+
+# o trigger também é criado no create_all (usado pelos testes); em produção
+# quem cria é a migração do search_vector
+event.listen(
+    Todo.__table__,
+    'after_create',
+    DDL(f"""
+        CREATE OR REPLACE FUNCTION todos_search_vector_update()
+        RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector(
+                    '{TODO_SEARCH_CONFIG}', coalesce(NEW.title, '')
+                ), 'A') ||
+                setweight(to_tsvector(
+                    '{TODO_SEARCH_CONFIG}', coalesce(NEW.description, '')
+                ), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER todos_search_vector_update
+        BEFORE INSERT OR UPDATE OF title, description ON todos
+        FOR EACH ROW EXECUTE FUNCTION todos_search_vector_update();
+    """).execute_if(dialect='postgresql'),
+)
+
+
+@table_registry.mapped_as_dataclass
+class TodoCounter:
+    __tablename__ = 'todo_counters'
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('users.id', ondelete='CASCADE'), primary_key=True
+    )
+    state: Mapped[TodoState] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
+
+
+# quantas tarefas cada usuário tem em cada estado, mantido pelos triggers
+# abaixo na mesma transação de qualquer escrita em todos (create, PATCH,
+# DELETE, lote e o COPY do import). São triggers por statement: um lote de
+# 500 linhas vira um único upsert agregado por (user_id, state), e as
+# escritas continuam sendo um statement só do lado da aplicação. As linhas
+# de todo_counters são travadas sempre na mesma ordem para duas escritas
+# concorrentes não entrarem em deadlock
+TODO_COUNTERS_UPSERT = """
+        INSERT INTO todo_counters (user_id, state, count)
+        SELECT user_id, state, sum(delta) FROM ({changes}) AS changes
+        GROUP BY user_id, state
+        HAVING sum(delta) <> 0
+        ORDER BY user_id, state
+        ON CONFLICT (user_id, state)
+        DO UPDATE SET count = todo_counters.count + excluded.count;
+"""
+NEW_ROWS = 'SELECT user_id, state, 1 AS delta FROM new_rows'
+OLD_ROWS = 'SELECT user_id, state, -1 AS delta FROM old_rows'
+COUNTERS_ON_INSERT = TODO_COUNTERS_UPSERT.format(changes=NEW_ROWS)
+COUNTERS_ON_UPDATE = TODO_COUNTERS_UPSERT.format(
+    changes=f'{NEW_ROWS} UNION ALL {OLD_ROWS}'
+)
+COUNTERS_ON_DELETE = TODO_COUNTERS_UPSERT.format(changes=OLD_ROWS)
+
+event.listen(
+    Todo.__table__,
+    'after_create',
+    DDL(f"""
+        CREATE OR REPLACE FUNCTION todo_counters_apply()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN {COUNTERS_ON_INSERT}
+            ELSIF TG_OP = 'UPDATE' THEN {COUNTERS_ON_UPDATE}
+            ELSE {COUNTERS_ON_DELETE}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER todo_counters_insert
+        AFTER INSERT ON todos REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION todo_counters_apply();
+
+        CREATE TRIGGER todo_counters_update
+        AFTER UPDATE ON todos
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION todo_counters_apply();
+
+        CREATE TRIGGER todo_counters_delete
+        AFTER DELETE ON todos REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION todo_counters_apply();
+    """).execute_if(dialect='postgresql'),
+)
+
+
+@table_registry.mapped_as_dataclass
+class TodoDailyActivity:
+    __tablename__ = 'todo_daily_activity'
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('users.id', ondelete='CASCADE'), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(primary_key=True)
+    created: Mapped[int] = mapped_column(default=0)
+    completed: Mapped[int] = mapped_column(default=0)
+
+
+# rollup diário das tarefas de cada usuário, para os gráficos de
+# /todos/activity: created conta as tarefas pelo dia do created_at e
+# completed as que estão em done pelo dia do updated_at (a última
+# alteração). Descreve as tarefas que existem: excluir uma tarefa ou tirá-la
+# de done também a tira do rollup, e por isso o backfill (maintenance.py)
+# reconstrói exatamente o que os triggers mantêm. Mesmo esquema dos
+# contadores: trigger por statement, upsert agregado e ordenado
+TODO_ACTIVITY_UPSERT = """
+        INSERT INTO todo_daily_activity (user_id, day, created, completed)
+        SELECT user_id, day, sum(created), sum(completed)
+        FROM ({changes}) AS changes
+        GROUP BY user_id, day
+        HAVING sum(created) <> 0 OR sum(completed) <> 0
+        ORDER BY user_id, day
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            created = todo_daily_activity.created + excluded.created,
+            completed = todo_daily_activity.completed + excluded.completed;
+"""
+ACTIVITY_ROWS = """
+    SELECT user_id, created_at::date AS day, {sign} AS created,
+        0 AS completed
+    FROM {rows}
+    UNION ALL
+    SELECT user_id, updated_at::date, 0, {sign}
+    FROM {rows} WHERE state = 'done'
+"""
+NEW_ACTIVITY = ACTIVITY_ROWS.format(sign=1, rows='new_rows')
+OLD_ACTIVITY = ACTIVITY_ROWS.format(sign=-1, rows='old_rows')
+ACTIVITY_ON_INSERT = TODO_ACTIVITY_UPSERT.format(changes=NEW_ACTIVITY)
+ACTIVITY_ON_UPDATE = TODO_ACTIVITY_UPSERT.format(
+    changes=f'{NEW_ACTIVITY} UNION ALL {OLD_ACTIVITY}'
+)
+ACTIVITY_ON_DELETE = TODO_ACTIVITY_UPSERT.format(changes=OLD_ACTIVITY)
+
+event.listen(
+    Todo.__table__,
+    'after_create',
+    DDL(f"""
+        CREATE OR REPLACE FUNCTION todo_daily_activity_apply()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN {ACTIVITY_ON_INSERT}
+            ELSIF TG_OP = 'UPDATE' THEN {ACTIVITY_ON_UPDATE}
+            ELSE {ACTIVITY_ON_DELETE}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER todo_daily_activity_insert
+        AFTER INSERT ON todos REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION todo_daily_activity_apply();
+
+        CREATE TRIGGER todo_daily_activity_update
+        AFTER UPDATE ON todos
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION todo_daily_activity_apply();
+
+        CREATE TRIGGER todo_daily_activity_delete
+        AFTER DELETE ON todos REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION todo_daily_activity_apply();
+    """).execute_if(dialect='postgresql'),
+)
+
+
+@table_registry.mapped_as_dataclass
+class RefreshToken:
+    __tablename__ = 'refresh_tokens'
+    # a busca pelo token é pelo índice único de token_hash; a revogação de
+    # uma família inteira (reuso detectado) usa o de family_id
+    __table_args__ = (Index('ix_refresh_tokens_family_id', 'family_id'),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    # só o SHA-256 (32 bytes) do token opaco: quem lê a tabela não
+    # consegue usar os tokens
+    token_hash: Mapped[bytes] = mapped_column(LargeBinary(32), unique=True)
+    # todos os tokens gerados a partir do mesmo login, um por rotação
+    family_id: Mapped[uuid.UUID]
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('users.id', ondelete='CASCADE')
+    )
+    expires_at: Mapped[datetime]
+    # preenchido na rotação: usar o token de novo é sinal de roubo
+    used_at: Mapped[Optional[datetime]] = mapped_column(default=None)
+    revoked_at: Mapped[Optional[datetime]] = mapped_column(default=None)
@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from http import HTTPStatus
+
+from fastapi import HTTPException
+
+# cursores opacos para paginação keyset: o cliente recebe os valores da
+# chave de ordenação da última linha da página, codificados em base64, e a
+# próxima página começa logo depois deles (WHERE (a, b) > (:a, :b)). O custo
+# de cada página não cresce com a profundidade, ao contrário do OFFSET
+
+
+def encode_cursor(*values):
+    payload = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ],
+        separators=(',', ':'),
+    )
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, *types):
+    invalid_cursor = HTTPException(
+        status_code=HTTPStatus.UNPROCESSABLE_CONTENT, detail='Invalid cursor'
+    )
+
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+
+        if not isinstance(values, list) or len(values) != len(types):
+            raise invalid_cursor
+
+        return [
+            datetime.fromisoformat(value)
+            if type_ is datetime
+            else type_(value)
+            for value, type_ in zip(values, types)
+        ]
+
+    except (ValueError, TypeError):
+        raise invalid_cursor
+
+
+def paginate(rows, limit: int, key):
+    # as queries buscam limit + 1 linhas: se a linha extra veio, existe uma
+    # próxima página e o cursor aponta para a última linha entregue
+    page = rows[:limit]
+
+    if len(rows) > limit and page:
+        return page, encode_cursor(*key(page[-1]))
+
+    return page, None
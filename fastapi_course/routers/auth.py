@@ -1,20 +1,24 @@
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, raiseload
 
 from fastapi_course.database import get_session
-from fastapi_course.models import User
-from fastapi_course.schemas import TokenJWT
+from fastapi_course.models import RefreshToken, User
+from fastapi_course.schemas import Message, RefreshTokenRequest, TokenJWT
 from fastapi_course.security import (
     create_access_token,
     get_current_user,
-    verify_password,
+    hash_refresh_token,
+    issue_refresh_token,
+    verify_password_async,
 )
+from fastapi_course.throttling import login_throttle
 
 router = APIRouter(prefix='/auth', tags=['auth'])
 
@@ -28,10 +32,21 @@ Session = Annotated[AsyncSession, Depends(get_session)]
     status_code=HTTPStatus.OK,
     response_class=JSONResponse,
     response_model=TokenJWT,
+    responses={HTTPStatus.TOO_MANY_REQUESTS: {'model': Message}},
 )
-async def login_for_access_token(session: Session, form_data: OAuth2Form):
+async def login_for_access_token(
+    request: Request, session: Session, form_data: OAuth2Form
+):
+    # a sessão só abre conexão na primeira consulta: uma tentativa recusada
+    # aqui não custa nem banco nem hash
+    login_throttle.check(
+        request.client and request.client.host, form_data.username
+    )
+
     db_user = await session.scalar(
-        select(User).where(User.username == form_data.username)
+        select(User)
+        .where(User.username == form_data.username)
+        .options(load_only(User.username, User.password), raiseload('*'))
     )
 
     if not db_user:
@@ -40,15 +55,90 @@ async def login_for_access_token(session: Session, form_data: OAuth2Form):
             detail='Incorrect username or password',
         )
 
-    if not verify_password(form_data.password, db_user.password):
+    if not await verify_password_async(form_data.password, db_user.password):
         raise HTTPException(
             status_code=HTTPStatus.UNAUTHORIZED,
             detail='Incorrect username or password',
         )
 
     token = create_access_token({'sub': form_data.username})
+    refresh_token = await issue_refresh_token(session, db_user.id)
+    await session.commit()
+
+    return {
+        'access_token': token,
+        'refresh_token': refresh_token,
+        'token_type': 'Bearer',
+    }
+
+
+@router.post(
+    '/refresh',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=TokenJWT,
+)
+async def rotate_refresh_token(session: Session, body: RefreshTokenRequest):
+    # troca um refresh token válido por um access token novo e o próximo
+    # refresh token da família, sem senha nem Argon2. Cada refresh token
+    # vale uma vez só: o UPDATE marca o uso e só devolve a linha se ela
+    # ainda não tinha sido usada, revogada nem expirada (duas requisições
+    # com o mesmo token não passam as duas)
+    token_hash = hash_refresh_token(body.refresh_token)
+
+    rotated = (
+        await session.execute(
+            update(RefreshToken)
+            .where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.used_at.is_(None),
+                RefreshToken.revoked_at.is_(None),
+                RefreshToken.expires_at > func.now(),
+                RefreshToken.user_id == User.id,
+            )
+            .values(used_at=func.now())
+            .returning(
+                RefreshToken.user_id, RefreshToken.family_id, User.username
+            )
+            .execution_options(synchronize_session=False)
+        )
+    ).one_or_none()
+
+    if rotated is None:
+        # um token já usado voltando é sinal de que ele vazou: quem usou
+        # primeiro pode ter sido o atacante, então a família inteira
+        # (inclusive o token mais novo, legítimo ou não) deixa de valer
+        await session.execute(
+            update(RefreshToken)
+            .where(
+                RefreshToken.family_id
+                == select(RefreshToken.family_id)
+                .where(
+                    RefreshToken.token_hash == token_hash,
+                    RefreshToken.used_at.is_not(None),
+                )
+                .scalar_subquery(),
+                RefreshToken.revoked_at.is_(None),
+            )
+            .values(revoked_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail='Invalid refresh token',
+        )
+
+    user_id, family_id, username = rotated
+    refresh_token = await issue_refresh_token(session, user_id, family_id)
+    await session.commit()
 
-    return {'access_token': token, 'token_type': 'Bearer'}
+    return {
+        'access_token': create_access_token({'sub': username}),
+        'refresh_token': refresh_token,
+        'token_type': 'Bearer',
+    }
 
 
 @router.post(
@@ -0,0 +1,79 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, Response
+from fastapi.responses import JSONResponse
+
+from fastapi_course import (
+    cache,
+    compression,
+    database,
+    security,
+    throttling,
+)
+from fastapi_course.schemas import (
+    CacheStatus,
+    CompressionStatus,
+    ReadyStatus,
+    ThrottleStatus,
+    TokenCacheStatus,
+)
+
+router = APIRouter(prefix='/health', tags=['health'])
+
+
+@router.get(
+    '/ready',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=ReadyStatus,
+    responses={HTTPStatus.SERVICE_UNAVAILABLE: {'model': ReadyStatus}},
+)
+async def readiness(response: Response):
+    # com o pool esgotado novas requisições ficariam esperando conexão até o
+    # pool_timeout; 503 faz o load balancer mandar tráfego para outro worker
+    pool = database.pool_status(database.engine)
+
+    if pool['exhausted']:
+        response.status_code = HTTPStatus.SERVICE_UNAVAILABLE
+
+    return {'ready': not pool['exhausted'], 'pool': pool}
+
+
+@router.get(
+    '/cache',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=CacheStatus,
+)
+async def cache_status():
+    return cache.response_cache.stats()
+
+
+@router.get(
+    '/compression',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=CompressionStatus,
+)
+async def compression_status():
+    return compression.compression_stats.stats()
+
+
+@router.get(
+    '/throttling',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=ThrottleStatus,
+)
+async def throttling_status():
+    return throttling.login_throttle.stats()
+
+
+@router.get(
+    '/tokens',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=TokenCacheStatus,
+)
+async def token_cache_status():
+    return security.token_cache.stats()
@@ -0,0 +1,22 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from fastapi_course import metrics
+
+router = APIRouter(tags=['metrics'])
+
+# content type do formato texto do Prometheus
+PROMETHEUS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@router.get(
+    '/metrics',
+    status_code=HTTPStatus.OK,
+    response_class=PlainTextResponse,
+)
+async def read_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE
+    )
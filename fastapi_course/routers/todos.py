@@ -1,30 +1,134 @@
+import time
+from datetime import datetime
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import (
+    Integer,
+    String,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi_course.database import get_session
-from fastapi_course.models import Todo, User
+from fastapi_course.activity import activity_buckets
+from fastapi_course.cache import CachedResponse, cache_key, response_cache
+from fastapi_course.conditional import (
+    etag_matches,
+    json_response,
+    make_etag,
+    not_modified,
+)
+from fastapi_course.consistency import (
+    client_pinned_to_primary,
+    pin_reads_to_primary,
+)
+from fastapi_course.database import (
+    get_read_session,
+    get_session,
+    pick_session,
+    recent_writes,
+)
+from fastapi_course.export import (
+    EXPORT_BATCH_SIZE,
+    EXPORT_COLUMNS,
+    EXPORT_WRITERS,
+    MEDIA_TYPES,
+)
+from fastapi_course.importer import (
+    MAX_REPORTED_ERRORS,
+    TodoCopyLoader,
+    parse_todos,
+)
+from fastapi_course.models import (
+    TODO_SEARCH_CONFIG,
+    Todo,
+    TodoCounter,
+    TodoDailyActivity,
+    TodoState,
+    User,
+)
+from fastapi_course.pagination import decode_cursor, paginate
 from fastapi_course.schemas import (
     Message,
+    TodoActivity,
+    TodoActivityFilter,
+    TodoBulkCreate,
+    TodoBulkDelete,
+    TodoBulkResultList,
+    TodoBulkUpdate,
+    TodoExportFilter,
     TodoFilter,
+    TodoImportFilter,
+    TodoImportResult,
     TodoList,
     TodoPublic,
     TodoSchema,
+    TodoSearchFilter,
+    TodoSearchList,
+    TodoStats,
     TodoUpdate,
 )
 from fastapi_course.security import get_current_user
+from fastapi_course.serializers import TODO_COLUMNS, todo_list_json
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 Session = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+PinnedToPrimary = Annotated[bool, Depends(client_pinned_to_primary)]
 T_TodoFilter = Annotated[TodoFilter, Query()]
+T_TodoSearchFilter = Annotated[TodoSearchFilter, Query()]
+T_TodoExportFilter = Annotated[TodoExportFilter, Query()]
+T_TodoImportFilter = Annotated[TodoImportFilter, Query()]
+T_TodoActivityFilter = Annotated[TodoActivityFilter, Query()]
 
 router = APIRouter(prefix='/todos', tags=['todos'])
 
 
+def todos_key(user_id: int):
+    return f'todos:{user_id}'
+
+
+def todos_written(user_id: int):
+    # depois de uma escrita: leituras desse usuário vão para o primário e as
+    # respostas em cache das tarefas dele deixam de valer
+    recent_writes.mark(todos_key(user_id))
+    pin_reads_to_primary()
+    response_cache.invalidate(todos_key(user_id))
+
+
+async def get_todos_read_session(
+    session: Session,
+    read_session: ReadSession,
+    current_user: CurrentUser,
+    pinned: PinnedToPrimary,
+):
+    # logo depois de o usuário escrever nas próprias tarefas a leitura fica
+    # no primário, para não devolver uma lista atrasada da réplica. O
+    # usuário autenticado em si é sempre buscado no primário (um cadastro
+    # recém-feito precisa conseguir logar), então cada leitura roteada
+    # ainda custa um SELECT por chave primária lá
+    return pick_session(
+        session, read_session, todos_key(current_user.id), pinned=pinned
+    )
+
+
+TodosReadSession = Annotated[AsyncSession, Depends(get_todos_read_session)]
+
+HIGHLIGHT_OPTIONS = 'StartSel=<mark>, StopSel=</mark>'
+HIGHLIGHT_ALL_OPTIONS = f'{HIGHLIGHT_OPTIONS}, HighlightAll=true'
+
+
 @router.post(
     '/',
     status_code=HTTPStatus.CREATED,
@@ -41,9 +145,11 @@ async def create_todo(
         state=todo.state,
     )
 
+    # o INSERT já devolve id, created_at e updated_at via RETURNING
+    # (eager_defaults no mapper de Todo), sem precisar de refresh
     session.add(new_todo)
     await session.commit()
-    await session.refresh(new_todo)
+    todos_written(current_user.id)
 
     return new_todo
 
@@ -55,27 +161,415 @@ async def create_todo(
     response_model=TodoList,
 )
 async def read_todos(
-    session: Session, current_user: CurrentUser, todo_filter: T_TodoFilter
+    session: TodosReadSession,
+    current_user: CurrentUser,
+    todo_filter: T_TodoFilter,
+    pinned: PinnedToPrimary,
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
-    query = select(Todo).where(Todo.user_id == current_user.id)
+    params = todo_filter.model_dump(mode='json')
+    key = cache_key(todos_key(current_user.id), params)
+    # antes da consulta: uma escrita concorrente invalida esta leitura
+    version = response_cache.version()
+
+    # quem escreveu há pouco pode estar em outro worker, com o cache ainda
+    # sem a invalidação; essas leituras vão direto ao banco
+    if not pinned and (cached := response_cache.get(key)):
+        return json_response(cached.body, cached.etag, if_none_match)
+
+    conditions = [Todo.user_id == current_user.id]
 
     if todo_filter.title:
-        query = query.filter(Todo.title.contains(todo_filter.title))
+        conditions.append(Todo.title.contains(todo_filter.title))
 
     if todo_filter.description:
-        query = query.filter(
-            Todo.description.contains(todo_filter.description)
-        )
+        conditions.append(Todo.description.contains(todo_filter.description))
 
     if todo_filter.state:
-        query = query.filter(Todo.state == todo_filter.state)
+        conditions.append(Todo.state == todo_filter.state)
+
+    # o ETag resume o conjunto filtrado por (max(updated_at), count): toda
+    # criação, alteração ou exclusão muda um dos dois. Se o cliente já tem
+    # essa versão, responde 304 sem buscar as linhas da página
+    last_updated_at, total = (
+        await session.execute(
+            select(func.max(Todo.updated_at), func.count()).where(*conditions)
+        )
+    ).one()
+    etag = make_etag('todos', current_user.id, params, last_updated_at, total)
+
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    # só as colunas públicas: as linhas viram JSON sem passar pelo ORM
+    query = (
+        select(*TODO_COLUMNS)
+        .where(*conditions)
+        .order_by(Todo.created_at, Todo.id)
+    )
+
+    if todo_filter.cursor:
+        created_at, todo_id = decode_cursor(todo_filter.cursor, datetime, int)
+        query = query.where(
+            tuple_(Todo.created_at, Todo.id) > (created_at, todo_id)
+        )
+    else:
+        query = query.offset(todo_filter.offset)
+
+    todos = await session.execute(query.limit(todo_filter.limit + 1))
+
+    page, next_cursor = paginate(
+        todos.all(), todo_filter.limit, lambda todo: (todo.created_at, todo.id)
+    )
+
+    body = todo_list_json(page, next_cursor)
+    response_cache.set(
+        key,
+        CachedResponse(body, etag),
+        tags=(todos_key(current_user.id),),
+        version=version,
+    )
+
+    return json_response(body, etag)
+
+
+@router.get(
+    '/stats',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=TodoStats,
+)
+async def todo_stats(session: TodosReadSession, current_user: CurrentUser):
+    # lê os contadores mantidos pelos triggers de todos: no máximo uma linha
+    # por estado, qualquer que seja o tamanho da lista do usuário
+    counters = await session.execute(
+        select(TodoCounter.state, TodoCounter.count).where(
+            TodoCounter.user_id == current_user.id
+        )
+    )
+    counts = dict.fromkeys(TodoState, 0) | dict(counters.all())
+
+    return {'counts': counts, 'total': sum(counts.values())}
+
+
+@router.get(
+    '/activity',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=TodoActivity,
+)
+async def todo_activity(
+    session: TodosReadSession,
+    current_user: CurrentUser,
+    activity: T_TodoActivityFilter,
+):
+    # só o rollup diário, pela chave primária (user_id, day): no máximo uma
+    # linha por dia do período, não importa quantas tarefas o usuário tem
+    rows = await session.execute(
+        select(
+            TodoDailyActivity.day,
+            TodoDailyActivity.created,
+            TodoDailyActivity.completed,
+        ).where(
+            TodoDailyActivity.user_id == current_user.id,
+            TodoDailyActivity.day.between(activity.start, activity.end),
+        )
+    )
+
+    return {
+        'granularity': activity.granularity,
+        'buckets': activity_buckets(
+            rows.all(), activity.start, activity.end, activity.granularity
+        ),
+    }
+
+
+@router.get(
+    '/export',
+    status_code=HTTPStatus.OK,
+    response_class=StreamingResponse,
+    responses={
+        HTTPStatus.OK: {
+            'content': {media_type: {} for media_type in MEDIA_TYPES.values()}
+        }
+    },
+)
+async def export_todos(
+    session: TodosReadSession,
+    current_user: CurrentUser,
+    export: T_TodoExportFilter,
+):
+    # stream() abre um cursor no servidor; com yield_per o driver busca
+    # EXPORT_BATCH_SIZE linhas por vez e partitions() entrega cada lote.
+    # A sessão continua aberta até o fim do streaming da resposta
+    query = (
+        select(*EXPORT_COLUMNS)
+        .where(Todo.user_id == current_user.id)
+        .order_by(Todo.created_at, Todo.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    async def partitions():
+        result = await session.stream(query)
+
+        async for rows in result.partitions():
+            yield rows
+
+    return StreamingResponse(
+        EXPORT_WRITERS[export.format](partitions()),
+        media_type=MEDIA_TYPES[export.format],
+        headers={
+            'Content-Disposition': (
+                f'attachment; filename="todos.{export.format}"'
+            )
+        },
+    )
+
+
+@router.get(
+    '/search',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=TodoSearchList,
+)
+async def search_todos(
+    session: Session, current_user: CurrentUser, search: T_TodoSearchFilter
+):
+    # busca textual pelo search_vector (índice GIN), ordenada por relevância.
+    # O websearch_to_tsquery aceita a sintaxe de buscadores: "frase exata",
+    # OR e -exclusão
+    config = func.cast(TODO_SEARCH_CONFIG, REGCONFIG)
+    ts_query = func.websearch_to_tsquery(config, search.q)
+    rank = func.ts_rank(Todo.search_vector, ts_query)
+
+    query = (
+        select(
+            Todo,
+            rank,
+            func.ts_headline(
+                config, Todo.title, ts_query, HIGHLIGHT_ALL_OPTIONS
+            ),
+            func.ts_headline(
+                config, Todo.description, ts_query, HIGHLIGHT_OPTIONS
+            ),
+        )
+        .where(
+            Todo.user_id == current_user.id,
+            Todo.search_vector.bool_op('@@')(ts_query),
+        )
+        .order_by(rank.desc(), Todo.id)
+    )
+
+    if search.state:
+        query = query.filter(Todo.state == search.state)
+
+    rows = await session.execute(
+        query.limit(search.limit).offset(search.offset)
+    )
 
+    hits = []
+    for todo, todo_rank, title_highlight, description_highlight in rows:
+        hit = TodoPublic.model_validate(todo, from_attributes=True)
+        hits.append({
+            **hit.model_dump(),
+            'rank': todo_rank,
+            'title_highlight': title_highlight,
+            'description_highlight': description_highlight,
+        })
+
+    return {'todos': hits}
+
+
+# ========================= OPERAÇÕES EM LOTE =========================
+# cada endpoint aplica todas as operações numa transação só, com um único
+# statement (INSERT/UPDATE/DELETE ... RETURNING) para o lote inteiro, e
+# devolve o resultado de cada item. Precisam ser declarados antes das rotas
+# '/{todo_id}', senão 'bulk' seria interpretado como um id
+
+
+@router.post(
+    '/import',
+    status_code=HTTPStatus.CREATED,
+    response_class=JSONResponse,
+    response_model=TodoImportResult,
+    openapi_extra={
+        'requestBody': {
+            'required': True,
+            'content': {
+                'application/x-ndjson': {'schema': {'type': 'string'}},
+                'text/csv': {'schema': {'type': 'string'}},
+            },
+        }
+    },
+)
+async def import_todos(
+    request: Request,
+    session: Session,
+    current_user: CurrentUser,
+    params: T_TodoImportFilter,
+):
+    # mesmo formato do /todos/export (no csv, a primeira linha é o
+    # cabeçalho); a importação inteira é uma transação só
+    start = time.perf_counter()
+    loader = TodoCopyLoader(session, current_user.id)
+    rejected = 0
+    errors = []
+
+    async for line, todo, detail in parse_todos(
+        request.stream(), params.format
+    ):
+        if todo is None:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line, 'detail': detail})
+            continue
+
+        await loader.add(todo)
+
+    await loader.flush()
+
+    if loader.count:
+        await session.commit()
+        todos_written(current_user.id)
+
+    seconds = time.perf_counter() - start
+
+    return {
+        'imported': loader.count,
+        'rejected': rejected,
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(loader.count / seconds, 1),
+    }
+
+
+@router.post(
+    '/bulk',
+    status_code=HTTPStatus.CREATED,
+    response_class=JSONResponse,
+    response_model=TodoBulkResultList,
+)
+async def create_todos_bulk(
+    bulk: TodoBulkCreate, session: Session, current_user: CurrentUser
+):
     todos = await session.scalars(
-        query.limit(todo_filter.limit).offset(todo_filter.offset)
+        insert(Todo).returning(Todo, sort_by_parameter_order=True),
+        [
+            {'user_id': current_user.id, **todo.model_dump()}
+            for todo in bulk.todos
+        ],
     )
+    todos = todos.all()
+
+    await session.commit()
+    todos_written(current_user.id)
 
-    # all(): Return all scalar values in a sequence
-    return {'todos': todos.all()}
+    return {
+        'results': [
+            {'id': todo.id, 'status': HTTPStatus.CREATED, 'todo': todo}
+            for todo in todos
+        ]
+    }
+
+
+@router.patch(
+    '/bulk',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=TodoBulkResultList,
+)
+async def update_todos_bulk(
+    bulk: TodoBulkUpdate, session: Session, current_user: CurrentUser
+):
+    ids = [item.id for item in bulk.todos]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_CONTENT,
+            detail='Duplicate todo ids',
+        )
+
+    # as alterações viram uma tabela VALUES e o UPDATE ... FROM junta cada
+    # linha com a sua tarefa; campos não enviados (NULL) mantêm o valor atual
+    changes = values(
+        column('id', Integer),
+        column('title', String),
+        column('description', String),
+        column('state', String),
+        name='changes',
+    ).data([
+        (
+            item.id,
+            item.title,
+            item.description,
+            item.state and item.state.value,
+        )
+        for item in bulk.todos
+    ])
+
+    todos = await session.scalars(
+        update(Todo)
+        .where(Todo.id == changes.c.id, Todo.user_id == current_user.id)
+        .values(
+            title=func.coalesce(changes.c.title, Todo.title),
+            description=func.coalesce(changes.c.description, Todo.description),
+            state=func.coalesce(
+                cast(changes.c.state, Todo.__table__.c.state.type), Todo.state
+            ),
+            updated_at=func.now(),
+        )
+        .returning(Todo)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    updated = {todo.id: todo for todo in todos}
+
+    await session.commit()
+    todos_written(current_user.id)
+
+    return {
+        'results': [
+            {'id': todo_id, 'status': HTTPStatus.OK, 'todo': updated[todo_id]}
+            if todo_id in updated
+            else {
+                'id': todo_id,
+                'status': HTTPStatus.NOT_FOUND,
+                'detail': 'Task not found',
+            }
+            for todo_id in ids
+        ]
+    }
+
+
+@router.delete(
+    '/bulk',
+    status_code=HTTPStatus.OK,
+    response_class=JSONResponse,
+    response_model=TodoBulkResultList,
+)
+async def delete_todos_bulk(
+    bulk: TodoBulkDelete, session: Session, current_user: CurrentUser
+):
+    deleted = await session.scalars(
+        delete(Todo)
+        .where(Todo.user_id == current_user.id, Todo.id.in_(bulk.ids))
+        .returning(Todo.id)
+    )
+    deleted = set(deleted.all())
+
+    await session.commit()
+    todos_written(current_user.id)
+
+    return {
+        'results': [
+            {'id': todo_id, 'status': HTTPStatus.OK}
+            if todo_id in deleted
+            else {
+                'id': todo_id,
+                'status': HTTPStatus.NOT_FOUND,
+                'detail': 'Task not found',
+            }
+            for todo_id in bulk.ids
+        ]
+    }
 
 
 @router.delete(
@@ -87,17 +581,21 @@ async def read_todos(
 async def delete_todo(
     todo_id: int, session: Session, current_user: CurrentUser
 ):
-    db_todo = await session.scalar(
-        select(Todo).where(Todo.id == todo_id, Todo.user_id == current_user.id)
+    # a checagem de dono vai no WHERE: um statement só, e nenhuma linha
+    # retornada significa que a tarefa não existe ou é de outro usuário
+    deleted_id = await session.scalar(
+        delete(Todo)
+        .where(Todo.id == todo_id, Todo.user_id == current_user.id)
+        .returning(Todo.id)
     )
 
-    if not db_todo:
+    if not deleted_id:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Task not found'
         )
 
-    await session.delete(db_todo)
     await session.commit()
+    todos_written(current_user.id)
 
     return {'message': 'Task has been deleted successfully'}
 
@@ -111,8 +609,18 @@ async def delete_todo(
 async def update_todo(
     todo_id: int, todo: TodoUpdate, session: Session, current_user: CurrentUser
 ):
+    query = select(Todo)
+    changes = todo.model_dump(exclude_unset=True)
+
+    # UPDATE ... RETURNING com a checagem de dono no WHERE; o updated_at vem
+    # do onupdate da coluna. Sem campos para alterar basta o SELECT
+    if changes:
+        query = update(Todo).values(**changes).returning(Todo)
+
     db_todo = await session.scalar(
-        select(Todo).where(Todo.user_id == current_user.id, Todo.id == todo_id)
+        query.where(
+            Todo.user_id == current_user.id, Todo.id == todo_id
+        ).execution_options(populate_existing=True)
     )
 
     if not db_todo:
@@ -120,11 +628,10 @@ async def update_todo(
             status_code=HTTPStatus.NOT_FOUND, detail='Task not found'
         )
 
-    for key, value in todo.model_dump(exclude_unset=True).items():
-        setattr(db_todo, key, value)
-
-    session.add(db_todo)
-    await session.commit()
-    await session.refresh(db_todo)
+    # um PATCH vazio não escreve nada: não invalida o cache nem prende as
+    # leituras no primário
+    if changes:
+        await session.commit()
+        todos_written(current_user.id)
 
     return db_todo
@@ -1,14 +1,32 @@
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
 
-from fastapi_course.database import get_session
+from fastapi_course.cache import CachedResponse, cache_key, response_cache
+from fastapi_course.conditional import (
+    etag_matches,
+    json_response,
+    make_etag,
+    not_modified,
+)
+from fastapi_course.consistency import (
+    client_pinned_to_primary,
+    pin_reads_to_primary,
+)
+from fastapi_course.database import (
+    get_read_session,
+    get_session,
+    pick_session,
+    recent_writes,
+)
 from fastapi_course.models import User
+from fastapi_course.pagination import decode_cursor, paginate
 from fastapi_course.schemas import (
     FilterPage,
     Message,
@@ -16,14 +34,57 @@ from fastapi_course.schemas import (
     UserPublic,
     UserSchema,
 )
-from fastapi_course.security import get_current_user, get_password_hash
+from fastapi_course.security import (
+    get_current_user,
+    get_current_user_with,
+    get_password_hash_async,
+    token_cache,
+)
+from fastapi_course.serializers import USER_COLUMNS, user_list_json
 from fastapi_course.services import validate_password
 
 router = APIRouter(prefix='/users', tags=['users'])
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
+# excluir o usuário precisa das tarefas carregadas para o cascade do ORM
+CurrentUserWithTodos = Annotated[
+    User, Depends(get_current_user_with(User.todos))
+]
 T_FilterPage = Annotated[FilterPage, Query()]
 Session = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+PinnedToPrimary = Annotated[bool, Depends(client_pinned_to_primary)]
+
+
+# leituras vão para a réplica, exceto logo depois de uma escrita no mesmo
+# recurso: 'users' para a listagem, 'user:{id}' para um usuário
+async def get_users_read_session(
+    session: Session, read_session: ReadSession, pinned: PinnedToPrimary
+):
+    return pick_session(session, read_session, 'users', pinned=pinned)
+
+
+async def get_user_read_session(
+    user_id: int,
+    session: Session,
+    read_session: ReadSession,
+    pinned: PinnedToPrimary,
+):
+    return pick_session(
+        session, read_session, f'user:{user_id}', pinned=pinned
+    )
+
+
+UsersReadSession = Annotated[AsyncSession, Depends(get_users_read_session)]
+UserReadSession = Annotated[AsyncSession, Depends(get_user_read_session)]
+
+
+def users_written(*keys: str):
+    # as mesmas chaves servem para o read-your-writes e para invalidar o
+    # cache de respostas
+    recent_writes.mark(*keys)
+    pin_reads_to_primary()
+    response_cache.invalidate(*keys)
 
 
 @router.post(
@@ -60,12 +121,15 @@ async def create_user(user: UserSchema, session: Session):
     new_user = User(
         username=user.username,
         email=user.email,
-        password=get_password_hash(user.password),
+        password=await get_password_hash_async(user.password),
     )
 
     session.add(new_user)
+    # o INSERT já devolve id, created_at e updated_at via RETURNING; um
+    # refresh aqui custaria mais dois SELECTs (o usuário e, pelo selectin,
+    # as tarefas dele)
     await session.commit()
-    await session.refresh(new_user)  # dar um refresh nos dados do new_user
+    users_written('users', f'user:{new_user.id}')
 
     return new_user
 
@@ -77,13 +141,42 @@ async def create_user(user: UserSchema, session: Session):
     response_model=UserList,
 )
 async def read_users(
-    session: Session, current_user: CurrentUser, filters: T_FilterPage
+    session: UsersReadSession,
+    current_user: CurrentUser,
+    filters: T_FilterPage,
+    pinned: PinnedToPrimary,
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
-    users = await session.scalars(
-        select(User).limit(filters.limit).offset(filters.offset)
+    # a listagem não depende de quem pede: a chave é só a página pedida
+    params = filters.model_dump(mode='json')
+    key = cache_key('users', params)
+    version = response_cache.version()
+
+    if not pinned and (cached := response_cache.get(key)):
+        return json_response(cached.body, cached.etag, if_none_match)
+
+    # só as colunas públicas: as linhas viram JSON sem passar pelo ORM
+    query = select(*USER_COLUMNS).order_by(User.id)
+
+    if filters.cursor:
+        (user_id,) = decode_cursor(filters.cursor, int)
+        query = query.where(User.id > user_id)
+    else:
+        query = query.offset(filters.offset)
+
+    users = await session.execute(query.limit(filters.limit + 1))
+
+    page, next_cursor = paginate(
+        users.all(), filters.limit, lambda user: (user.id,)
     )
 
-    return {'users': users}
+    body = user_list_json(page, next_cursor)
+    etag = make_etag('users', params, body.decode())
+    response_cache.set(
+        key, CachedResponse(body, etag), tags=('users',), version=version
+    )
+
+    return json_response(body, etag, if_none_match)
 
 
 @router.get(
@@ -94,13 +187,37 @@ async def read_users(
 )
 async def read_user(
     user_id: int,
-    session: Session,
+    session: UserReadSession,
     current_user: CurrentUser,
+    pinned: PinnedToPrimary,
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
-    db_user = await session.scalar(select(User).where(User.id == user_id))
+    key = cache_key(f'user:{user_id}')
+    version = response_cache.version()
+
+    if not pinned and (cached := response_cache.get(key)):
+        return json_response(cached.body, cached.etag, if_none_match)
+
+    db_user = await session.scalar(
+        select(User).where(User.id == user_id).options(raiseload('*'))
+    )
 
     if db_user:
-        return db_user
+        # toda escrita no usuário muda o updated_at (onupdate)
+        etag = make_etag('user', db_user.id, db_user.updated_at)
+
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+        body = UserPublic.model_validate(db_user).model_dump_json().encode()
+        response_cache.set(
+            key,
+            CachedResponse(body, etag),
+            tags=(f'user:{user_id}',),
+            version=version,
+        )
+
+        return json_response(body, etag)
 
     raise HTTPException(
         status_code=HTTPStatus.NOT_FOUND, detail='User not found'
@@ -139,10 +256,14 @@ async def update_user(
     try:
         current_user.username = user.username
         current_user.email = user.email
-        current_user.password = get_password_hash(user.password)
+        current_user.password = await get_password_hash_async(user.password)
 
+        # sem refresh: com expire_on_commit=False o objeto já tem tudo o que
+        # o UserPublic precisa, e o refresh recarregaria o relacionamento
         await session.commit()
-        await session.refresh(current_user)
+        users_written('users', f'user:{user_id}')
+        # o token antigo continua assinado, mas o sub já não é o mesmo
+        token_cache.invalidate_user(user_id)
 
         return current_user
 
@@ -162,7 +283,7 @@ async def update_user(
 async def delete_user(
     user_id: int,
     session: Session,
-    current_user: CurrentUser,
+    current_user: CurrentUserWithTodos,
 ):
     if current_user.id != user_id:
         raise HTTPException(
@@ -171,5 +292,7 @@ async def delete_user(
 
     await session.delete(current_user)
     await session.commit()
+    users_written('users', f'user:{user_id}', f'todos:{user_id}')
+    token_cache.invalidate_user(user_id)
 
     return {'message': 'User deleted'}
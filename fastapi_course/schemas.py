@@ -1,7 +1,14 @@
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    EmailStr,
+    Field,
+    field_validator,
+    model_validator,
+)
 
 from fastapi_course.models import TodoState
 
@@ -10,6 +17,80 @@ class Message(BaseModel):
     message: str
 
 
+class PoolStatus(BaseModel):
+    size: int
+    max_overflow: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    exhausted: bool
+    checkout_count: int
+    checkout_timeouts: int
+    checkout_wait_seconds_total: float
+    checkout_wait_seconds_max: float
+
+
+class ReadyStatus(BaseModel):
+    ready: bool
+    pool: PoolStatus
+
+
+class CacheStatus(BaseModel):
+    entries: int
+    bytes: int
+    max_entries: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    stale_writes: int
+
+
+class CompressionTotals(BaseModel):
+    responses: int
+    bytes_in: int
+    bytes_out: int
+
+
+class CompressionStatus(BaseModel):
+    encodings: list[str]
+    minimum_size: int
+    compressed: int
+    skipped: int
+    bytes_in: int
+    bytes_out: int
+    saved_bytes: int
+    by_encoding: dict[str, CompressionTotals]
+
+
+class TokenBucketStatus(BaseModel):
+    keys: int
+    max_keys: int
+    burst: int
+    per_minute: float
+    allowed: int
+    rejected: int
+    evictions: int
+
+
+class ThrottleStatus(BaseModel):
+    enabled: bool
+    ip: TokenBucketStatus
+    username: TokenBucketStatus
+
+
+class TokenCacheStatus(BaseModel):
+    entries: int
+    max_entries: int
+    ttl: float
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
 class UserSchema(BaseModel):
     username: str
     email: EmailStr
@@ -30,16 +111,36 @@ class UserPublic(BaseModel):
 
 class UserList(BaseModel):
     users: list[UserPublic]
+    next_cursor: Optional[str] = None
 
 
 class TokenJWT(BaseModel):
     access_token: str
     token_type: str
+    # só no login e no /auth/refresh
+    refresh_token: Optional[str] = None
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
+# limite máximo de itens por página, independente do que o cliente pedir
+MAX_PAGE_SIZE = 100
 
 
 class FilterPage(BaseModel):
     offset: int = Field(ge=0, default=0)
     limit: int = Field(ge=0, default=10)
+    # quando informado, o cursor substitui o offset (paginação keyset)
+    cursor: Optional[str] = None
+
+    # limites acima do máximo são reduzidos em vez de recusados, para não
+    # quebrar clientes que já pediam páginas maiores
+    @field_validator('limit')
+    @classmethod
+    def clamp_limit(cls, limit: int):
+        return min(limit, MAX_PAGE_SIZE)
 
 
 class TodoSchema(BaseModel):
@@ -56,6 +157,7 @@ class TodoPublic(TodoSchema):
 
 class TodoList(BaseModel):
     todos: list[TodoPublic]
+    next_cursor: Optional[str] = None
 
 
 class TodoUpdate(BaseModel):
@@ -68,3 +170,132 @@ class TodoFilter(FilterPage):
     title: Optional[str] = Field(default=None, min_length=3, max_length=30)
     description: Optional[str] = Field(default=None, min_length=3)
     state: Optional[str] = None
+
+
+class TodoSearchFilter(BaseModel):
+    q: str = Field(min_length=1, max_length=200)
+    state: Optional[str] = None
+    offset: int = Field(ge=0, default=0)
+    limit: int = Field(ge=0, default=10)
+
+    @field_validator('limit')
+    @classmethod
+    def clamp_limit(cls, limit: int):
+        return min(limit, MAX_PAGE_SIZE)
+
+
+class TodoExportFilter(BaseModel):
+    format: Literal['ndjson', 'csv'] = 'ndjson'
+
+
+class TodoImportFilter(BaseModel):
+    format: Literal['ndjson', 'csv'] = 'ndjson'
+
+
+class TodoImportError(BaseModel):
+    line: int
+    detail: str
+
+
+class TodoImportResult(BaseModel):
+    imported: int
+    rejected: int
+    # só as primeiras linhas rejeitadas são detalhadas
+    errors: list[TodoImportError]
+    seconds: float
+    rows_per_second: float
+
+
+class TodoStats(BaseModel):
+    # todos os estados aparecem, mesmo os sem nenhuma tarefa
+    counts: dict[TodoState, int]
+    total: int
+
+
+# maior período de um relatório de atividade; limita o tamanho da resposta
+# (e das linhas lidas do rollup) a cerca de dois anos de dias
+MAX_ACTIVITY_DAYS = 731
+# período padrão, terminando hoje
+DEFAULT_ACTIVITY_DAYS = 30
+
+
+class TodoActivityFilter(BaseModel):
+    # 'from' é palavra reservada em Python: o campo usa um alias
+    start: Optional[date] = Field(default=None, validation_alias='from')
+    end: Optional[date] = Field(default=None, validation_alias='to')
+    granularity: Literal['day', 'week'] = 'day'
+
+    @model_validator(mode='after')
+    def check_period(self):
+        self.end = self.end or date.today()
+        self.start = self.start or self.end - timedelta(
+            days=DEFAULT_ACTIVITY_DAYS - 1
+        )
+
+        if self.start > self.end:
+            raise ValueError("'from' must not be after 'to'")
+
+        if (self.end - self.start).days >= MAX_ACTIVITY_DAYS:
+            raise ValueError(
+                f'Period must be at most {MAX_ACTIVITY_DAYS} days'
+            )
+
+        return self
+
+
+class TodoActivityBucket(BaseModel):
+    # primeiro dia do período (a segunda-feira, em granularity=week)
+    start: date
+    created: int
+    completed: int
+
+
+class TodoActivity(BaseModel):
+    granularity: Literal['day', 'week']
+    buckets: list[TodoActivityBucket]
+
+
+class TodoSearchHit(TodoPublic):
+    rank: float
+    title_highlight: str
+    description_highlight: str
+
+
+class TodoSearchList(BaseModel):
+    todos: list[TodoSearchHit]
+
+
+# máximo de operações por requisição nos endpoints em lote
+MAX_BULK_ITEMS = 500
+
+
+class TodoBulkCreate(BaseModel):
+    todos: list[TodoSchema] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class TodoBulkUpdateItem(BaseModel):
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    state: Optional[TodoState] = None
+
+
+class TodoBulkUpdate(BaseModel):
+    todos: list[TodoBulkUpdateItem] = Field(
+        min_length=1, max_length=MAX_BULK_ITEMS
+    )
+
+
+class TodoBulkDelete(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class TodoBulkResult(BaseModel):
+    id: int
+    status: int
+    detail: Optional[str] = None
+    todo: Optional[TodoPublic] = None
+
+
+class TodoBulkResultList(BaseModel):
+    results: list[TodoBulkResult]
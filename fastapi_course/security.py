@@ -1,3 +1,11 @@
+import asyncio
+import hashlib
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from http import HTTPStatus
 from zoneinfo import ZoneInfo
@@ -7,11 +15,19 @@ from fastapi.security import OAuth2PasswordBearer
 from jwt import DecodeError, decode, encode
 from jwt.exceptions import ExpiredSignatureError
 from pwdlib import PasswordHash
-from sqlalchemy import select
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import (
+    load_only,
+    make_transient_to_detached,
+    raiseload,
+    selectinload,
+)
+from sqlalchemy.orm.attributes import set_committed_value
 
 from fastapi_course.database import get_session
-from fastapi_course.models import User
+from fastapi_course.metrics import password_hash_duration
+from fastapi_course.models import RefreshToken, User
 from fastapi_course.settings import Settings
 
 settings = Settings()
@@ -28,6 +44,68 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHashPool:
+    # o Argon2 leva dezenas de ms de CPU; rodar direto no handler async trava
+    # o event loop e todas as outras requisições do worker. O pool executa o
+    # hash em threads/processos e limita quantos pedidos podem ficar na fila:
+    # acima do limite a requisição é recusada na hora com 503
+    def __init__(self, executor, max_pending: int):
+        self.executor = executor
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    async def run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail='Server busy, try again later',
+                headers={'Retry-After': '1'},
+            )
+
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(
+                self.executor, timed, func, *args
+            )
+            password_hash_duration.observe(elapsed, func.__name__)
+            return result
+        finally:
+            self._slots.release()
+
+
+def timed(func, *args):
+    # roda dentro do executor: mede só o hash, sem a espera na fila
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def create_password_hash_pool():
+    if settings.PASSWORD_HASH_EXECUTOR == 'process':
+        executor = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS
+        )
+    else:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix='password-hash',
+        )
+
+    return PasswordHashPool(executor, settings.PASSWORD_HASH_MAX_PENDING)
+
+
+password_hash_pool = create_password_hash_pool()
+
+
+async def get_password_hash_async(password: str):
+    return await password_hash_pool.run(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await password_hash_pool.run(
+        verify_password, plain_password, hashed_password
+    )
+
+
 def create_access_token(claim: dict):
     # claim = {'sub': username, ...}
     to_encode = claim.copy()
@@ -42,37 +120,226 @@ def create_access_token(claim: dict):
     return encoded_jwt
 
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl='auth/login/')
+# refresh tokens são opacos (256 bits aleatórios) e guardados só como
+# SHA-256: um hash rápido basta, não há o que adivinhar por força bruta
+REFRESH_TOKEN_BYTES = 32
+
+
+def hash_refresh_token(token: str):
+    return hashlib.sha256(token.encode()).digest()
 
 
-async def get_current_user(
-    session: AsyncSession = Depends(get_session),
-    token: str = Depends(oauth2_scheme),
+async def issue_refresh_token(
+    session: AsyncSession, user_id: int, family_id: uuid.UUID | None = None
 ):
-    credentials_exception = HTTPException(
-        status_code=HTTPStatus.UNAUTHORIZED,
-        detail='Could not validate credentials',
-        headers={'WWW-Authenticate': 'Bearer'},
+    # sem family_id começa uma família nova (login); a rotação passa a
+    # família do token usado. O commit fica com quem chama
+    token = secrets.token_urlsafe(REFRESH_TOKEN_BYTES)
+
+    await session.execute(
+        insert(RefreshToken).values(
+            token_hash=hash_refresh_token(token),
+            family_id=family_id or uuid.uuid4(),
+            user_id=user_id,
+            expires_at=func.now()
+            + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        )
     )
 
-    try:
-        payload = decode(token, settings.SECRET_KEY, settings.ALGORITHM)
-        subject_username = payload.get('sub')
+    return token
 
-        if not subject_username:
-            raise credentials_exception
 
-        db_user = await session.scalar(
-            select(User).where(User.username == subject_username)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl='auth/login/')
+
+
+# colunas que os routers realmente usam do usuário autenticado
+PRINCIPAL_COLUMNS = (User.id, User.username, User.email)
+
+
+class VerifiedTokenCache:
+    # o mesmo token chega centenas de vezes: depois da primeira, o principal
+    # verificado fica guardado pelo SHA-256 do token (o token em si não fica
+    # na memória) e as próximas requisições pulam o decode do JWT e o SELECT
+    # do usuário. Cada entrada vale até o exp do token ou o TTL, o que vier
+    # primeiro; update_user/delete_user invalidam as do usuário. O TTL curto
+    # é o atraso máximo dessa invalidação nos outros workers
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # hash do token -> (principal, expira em), na ordem do LRU
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        # mesma ideia do response_cache: uma verificação que começou antes
+        # de uma invalidação não grava o principal antigo
+        self._sequence = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(token: str):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self.key(token)
+        entry = self._entries.get(key)
+
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def version(self):
+        return self._sequence
+
+    def set(self, token: str, principal: dict, exp: float, version: int):
+        if self.max_entries <= 0 or version != self._sequence:
+            return
+
+        # exp é epoch (claim do JWT; sem ele o token não entra no cache); a
+        # validade local usa o relógio monotônico
+        lifetime = min(self.ttl, exp - time.time())
+        if lifetime <= 0:
+            return
+
+        key = self.key(token)
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (principal, time.monotonic() + lifetime)
+        self._keys_by_user.setdefault(principal['id'], set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        self._sequence += 1
+
+        for key in self._keys_by_user.pop(user_id, set()):
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_user.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def _remove(self, key: bytes):
+        principal, _ = self._entries.pop(key)
+        keys = self._keys_by_user.get(principal['id'])
+
+        if keys is not None:
+            keys.discard(key)
+
+            if not keys:
+                del self._keys_by_user[principal['id']]
+
+
+token_cache = VerifiedTokenCache(
+    ttl=settings.TOKEN_CACHE_TTL, max_entries=settings.TOKEN_CACHE_MAX_ENTRIES
+)
+
+
+async def attach_principal(session: AsyncSession, principal: dict):
+    # monta o User só com as colunas do principal e o põe na sessão como
+    # persistente, sem SQL (merge com load=False): o router usa e altera o
+    # objeto como se tivesse vindo do SELECT
+    user = User.__mapper__.class_manager.new_instance()
+    for name, value in principal.items():
+        set_committed_value(user, name, value)
+    make_transient_to_detached(user)
+
+    return await session.merge(user, load=False)
+
+
+def get_current_user_with(*relationships):
+    # por padrão o usuário autenticado carrega só as colunas do principal e
+    # nenhum relacionamento (o lazy='selectin' de User.todos traria todas as
+    # tarefas a cada requisição). Endpoints que realmente precisam de algum
+    # relacionamento pedem explicitamente: get_current_user_with(User.todos)
+    options = [
+        load_only(*PRINCIPAL_COLUMNS),
+        *(selectinload(relationship) for relationship in relationships),
+        raiseload('*'),
+    ]
+
+    async def get_current_user(
+        session: AsyncSession = Depends(get_session),
+        token: str = Depends(oauth2_scheme),
+    ):
+        credentials_exception = HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail='Could not validate credentials',
+            headers={'WWW-Authenticate': 'Bearer'},
         )
 
-        if not db_user:
+        # o cache guarda só o principal: quem pede relacionamentos passa
+        # sempre pelo banco
+        if not relationships and (principal := token_cache.get(token)):
+            return await attach_principal(session, principal)
+
+        version = token_cache.version()
+
+        try:
+            payload = decode(token, settings.SECRET_KEY, settings.ALGORITHM)
+            subject_username = payload.get('sub')
+
+            if not subject_username:
+                raise credentials_exception
+
+            db_user = await session.scalar(
+                select(User)
+                .where(User.username == subject_username)
+                .options(*options)
+            )
+
+            if not db_user:
+                raise credentials_exception
+
+            if not relationships:
+                token_cache.set(
+                    token,
+                    {
+                        column.key: getattr(db_user, column.key)
+                        for column in PRINCIPAL_COLUMNS
+                    },
+                    payload.get('exp', 0),
+                    version,
+                )
+
+            return db_user
+
+        except DecodeError:
+            raise credentials_exception
+
+        except ExpiredSignatureError:
             raise credentials_exception
 
-        return db_user
+    return get_current_user
 
-    except DecodeError:
-        raise credentials_exception
 
-    except ExpiredSignatureError:
-        raise credentials_exception
+get_current_user = get_current_user_with()
@@ -0,0 +1,64 @@
+from typing import Any, Optional, override
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+
+from fastapi_course.models import Todo, User
+
+# caminho rápido de serialização: as listagens buscam só as colunas
+# públicas e vão direto das tuplas do banco para bytes, sem montar objetos
+# do ORM nem validar de novo com TodoPublic/UserPublic. O JSON gerado é o
+# mesmo byte a byte de TodoList/UserList.model_dump_json()
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+
+def dumps(content: Any):
+    # orjson, quando instalado; senão o encoder em Rust do pydantic-core,
+    # que já vem com o FastAPI. Os dois escrevem datetimes UTC com 'Z'
+    if orjson is not None:
+        return orjson.dumps(
+            content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
+
+    return pydantic_core.to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    # opt-in: response_class=FastJSONResponse. Só troca o encoder; a
+    # validação pelo response_model continua a cargo da rota
+    @override
+    def render(self, content: Any):
+        return dumps(content)
+
+
+# mesma ordem dos campos de TodoPublic (herdados de TodoSchema primeiro)
+TODO_FIELDS = (
+    'title',
+    'description',
+    'state',
+    'id',
+    'created_at',
+    'updated_at',
+)
+TODO_COLUMNS = tuple(getattr(Todo, field) for field in TODO_FIELDS)
+
+USER_FIELDS = ('id', 'username', 'email')
+USER_COLUMNS = tuple(getattr(User, field) for field in USER_FIELDS)
+
+
+def todo_list_json(rows, next_cursor: Optional[str] = None):
+    return dumps({
+        'todos': [dict(zip(TODO_FIELDS, row)) for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+
+def user_list_json(rows, next_cursor: Optional[str] = None):
+    return dumps({
+        'users': [dict(zip(USER_FIELDS, row)) for row in rows],
+        'next_cursor': next_cursor,
+    })
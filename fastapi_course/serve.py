@@ -0,0 +1,190 @@
+import argparse
+import logging
+import os
+import signal
+import sys
+import time
+
+import uvicorn
+
+from fastapi_course.database import engine, read_engine
+from fastapi_course.settings import Settings
+
+# servidor de produção: um processo supervisor abre o socket, (opcionalmente)
+# importa a aplicação uma vez só e faz fork de N workers uvicorn que
+# compartilham o socket. Com o preload os workers já nascem com tudo
+# importado, e o boot não passa pelo resolver do poetry
+#
+#   python -m fastapi_course.serve --workers 4
+
+APP = 'fastapi_course.app:app'
+
+logger = logging.getLogger('uvicorn.error')
+
+
+def parse_args(argv=None):
+    settings = Settings()
+
+    parser = argparse.ArgumentParser(prog='python -m fastapi_course.serve')
+    parser.add_argument('--app', default=APP, help='módulo:atributo ASGI')
+    parser.add_argument('--host', default=settings.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=settings.SERVER_PORT)
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=settings.SERVER_WORKERS or os.cpu_count() or 1,
+    )
+    parser.add_argument(
+        '--preload',
+        action=argparse.BooleanOptionalAction,
+        default=settings.SERVER_PRELOAD,
+    )
+    parser.add_argument(
+        '--graceful-timeout',
+        type=int,
+        default=settings.SERVER_GRACEFUL_TIMEOUT,
+        help='segundos para terminar as requisições em andamento',
+    )
+
+    return parser.parse_args(argv)
+
+
+def init_worker():
+    # a engine criada no processo pai não pode reaproveitar conexões depois
+    # do fork: cada worker começa com o próprio pool
+    engine.sync_engine.dispose(close=False)
+    read_engine.sync_engine.dispose(close=False)
+
+
+# um worker que morre antes de MIN_UPTIME segundos conta como falha no boot
+# (import quebrado, configuração inválida...). Cada falha seguida dobra a
+# espera antes do próximo fork e, depois de MAX_FAST_CRASHES, o supervisor
+# desiste e sai com erro em vez de ficar num loop de fork
+MIN_UPTIME = 5
+MAX_FAST_CRASHES = 5
+RESTART_BACKOFF = 0.1
+RESTART_BACKOFF_MAX = 10
+
+
+class Supervisor:
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.children = {}
+        self.should_exit = False
+        self.exit_code = 0
+        self.fast_crashes = 0
+
+    def spawn(self, sock):
+        pid = os.fork()
+
+        if pid == 0:  # pragma: no cover
+            # o uvicorn instala os próprios handlers de SIGTERM/SIGINT (para
+            # de aceitar conexões e espera as requisições em andamento); até
+            # lá vale o comportamento padrão, não o handler do supervisor
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 1
+
+            try:
+                init_worker()
+                uvicorn.Server(self.config).run(sockets=[sock])
+                exit_code = 0
+
+            finally:
+                # nunca volta para o loop do supervisor, nem com exceção
+                os._exit(exit_code)
+
+        self.children[pid] = time.monotonic()
+
+    def handle_exit(self, sig, frame):
+        self.should_exit = True
+
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+
+    def worker_exited(self, pid, status):
+        started_at = self.children.pop(pid)
+        exit_code = os.waitstatus_to_exitcode(status)
+
+        # depois do shutdown gracioso o uvicorn repete o sinal recebido,
+        # então no desligamento morrer pelo SIGTERM também é saída limpa
+        stopped = self.should_exit and exit_code == -signal.SIGTERM
+
+        if exit_code != 0 and not stopped:
+            self.exit_code = 1
+
+        if self.should_exit:
+            return
+
+        logger.warning('Worker [%d] died (exit code %d)', pid, exit_code)
+
+        if time.monotonic() - started_at < MIN_UPTIME:
+            self.fast_crashes += 1
+        else:
+            self.fast_crashes = 0
+
+        if self.fast_crashes >= MAX_FAST_CRASHES:
+            logger.error(
+                'Workers keep crashing on startup, shutting down supervisor'
+            )
+            self.exit_code = 1
+            self.handle_exit(signal.SIGTERM, None)
+            return
+
+        if self.fast_crashes:
+            time.sleep(
+                min(
+                    RESTART_BACKOFF * 2 ** (self.fast_crashes - 1),
+                    RESTART_BACKOFF_MAX,
+                )
+            )
+
+    def run(self, sock):
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        signal.signal(signal.SIGINT, self.handle_exit)
+
+        for _ in range(self.workers):
+            self.spawn(sock)
+
+        logger.info(
+            'Supervisor [%d] started %d workers', os.getpid(), self.workers
+        )
+
+        while self.children:
+            pid, status = os.wait()
+            self.worker_exited(pid, status)
+
+            if not self.should_exit:
+                self.spawn(sock)
+
+        sock.close()
+        logger.info('Supervisor [%d] finished', os.getpid())
+
+        return self.exit_code
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = uvicorn.Config(
+        args.app,
+        host=args.host,
+        port=args.port,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+    )
+
+    if args.workers == 1:
+        uvicorn.Server(config).run()
+        return
+
+    sock = config.bind_socket()
+
+    if args.preload:
+        config.load()
+
+    sys.exit(Supervisor(config, args.workers).run(sock))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,3 +12,60 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    # cache (por worker) dos access tokens já verificados; 0 entradas
+    # desliga. O TTL limita quanto tempo outro worker ainda aceita o token
+    # de um usuário alterado ou excluído
+    TOKEN_CACHE_TTL: float = 30
+    TOKEN_CACHE_MAX_ENTRIES: int = 10_000
+
+    # refresh tokens renovam o access token sem senha (e sem Argon2)
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+
+    # pool de conexões do banco (por worker)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+
+    # réplica opcional para as leituras; sem ela tudo vai para o primário.
+    # Depois de uma escrita, as leituras do mesmo recurso ficam no primário
+    # por READ_YOUR_WRITES_WINDOW segundos (deve cobrir o atraso da réplica)
+    READ_DATABASE_URL: Optional[str] = None
+    READ_YOUR_WRITES_WINDOW: float = 5
+
+    # cache de respostas das leituras (por worker); 0 entradas desliga. Com
+    # vários workers o TTL é o atraso máximo de uma invalidação feita em
+    # outro worker
+    RESPONSE_CACHE_TTL: float = 5
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10_000
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # compressão das respostas (gzip; brotli/zstd se instalados). Corpos
+    # menores que COMPRESSION_MINIMUM_SIZE bytes vão sem compressão
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_LEVEL: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # hash de senhas (Argon2) roda fora do event loop, num pool limitado
+    PASSWORD_HASH_EXECUTOR: Literal['thread', 'process'] = 'thread'
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # limite de tentativas de login (token buckets por IP e por username,
+    # por worker): acima dele 429 antes de consultar o banco ou rodar o
+    # Argon2. LOGIN_THROTTLE_MAX_KEYS limita a memória de cada balde
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_THROTTLE_IP_BURST: int = 20
+    LOGIN_THROTTLE_IP_PER_MINUTE: float = 60
+    LOGIN_THROTTLE_USERNAME_BURST: int = 5
+    LOGIN_THROTTLE_USERNAME_PER_MINUTE: float = 6
+    LOGIN_THROTTLE_MAX_KEYS: int = 50_000
+
+    # servidor de produção (python -m fastapi_course.serve)
+    SERVER_HOST: str = '0.0.0.0'
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: Optional[int] = None
+    SERVER_PRELOAD: bool = True
+    SERVER_GRACEFUL_TIMEOUT: int = 30
@@ -0,0 +1,153 @@
+import math
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from typing import Protocol
+
+from fastapi import HTTPException
+
+from fastapi_course.settings import Settings
+
+# limite de tentativas de login. Cada tentativa com usuário existente custa
+# um verify do Argon2 (dezenas de ms de CPU), então uma rajada de credential
+# stuffing ocuparia todos os workers. Antes de qualquer consulta ou hash a
+# tentativa gasta uma ficha do balde do IP e outra do balde do username;
+# sem ficha a resposta é 429 com Retry-After
+#
+# o backend padrão guarda os baldes em memória, por worker (com N workers o
+# limite efetivo é até N vezes maior) e num LRU com número máximo de chaves:
+# a memória não cresce com a quantidade de IPs/usernames distintos. Um
+# backend compartilhado (Redis...) só precisa implementar TokenBuckets
+
+
+class TokenBuckets(Protocol):
+    def take(self, key: str) -> float: ...
+
+    def clear(self): ...
+
+    def stats(self) -> dict: ...
+
+
+class MemoryTokenBuckets:
+    def __init__(self, burst: int, per_minute: float, max_keys: int):
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.max_keys = max_keys
+
+        # chave -> [fichas, instante da última atualização]
+        self._buckets = OrderedDict()
+
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def take(self, key: str, now: float | None = None):
+        # gasta uma ficha; devolve 0 ou, sem ficha, quantos segundos faltam
+        # para a próxima
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(
+                self.burst, bucket[0] + (now - bucket[1]) * self.rate
+            )
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self.allowed += 1
+            return 0.0
+
+        self.rejected += 1
+        return (1 - bucket[0]) / self.rate if self.rate else math.inf
+
+    def clear(self):
+        self._buckets.clear()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {
+            'keys': len(self._buckets),
+            'max_keys': self.max_keys,
+            'burst': self.burst,
+            'per_minute': self.rate * 60,
+            'allowed': self.allowed,
+            'rejected': self.rejected,
+            'evictions': self.evictions,
+        }
+
+
+# Retry-After quando o balde não recarrega (per_minute = 0)
+MAX_RETRY_AFTER = 3600
+
+
+class LoginThrottle:
+    def __init__(
+        self,
+        by_ip: TokenBuckets,
+        by_username: TokenBuckets,
+        enabled: bool = True,
+    ):
+        self.by_ip = by_ip
+        self.by_username = by_username
+        self.enabled = enabled
+
+    def check(self, ip: str | None, username: str):
+        if not self.enabled:
+            return
+
+        # o IP primeiro: uma rajada de um IP só não gasta as fichas dos
+        # usernames que ela tenta
+        wait = self.by_ip.take(ip or 'unknown') or self.by_username.take(
+            username
+        )
+
+        if wait:
+            raise HTTPException(
+                status_code=HTTPStatus.TOO_MANY_REQUESTS,
+                detail='Too many login attempts, try again later',
+                headers={
+                    'Retry-After': str(min(math.ceil(wait), MAX_RETRY_AFTER))
+                },
+            )
+
+    def clear(self):
+        self.by_ip.clear()
+        self.by_username.clear()
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'ip': self.by_ip.stats(),
+            'username': self.by_username.stats(),
+        }
+
+
+def create_login_throttle():
+    settings = Settings()
+
+    return LoginThrottle(
+        by_ip=MemoryTokenBuckets(
+            burst=settings.LOGIN_THROTTLE_IP_BURST,
+            per_minute=settings.LOGIN_THROTTLE_IP_PER_MINUTE,
+            max_keys=settings.LOGIN_THROTTLE_MAX_KEYS,
+        ),
+        by_username=MemoryTokenBuckets(
+            burst=settings.LOGIN_THROTTLE_USERNAME_BURST,
+            per_minute=settings.LOGIN_THROTTLE_USERNAME_PER_MINUTE,
+            max_keys=settings.LOGIN_THROTTLE_MAX_KEYS,
+        ),
+        enabled=settings.LOGIN_THROTTLE_ENABLED,
+    )
+
+
+login_throttle = create_login_throttle()
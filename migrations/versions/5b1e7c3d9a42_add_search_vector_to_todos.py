@@ -0,0 +1,82 @@
+"""add search_vector to todos
+
+Revision ID: 5b1e7c3d9a42
+Revises: cebde90c1185
+Create Date: 2025-11-10 19:42:11.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e7c3d9a42'
+down_revision: Union[str, Sequence[str], None] = 'cebde90c1185'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}description, '')), 'B')
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # coluna nula sem default: só altera o catálogo, não reescreve a tabela
+    op.add_column(
+        'todos',
+        sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True),
+    )
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION todos_search_vector_update()
+        RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER todos_search_vector_update
+        BEFORE INSERT OR UPDATE OF title, description ON todos
+        FOR EACH ROW EXECUTE FUNCTION todos_search_vector_update()
+    """)
+
+    # o backfill e o índice rodam fora da transação da migração: cada lote
+    # é uma transação curta e o CREATE INDEX CONCURRENTLY não bloqueia
+    # escritas na tabela enquanto o índice é construído
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        max_id = connection.scalar(sa.text('SELECT max(id) FROM todos')) or 0
+
+        for start in range(0, max_id, BATCH_SIZE):
+            connection.execute(
+                sa.text(f"""
+                    UPDATE todos SET search_vector = {SEARCH_VECTOR.format(row='')}
+                    WHERE id > :start AND id <= :end
+                      AND search_vector IS NULL
+                """),
+                {'start': start, 'end': start + BATCH_SIZE},
+            )
+
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_todos_search_vector '
+            'ON todos USING gin (search_vector)'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_todos_search_vector')
+
+    op.execute('DROP TRIGGER IF EXISTS todos_search_vector_update ON todos')
+    op.execute('DROP FUNCTION IF EXISTS todos_search_vector_update()')
+    op.drop_column('todos', 'search_vector')
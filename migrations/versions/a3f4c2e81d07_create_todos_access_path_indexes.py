@@ -0,0 +1,51 @@
+"""create todos access path indexes
+
+Revision ID: a3f4c2e81d07
+Revises: 5b1e7c3d9a42
+Create Date: 2025-11-12 20:15:37.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f4c2e81d07'
+down_revision: Union[str, Sequence[str], None] = '5b1e7c3d9a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_todos_user_id_created_at_id': ['user_id', 'created_at', 'id'],
+    'ix_todos_user_id_state_created_at_id': [
+        'user_id', 'state', 'created_at', 'id'
+    ],
+    'ix_todos_user_id_updated_at': ['user_id', 'updated_at'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY não bloqueia escritas, mas não roda dentro de transação
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(
+                name,
+                'todos',
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(
+                name,
+                table_name='todos',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,87 @@
+"""create todo_counters
+
+Revision ID: c7d2e9a41b58
+Revises: a3f4c2e81d07
+Create Date: 2025-11-14 18:03:52.417339
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e9a41b58'
+down_revision: Union[str, Sequence[str], None] = 'a3f4c2e81d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS_UPSERT = """
+        INSERT INTO todo_counters (user_id, state, count)
+        SELECT user_id, state, sum(delta) FROM ({changes}) AS changes
+        GROUP BY user_id, state
+        HAVING sum(delta) <> 0
+        ORDER BY user_id, state
+        ON CONFLICT (user_id, state)
+        DO UPDATE SET count = todo_counters.count + excluded.count;
+"""
+NEW_ROWS = 'SELECT user_id, state, 1 AS delta FROM new_rows'
+OLD_ROWS = 'SELECT user_id, state, -1 AS delta FROM old_rows'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('todo_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('state', postgresql.ENUM(name='todostate', create_type=False), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'state')
+    )
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION todo_counters_apply()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN {COUNTERS_UPSERT.format(changes=NEW_ROWS)}
+            ELSIF TG_OP = 'UPDATE' THEN {COUNTERS_UPSERT.format(changes=f'{NEW_ROWS} UNION ALL {OLD_ROWS}')}
+            ELSE {COUNTERS_UPSERT.format(changes=OLD_ROWS)}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER todo_counters_insert
+        AFTER INSERT ON todos REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION todo_counters_apply()
+    """)
+    op.execute("""
+        CREATE TRIGGER todo_counters_update
+        AFTER UPDATE ON todos
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION todo_counters_apply()
+    """)
+    op.execute("""
+        CREATE TRIGGER todo_counters_delete
+        AFTER DELETE ON todos REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION todo_counters_apply()
+    """)
+
+    # o CREATE TRIGGER trava as escritas em todos até o fim da migração: a
+    # contagem inicial não perde nenhuma tarefa criada no meio do caminho
+    op.execute("""
+        INSERT INTO todo_counters (user_id, state, count)
+        SELECT user_id, state, count(*) FROM todos GROUP BY user_id, state
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER IF EXISTS todo_counters_delete ON todos')
+    op.execute('DROP TRIGGER IF EXISTS todo_counters_update ON todos')
+    op.execute('DROP TRIGGER IF EXISTS todo_counters_insert ON todos')
+    op.execute('DROP FUNCTION IF EXISTS todo_counters_apply()')
+    op.drop_table('todo_counters')
@@ -1,5 +1,6 @@
 from contextlib import contextmanager
 from datetime import datetime
+from typing import override
 
 import factory
 import factory.fuzzy
@@ -11,10 +12,17 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from testcontainers.postgres import PostgresContainer
 
 from fastapi_course.app import app
-from fastapi_course.database import get_session
+from fastapi_course.cache import response_cache
+from fastapi_course.compression import compression_stats
+from fastapi_course.database import (
+    get_read_session,
+    get_session,
+    recent_writes,
+)
 from fastapi_course.models import Todo, TodoState, User, table_registry
-from fastapi_course.security import get_password_hash
+from fastapi_course.security import get_password_hash, token_cache
 from fastapi_course.settings import Settings
+from fastapi_course.throttling import login_throttle
 
 # o arquivo conftest.py é um arquivo de configuração de testes do pytest
 
@@ -41,24 +49,66 @@ class TodoFactory(factory.Factory):
     user_id = 1
 
 
+class QueryBudgetClient(TestClient):
+    # cada requisição feita pelo cliente precisa caber no orçamento de
+    # statements declarado com @pytest.mark.query_budget(n)
+    def __init__(self, app, count_queries, budget: int | None):
+        super().__init__(app)
+        self.count_queries = count_queries
+        self.budget = budget
+
+    @override
+    def request(self, *args, **kwargs):
+        if self.budget is None:
+            return super().request(*args, **kwargs)
+
+        with self.count_queries(budget=self.budget):
+            return super().request(*args, **kwargs)
+
+    @contextmanager
+    def unbudgeted(self):
+        # requisições de preparação (o login do fixture token) ficam fora
+        # do orçamento, que é do que o teste exercita
+        budget, self.budget = self.budget, None
+        try:
+            yield self
+        finally:
+            self.budget = budget
+
+
 @pytest.fixture
-def client(session: AsyncSession):
+def client(session: AsyncSession, count_queries, request):
     def get_session_override():
         return session
 
-    with TestClient(app) as client:
+    marker = request.node.get_closest_marker('query_budget')
+    budget = marker.args[0] if marker else None
+
+    with QueryBudgetClient(app, count_queries, budget) as client:
         app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
         yield client
 
     app.dependency_overrides.clear()
+    recent_writes.clear()
+    response_cache.clear()
+    compression_stats.clear()
+    login_throttle.clear()
+    token_cache.clear()
 
 
 # essa fixture vai criar um banco de dados pra sessão inteira pra executar
 # todos os testes
 @pytest.fixture(scope='session')
 def engine():
+    # as tabelas (e o tipo enum todostate) são recriadas a cada teste: um
+    # statement preparado automaticamente pelo psycopg numa conexão do pool
+    # guardaria o OID do tipo antigo ("cache lookup failed for type")
     with PostgresContainer('postgres:18', driver='psycopg') as postgres:
-        yield create_async_engine(postgres.get_connection_url())
+        yield create_async_engine(
+            postgres.get_connection_url(),
+            connect_args={'prepare_threshold': None},
+        )
 
 
 @pytest_asyncio.fixture
@@ -97,6 +147,60 @@ def mock_db_time():
     return _mock_db_time
 
 
+@pytest.fixture
+def count_queries(engine):
+    # registra os statements SQL que passam pela engine enquanto o bloco with
+    # estiver aberto. Com budget, falha listando os statements quando o
+    # bloco executa mais do que o orçamento
+    @contextmanager
+    def _count_queries(budget: int | None = None):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(
+            engine.sync_engine, 'before_cursor_execute', before_cursor_execute
+        )
+
+        try:
+            yield statements
+        finally:
+            event.remove(
+                engine.sync_engine,
+                'before_cursor_execute',
+                before_cursor_execute,
+            )
+
+        if budget is not None and len(statements) > budget:
+            listing = '\n'.join(
+                f'  {number}. {" ".join(statement.split())}'
+                for number, statement in enumerate(statements, 1)
+            )
+            pytest.fail(
+                f'{len(statements)} SQL statements, budget is {budget}:\n'
+                f'{listing}',
+                pytrace=False,
+            )
+
+    return _count_queries
+
+
+# módulos em que todo teste precisa declarar o orçamento de queries
+QUERY_BUDGET_MODULES = {'test_todos.py', 'test_users.py'}
+
+
+def pytest_collection_modifyitems(items):
+    for item in items:
+        if (
+            item.path.name in QUERY_BUDGET_MODULES
+            and not item.get_closest_marker('query_budget')
+        ):
+            raise pytest.UsageError(
+                f'{item.nodeid} must declare @pytest.mark.query_budget(n)'
+            )
+
+
 @pytest_asyncio.fixture
 async def user(session: AsyncSession):
     password = 'Test@123'
@@ -134,10 +238,11 @@ async def other_user(session: AsyncSession):
 
 @pytest.fixture
 def token(client, user):
-    response = client.post(
-        'auth/login/',
-        data={'username': user.username, 'password': user.clean_password},
-    )
+    with client.unbudgeted():
+        response = client.post(
+            'auth/login/',
+            data={'username': user.username, 'password': user.clean_password},
+        )
 
     return response.json()['access_token']
 
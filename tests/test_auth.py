@@ -1,8 +1,13 @@
+from datetime import datetime
 from http import HTTPStatus
 
+import pytest
 from freezegun import freeze_time
+from sqlalchemy import select, update
 
-from fastapi_course.security import create_access_token
+from fastapi_course.models import RefreshToken
+from fastapi_course.security import create_access_token, hash_refresh_token
+from fastapi_course.throttling import login_throttle
 
 
 def test_login_access_token(client, user):
@@ -126,3 +131,118 @@ def test_token_expired_dont_refresh(client, user):
 
         assert response.status_code == HTTPStatus.UNAUTHORIZED
         assert response.json() == {'detail': 'Could not validate credentials'}
+
+
+def test_login_throttled_before_any_query(client, user, count_queries):
+    burst = login_throttle.by_username.burst
+    data = {'username': user.username, 'password': 'wrong_password'}
+
+    for _ in range(burst):
+        response = client.post('auth/login/', data=data)
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    with count_queries() as statements:
+        response = client.post('auth/login/', data=data)
+
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert response.json() == {
+        'detail': 'Too many login attempts, try again later'
+    }
+    assert int(response.headers['Retry-After']) > 0
+    assert statements == []
+
+    # outro username do mesmo IP ainda pode tentar
+    response = client.post(
+        'auth/login/',
+        data={'username': 'someone_else', 'password': 'wrong_password'},
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def login(client, user):
+    response = client.post(
+        'auth/login/',
+        data={'username': user.username, 'password': user.clean_password},
+    )
+    assert response.status_code == HTTPStatus.OK
+    return response.json()
+
+
+def test_refresh_token_rotation(client, user, count_queries):
+    first = login(client, user)
+    # a renovação não passa pelo Argon2: marca o token como usado e grava o
+    # próximo, sem buscar o usuário de novo
+    expected_statements = 2
+
+    with count_queries() as statements:
+        response = client.post(
+            '/auth/refresh', json={'refresh_token': first['refresh_token']}
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(statements) == expected_statements
+    second = response.json()
+    assert second['token_type'] == 'Bearer'
+    assert second['refresh_token'] != first['refresh_token']
+
+    response = client.get(
+        f'/users/{user.id}',
+        headers={'Authorization': f'Bearer {second["access_token"]}'},
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = client.post(
+        '/auth/refresh', json={'refresh_token': second['refresh_token']}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_refresh_token_reuse_revokes_the_family(client, user):
+    first = login(client, user)
+    other_session = login(client, user)
+    second = client.post(
+        '/auth/refresh', json={'refresh_token': first['refresh_token']}
+    ).json()
+
+    # o token já rotacionado volta: a família inteira é revogada
+    response = client.post(
+        '/auth/refresh', json={'refresh_token': first['refresh_token']}
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json() == {'detail': 'Invalid refresh token'}
+
+    response = client.post(
+        '/auth/refresh', json={'refresh_token': second['refresh_token']}
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    # outro login é outra família
+    response = client.post(
+        '/auth/refresh', json={'refresh_token': other_session['refresh_token']}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_expired_or_unknown(client, user, session):
+    tokens = login(client, user)
+    await session.execute(
+        update(RefreshToken).values(expires_at=datetime(2020, 1, 1))
+    )
+    await session.commit()
+
+    for refresh_token in (tokens['refresh_token'], 'not-a-token'):
+        response = client.post(
+            '/auth/refresh', json={'refresh_token': refresh_token}
+        )
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_refresh_tokens_are_stored_hashed(client, user, session):
+    tokens = login(client, user)
+
+    stored = await session.scalar(select(RefreshToken.token_hash))
+
+    assert stored == hash_refresh_token(tokens['refresh_token'])
+    assert tokens['refresh_token'].encode() not in stored
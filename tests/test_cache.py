@@ -0,0 +1,113 @@
+from fastapi_course.cache import CachedResponse, MemoryResponseCache, cache_key
+
+
+def response(body=b'{}'):
+    return CachedResponse(body, 'W/"etag"')
+
+
+def test_cache_key_normalizes_params():
+    assert cache_key('todos:1', {'b': 2, 'a': 1}) == cache_key(
+        'todos:1', {'a': 1, 'b': 2}
+    )
+
+
+def test_get_counts_hits_and_misses():
+    cache = MemoryResponseCache(ttl=60, max_entries=10, max_bytes=1024)
+
+    assert cache.get('a') is None
+    cache.set('a', response(), tags=(), version=0)
+
+    assert cache.get('a') == response()
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = MemoryResponseCache(ttl=0, max_entries=10, max_bytes=1024)
+
+    cache.set('a', response(), tags=(), version=0)
+
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_evicts_least_recently_used_over_max_entries():
+    cache = MemoryResponseCache(ttl=60, max_entries=2, max_bytes=1024)
+
+    cache.set('a', response(), tags=(), version=0)
+    cache.set('b', response(), tags=(), version=0)
+    cache.get('a')
+    cache.set('c', response(), tags=(), version=0)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_evicts_over_max_bytes():
+    cache = MemoryResponseCache(ttl=60, max_entries=10, max_bytes=64)
+
+    cache.set('a', response(b'x' * 30), tags=(), version=0)
+    cache.set('b', response(b'x' * 30), tags=(), version=0)
+
+    assert cache.get('a') is None
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_does_not_store_response_bigger_than_cache():
+    cache = MemoryResponseCache(ttl=60, max_entries=10, max_bytes=16)
+
+    cache.set('a', response(b'x' * 30), tags=(), version=0)
+
+    assert cache.stats()['entries'] == 0
+
+
+def test_invalidate_removes_only_tagged_entries():
+    cache = MemoryResponseCache(ttl=60, max_entries=10, max_bytes=1024)
+
+    cache.set('todos:1?page=1', response(), tags=('todos:1',), version=0)
+    cache.set('todos:1?page=2', response(), tags=('todos:1',), version=0)
+    cache.set('todos:2?page=1', response(), tags=('todos:2',), version=0)
+
+    cache.invalidate('todos:1')
+
+    assert cache.get('todos:1?page=1') is None
+    assert cache.get('todos:1?page=2') is None
+    assert cache.get('todos:2?page=1') is not None
+    assert cache.stats()['invalidations'] == len(['page=1', 'page=2'])
+
+
+def test_evicted_keys_leave_no_tag_index():
+    cache = MemoryResponseCache(ttl=60, max_entries=1, max_bytes=1024)
+
+    cache.set('a', response(), tags=('t',), version=0)
+    cache.set('b', response(), tags=('u',), version=0)
+
+    assert 't' not in cache._keys_by_tag
+
+
+def test_set_skips_value_read_before_invalidation():
+    cache = MemoryResponseCache(ttl=60, max_entries=10, max_bytes=1024)
+
+    version = cache.version()
+    # a escrita termina enquanto a leitura ainda consultava o banco
+    cache.invalidate('todos:1')
+    cache.set('todos:1?page=1', response(), tags=('todos:1',), version=version)
+    cache.set('todos:2?page=1', response(), tags=('todos:2',), version=version)
+
+    assert cache.get('todos:1?page=1') is None
+    assert cache.get('todos:2?page=1') is not None
+    assert cache.stats()['stale_writes'] == 1
+
+
+def test_set_skips_when_invalidation_history_was_forgotten():
+    cache = MemoryResponseCache(ttl=60, max_entries=1, max_bytes=1024)
+
+    version = cache.version()
+    cache.invalidate('a')
+    cache.invalidate('b')
+
+    cache.set('c', response(), tags=('c',), version=version)
+
+    assert cache.get('c') is None
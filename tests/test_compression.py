@@ -0,0 +1,192 @@
+import gzip
+import zlib
+from http import HTTPStatus
+
+import pytest
+
+from fastapi_course.compression import (
+    CompressionMiddleware,
+    GzipCompressor,
+    compression_stats,
+    negotiate,
+)
+from tests.conftest import TodoFactory
+
+GZIP_ONLY = {'gzip': (GzipCompressor, 6)}
+MINIMUM_SIZE = 100
+LARGE_PAGE = 20
+
+
+@pytest.mark.parametrize(
+    ('accept_encoding', 'expected'),
+    [
+        ('gzip, deflate', 'gzip'),
+        ('GZIP', 'gzip'),
+        ('deflate, gzip;q=0.5', 'gzip'),
+        ('gzip;q=0', None),
+        ('*', 'gzip'),
+        ('*, gzip;q=0', None),
+        ('identity', None),
+        ('', None),
+        ('gzip;q=abc', None),
+    ],
+)
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding, GZIP_ONLY) == expected
+
+
+def test_negotiate_prefers_highest_weight():
+    encodings = {'br': None, 'gzip': None}
+
+    assert negotiate('gzip, br', encodings) == 'br'
+    assert negotiate('gzip, br;q=0.5', encodings) == 'gzip'
+
+
+def streaming_app(chunks, content_type='application/x-ndjson'):
+    async def app(scope, receive, send):
+        await send({
+            'type': 'http.response.start',
+            'status': HTTPStatus.OK,
+            'headers': [(b'content-type', content_type.encode())],
+        })
+        for index, chunk in enumerate(chunks):
+            await send({
+                'type': 'http.response.body',
+                'body': chunk,
+                'more_body': index < len(chunks) - 1,
+            })
+
+    return app
+
+
+async def call(app, accept_encoding='gzip'):
+    middleware = CompressionMiddleware(
+        app, minimum_size=MINIMUM_SIZE, encodings=GZIP_ONLY
+    )
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():  # pragma: no cover - os apps não leem o corpo
+        return {'type': 'http.request'}
+
+    scope = {
+        'type': 'http',
+        'headers': [(b'accept-encoding', accept_encoding.encode())],
+    }
+    await middleware(scope, receive, send)
+
+    start, *bodies = messages
+    return dict(start['headers']), [body['body'] for body in bodies]
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_is_compressed_chunk_by_chunk():
+    chunks = [b'{"title": "todo %d"}\n' % i * 20 for i in range(5)]
+
+    headers, bodies = await call(streaming_app([*chunks, b'']))
+
+    assert headers[b'content-encoding'] == b'gzip'
+    assert b'content-length' not in headers
+    # cada pedaço sai com flush: o cliente já consegue descomprimir
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(bodies[0]) == chunks[0]
+    assert gzip.decompress(b''.join(bodies)) == b''.join(chunks)
+
+
+@pytest.mark.asyncio
+async def test_small_streaming_response_is_not_compressed():
+    headers, bodies = await call(streaming_app([b'a', b'b', b'']))
+
+    assert b'content-encoding' not in headers
+    assert bodies == [b'ab']
+
+
+@pytest.mark.asyncio
+async def test_incompressible_content_type_is_not_compressed():
+    chunks = [b'\x89PNG' * MINIMUM_SIZE]
+
+    headers, bodies = await call(streaming_app(chunks, 'image/png'))
+
+    assert b'content-encoding' not in headers
+    assert bodies == chunks
+
+
+@pytest.mark.asyncio
+async def test_large_todo_list_is_compressed(session, client, user, token):
+    session.add_all(
+        TodoFactory.create_batch(
+            LARGE_PAGE, user_id=user.id, description='long description ' * 20
+        )
+    )
+    await session.commit()
+    before = compression_stats.stats()
+
+    response = client.get(
+        f'/todos/?limit={LARGE_PAGE}',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Accept-Encoding': 'gzip',
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert len(response.json()['todos']) == LARGE_PAGE
+
+    stats = compression_stats.stats()
+    assert stats['compressed'] == before['compressed'] + 1
+    assert stats['saved_bytes'] > before['saved_bytes']
+    assert (
+        stats['by_encoding']['gzip']['bytes_out']
+        < (stats['by_encoding']['gzip']['bytes_in'])
+    )
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'content-encoding' not in response.headers
+    assert response.json() == {'message': 'Hello World'}
+
+
+def test_identity_is_not_compressed(client):
+    response = client.get(
+        '/exercicio-html', headers={'Accept-Encoding': 'identity'}
+    )
+
+    assert 'content-encoding' not in response.headers
+
+
+def test_compression_status(client):
+    response = client.get('/health/compression')
+
+    assert response.status_code == HTTPStatus.OK
+    assert 'gzip' in response.json()['encodings']
+
+
+@pytest.mark.asyncio
+async def test_export_is_compressed_while_streaming(
+    session, client, user, token
+):
+    session.add_all(
+        TodoFactory.create_batch(
+            LARGE_PAGE, user_id=user.id, description='long description ' * 20
+        )
+    )
+    await session.commit()
+
+    response = client.get(
+        '/todos/export',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Accept-Encoding': 'gzip',
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'content-length' not in response.headers
+    assert len(response.text.splitlines()) == LARGE_PAGE
@@ -0,0 +1,109 @@
+from http import HTTPStatus
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from fastapi_course import database
+from fastapi_course.database import TimedQueuePool, pool_status
+
+
+def test_ready(client, settings):
+    response = client.get('/health/ready')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['ready'] is True
+    assert response.json()['pool']['size'] == settings.DB_POOL_SIZE
+    assert response.json()['pool']['max_overflow'] == settings.DB_MAX_OVERFLOW
+
+
+@pytest.mark.asyncio
+async def test_pool_status_counts_checkouts(engine):
+    small_engine = create_async_engine(
+        engine.url, poolclass=TimedQueuePool, pool_size=1, max_overflow=0
+    )
+
+    async with small_engine.connect():
+        status = pool_status(small_engine)
+
+    assert status['checked_out'] == 1
+    assert status['exhausted'] is True
+    assert status['checkout_count'] == 1
+    assert status['checkout_wait_seconds_max'] >= 0
+
+    assert pool_status(small_engine)['exhausted'] is False
+    await small_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_pool_status_counts_checkout_timeouts(engine):
+    expected_checkouts = 2
+    pool_timeout = 0.1
+    small_engine = create_async_engine(
+        engine.url,
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=pool_timeout,
+    )
+
+    async with small_engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            await small_engine.connect().start()
+
+    status = pool_status(small_engine)
+    assert status['checkout_timeouts'] == 1
+    assert status['checkout_count'] == expected_checkouts
+    assert status['checkout_wait_seconds_max'] >= pool_timeout
+    await small_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_not_ready_when_pool_is_exhausted(client, engine, monkeypatch):
+    small_engine = create_async_engine(
+        engine.url, poolclass=TimedQueuePool, pool_size=1, max_overflow=0
+    )
+    monkeypatch.setattr(database, 'engine', small_engine)
+
+    async with small_engine.connect():
+        response = client.get('/health/ready')
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json()['ready'] is False
+    assert response.json()['pool']['checked_out'] == 1
+    await small_engine.dispose()
+
+
+def test_cache_status(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/todos/', headers=headers)
+    client.get('/todos/', headers=headers)
+
+    response = client.get('/health/cache')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['hits'] == 1
+    assert response.json()['entries'] == 1
+
+
+def test_throttling_status(client, token):
+    response = client.get('/health/throttling')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['enabled'] is True
+    assert response.json()['ip']['allowed'] == 1
+    assert response.json()['username']['allowed'] == 1
+    assert response.json()['username']['rejected'] == 0
+
+
+def test_token_cache_status(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/auth/refresh_token', headers=headers)
+    client.post('/auth/refresh_token', headers=headers)
+
+    response = client.get('/health/tokens')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['entries'] == 1
+    assert response.json()['misses'] == 1
+    assert response.json()['hits'] == 1
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from fastapi_course.maintenance import (
+    activity_drift,
+    backfill_todo_activity,
+    counter_drift,
+    parse_args,
+    prune_refresh_tokens,
+    repair_todo_counters,
+)
+from fastapi_course.models import (
+    RefreshToken,
+    TodoCounter,
+    TodoDailyActivity,
+    TodoState,
+)
+from fastapi_course.security import issue_refresh_token
+from tests.conftest import TodoFactory
+
+
+async def stored_counts(session, user_id: int):
+    counters = await session.execute(
+        select(TodoCounter.state, TodoCounter.count).where(
+            TodoCounter.user_id == user_id
+        )
+    )
+    return {state: count for state, count in counters if count}
+
+
+@pytest.mark.asyncio
+async def test_todo_counters_follow_writes_outside_the_api(session, user):
+    # os triggers valem para qualquer escrita em todos, não só as rotas
+    session.add_all(TodoFactory.create_batch(3, user_id=user.id, state='todo'))
+    await session.commit()
+
+    assert await stored_counts(session, user.id) == {TodoState.todo: 3}
+    assert (await session.execute(counter_drift())).all() == []
+
+
+@pytest.mark.asyncio
+async def test_repair_todo_counters_fixes_drift(session, user, other_user):
+    session.add_all([
+        *TodoFactory.create_batch(2, user_id=user.id, state='todo'),
+        TodoFactory(user_id=user.id, state='done'),
+        TodoFactory(user_id=other_user.id, state='doing'),
+    ])
+    await session.commit()
+
+    # contadores fora de sincronia: um errado, um apagado e um sobrando
+    await session.execute(
+        update(TodoCounter)
+        .where(TodoCounter.state == TodoState.todo)
+        .values(count=10)
+    )
+    await session.execute(
+        delete(TodoCounter).where(TodoCounter.state == TodoState.done)
+    )
+    session.add(TodoCounter(user_id=user.id, state=TodoState.trash, count=4))
+    await session.commit()
+
+    repaired = await repair_todo_counters(session, other_user.id)
+    assert repaired == []
+
+    repaired = await repair_todo_counters(session)
+
+    assert sorted(repaired) == sorted([
+        (user.id, TodoState.todo, 2),
+        (user.id, TodoState.done, 1),
+        (user.id, TodoState.trash, 0),
+    ])
+    assert await stored_counts(session, user.id) == {
+        TodoState.todo: 2,
+        TodoState.done: 1,
+    }
+    assert await stored_counts(session, other_user.id) == {TodoState.doing: 1}
+    assert await repair_todo_counters(session) == []
+
+
+@pytest.mark.asyncio
+async def test_backfill_todo_activity_builds_missing_history(session, user):
+    session.add_all([
+        *TodoFactory.create_batch(2, user_id=user.id, state='todo'),
+        TodoFactory(user_id=user.id, state='done'),
+    ])
+    await session.commit()
+    expected = (
+        await session.execute(
+            select(
+                TodoDailyActivity.user_id,
+                TodoDailyActivity.day,
+                TodoDailyActivity.created,
+                TodoDailyActivity.completed,
+            )
+        )
+    ).all()
+    assert [row[2:] for row in expected] == [(3, 1)]
+
+    # como ficaria uma base que já existia antes do rollup
+    await session.execute(delete(TodoDailyActivity))
+    await session.commit()
+
+    assert await backfill_todo_activity(session) == expected
+    assert (await session.execute(activity_drift())).all() == []
+    assert await backfill_todo_activity(session) == []
+
+
+@pytest.mark.asyncio
+async def test_prune_refresh_tokens_deletes_only_expired(session, user):
+    await issue_refresh_token(session, user.id)
+    await issue_refresh_token(session, user.id)
+    await session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == 1)
+        .values(expires_at=datetime(2020, 1, 1))
+    )
+    await session.commit()
+
+    assert await prune_refresh_tokens(session) == 1
+    assert (await session.scalars(select(RefreshToken.id))).all() == [2]
+
+
+def test_parse_args_repair_counters():
+    expected_user_id = 42
+    args = parse_args(['repair-counters', '--user-id', '42'])
+
+    assert args.command == 'repair-counters'
+    assert args.user_id == expected_user_id
+
+
+def test_parse_args_requires_a_command():
+    with pytest.raises(SystemExit):
+        parse_args([])
@@ -0,0 +1,104 @@
+from http import HTTPStatus
+
+from fastapi_course import metrics
+from fastapi_course.metrics import Histogram
+
+
+def sample(text: str, name: str):
+    # valor da primeira linha 'name value' do texto exposto
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('latency', 'Latency', ('route',), (0.1, 1))
+
+    histogram.observe(0.05, '/a')
+    histogram.observe(0.1, '/a')
+    histogram.observe(5, '/a')
+
+    assert list(histogram.collect()) == [
+        '# HELP latency Latency',
+        '# TYPE latency histogram',
+        'latency_bucket{route="/a",le="0.1"} 2',
+        'latency_bucket{route="/a",le="1"} 2',
+        'latency_bucket{route="/a",le="+Inf"} 3',
+        'latency_sum{route="/a"} 5.15',
+        'latency_count{route="/a"} 3',
+    ]
+
+
+def test_label_values_are_escaped():
+    histogram = Histogram('h', 'H', ('route',), ())
+
+    histogram.observe(1, 'a"b\\c')
+
+    assert 'h_count{route="a\\"b\\\\c"} 1' in list(histogram.collect())
+
+
+def test_metrics_record_route_template_and_db_statements(client, token, todo):
+    metrics.clear()
+
+    client.get(
+        f'/todos/?title={todo.title[:5]}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    client.delete(
+        f'/todos/{todo.id}', headers={'Authorization': f'Bearer {token}'}
+    )
+    response = client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/plain')
+
+    labels = 'method="DELETE",route="/todos/{todo_id}",status="200"'
+    assert (
+        sample(
+            response.text, f'http_request_duration_seconds_count{{{labels}}}'
+        )
+        == 1
+    )
+    # usuário autenticado + DELETE ... RETURNING
+    assert (
+        sample(response.text, f'http_request_db_statements_sum{{{labels}}}')
+        >= 1
+    )
+    assert sample(response.text, 'db_statements_total') >= 1
+    assert sample(response.text, 'http_requests_in_flight') == 1
+
+
+def test_unmatched_routes_share_one_label(client):
+    metrics.clear()
+    requests = 2
+
+    for path in range(requests):
+        client.get(f'/does-not-exist/{path}')
+    response = client.get('/metrics')
+
+    labels = 'method="GET",route="unmatched",status="404"'
+    assert (
+        sample(
+            response.text, f'http_request_duration_seconds_count{{{labels}}}'
+        )
+        == requests
+    )
+
+
+def test_metrics_record_password_hash_time(client, user):
+    metrics.clear()
+
+    client.post(
+        '/auth/login/',
+        data={'username': user.username, 'password': user.clean_password},
+    )
+    response = client.get('/metrics')
+
+    assert (
+        sample(
+            response.text,
+            'password_hash_duration_seconds_count{operation="verify_password"}',
+        )
+        == 1
+    )
@@ -0,0 +1,125 @@
+from http import HTTPStatus
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+
+from fastapi_course.models import TodoState
+from fastapi_course.pagination import encode_cursor
+from tests.conftest import TodoFactory
+
+# roda EXPLAIN em cada statement que os endpoints quentes mandam para o
+# banco. Com enable_seqscan = off o planner só escolhe Seq Scan quando não
+# existe nenhum índice que sirva; a outra saída dele é percorrer um índice
+# inteiro sem condição (Index Scan sem Index Cond), que custa o mesmo. As
+# duas coisas indicam que a query perdeu o caminho de acesso. A exceção é o
+# índice percorrido em ordem logo abaixo de um LIMIT (primeira página de
+# uma listagem), que para depois de poucas linhas
+
+HOT_REQUESTS = [
+    ('GET', '/todos/'),
+    ('GET', '/todos/?state=draft'),
+    ('GET', '/todos/?title=plan'),
+    ('GET', '/todos/?limit=5&cursor={cursor}'),
+    ('GET', '/todos/?state=done&limit=5&cursor={cursor}'),
+    ('GET', '/todos/search?q=plan'),
+    ('PATCH', '/todos/{todo_id}'),
+    ('DELETE', '/todos/{todo_id}'),
+    ('GET', '/users/'),
+    ('GET', '/users/{user_id}'),
+]
+
+
+@pytest_asyncio.fixture
+async def seeded_todo(session, user, other_user, engine):
+    for owner in (user, other_user):
+        session.add_all(TodoFactory.create_batch(150, user_id=owner.id))
+    todo = TodoFactory(user_id=user.id, title='plan', state=TodoState.draft)
+    session.add(todo)
+    await session.commit()
+
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql('ANALYZE')
+
+    return todo
+
+
+@pytest.fixture
+def explain_request(client, token, engine):
+    async def _explain_request(method, url):
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, *args):
+            statements.append((statement, parameters))
+
+        event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+        try:
+            response = client.request(
+                method,
+                url,
+                headers={'Authorization': f'Bearer {token}'},
+                json={'title': 'plan'} if method == 'PATCH' else None,
+            )
+        finally:
+            event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+
+        assert response.status_code == HTTPStatus.OK
+
+        plans = []
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql('SET enable_seqscan = off')
+
+            for statement, parameters in statements:
+                if (
+                    not statement
+                    .lstrip()
+                    .upper()
+                    .startswith((
+                        'SELECT',
+                        'UPDATE',
+                        'DELETE',
+                    ))
+                ):
+                    continue
+
+                result = await conn.exec_driver_sql(
+                    f'EXPLAIN (FORMAT JSON) {statement}', parameters
+                )
+                plans.append((statement, result.scalar()[0]['Plan']))
+
+        return plans
+
+    return _explain_request
+
+
+def _full_scans(plan, limited=False):
+    node_type = plan['Node Type']
+    full_index_scan = (
+        node_type in {'Index Scan', 'Index Only Scan'}
+        and 'Index Cond' not in plan
+        and not limited
+    )
+
+    if node_type == 'Seq Scan' or full_index_scan:
+        yield f'{node_type} on {plan["Relation Name"]}'
+
+    for child in plan.get('Plans', []):
+        yield from _full_scans(child, limited=node_type == 'Limit')
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(('method', 'url'), HOT_REQUESTS)
+async def test_hot_queries_do_not_seq_scan(
+    explain_request, seeded_todo, method, url
+):
+    url = url.format(
+        todo_id=seeded_todo.id,
+        user_id=seeded_todo.user_id,
+        cursor=encode_cursor(seeded_todo.created_at, seeded_todo.id),
+    )
+
+    plans = await explain_request(method, url)
+
+    assert plans
+    for statement, plan in plans:
+        assert not list(_full_scans(plan)), statement
@@ -0,0 +1,208 @@
+from http import HTTPStatus
+
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from testcontainers.postgres import PostgresContainer
+
+from fastapi_course.app import app
+from fastapi_course.cache import response_cache
+from fastapi_course.consistency import READ_PRIMARY_COOKIE
+from fastapi_course.database import (
+    RecentWrites,
+    get_read_session,
+    get_session,
+    recent_writes,
+)
+from fastapi_course.models import Todo, TodoState, User, table_registry
+
+# o primário é o banco da fixture engine; a "réplica" é um segundo banco com
+# dados diferentes, assim dá para saber de onde cada leitura veio
+
+
+@pytest.fixture(scope='session')
+def replica_engine():
+    with PostgresContainer('postgres:18', driver='psycopg') as postgres:
+        yield create_async_engine(postgres.get_connection_url())
+
+
+@pytest_asyncio.fixture
+async def replica_session(replica_engine):
+    async with replica_engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.create_all)
+
+    async with AsyncSession(replica_engine, expire_on_commit=False) as session:
+        yield session
+
+    async with replica_engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.drop_all)
+
+
+@pytest.fixture
+def replica_client(session, replica_session):
+    with TestClient(app) as client:
+        app.dependency_overrides[get_session] = lambda: session
+        app.dependency_overrides[get_read_session] = lambda: replica_session
+        yield client
+
+    app.dependency_overrides.clear()
+    recent_writes.clear()
+    response_cache.clear()
+
+
+def login(client, user):
+    # sem a fixture token: ela usa a fixture client, que sobrescreveria o
+    # override do get_read_session
+    response = client.post(
+        '/auth/login/',
+        data={'username': user.username, 'password': user.clean_password},
+    )
+    return {'Authorization': f'Bearer {response.json()["access_token"]}'}
+    return {'Authorization': f'Bearer {response.json()["access_token"]}'}
+
+
+async def seed_replica(replica_session, user):
+    await replica_session.execute(
+        insert(User).values(
+            id=user.id,
+            username='replica',
+            email='replica@test.com',
+            password=user.password,
+        )
+    )
+    await replica_session.execute(
+        insert(Todo).values(
+            title='from replica',
+            description='',
+            state=TodoState.todo,
+            user_id=user.id,
+        )
+    )
+    await replica_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_read_todos_uses_replica(replica_client, replica_session, user):
+    await seed_replica(replica_session, user)
+
+    response = replica_client.get(
+        '/todos/', headers=login(replica_client, user)
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [t['title'] for t in response.json()['todos']] == ['from replica']
+
+
+@pytest.mark.asyncio
+async def test_read_todos_sticks_to_primary_after_write(
+    replica_client, replica_session, user
+):
+    await seed_replica(replica_session, user)
+    headers = login(replica_client, user)
+
+    replica_client.post(
+        '/todos/',
+        headers=headers,
+        json={'title': 'from primary', 'description': '', 'state': 'todo'},
+    )
+    response = replica_client.get('/todos/', headers=headers)
+
+    assert [t['title'] for t in response.json()['todos']] == ['from primary']
+
+
+@pytest.mark.asyncio
+async def test_read_user_sticks_to_primary_after_update(
+    replica_client, replica_session, user
+):
+    await seed_replica(replica_session, user)
+    headers = login(replica_client, user)
+
+    response = replica_client.get(f'/users/{user.id}', headers=headers)
+    assert response.json()['username'] == 'replica'
+
+    response = replica_client.put(
+        f'/users/{user.id}',
+        headers=headers,
+        json={
+            'username': 'updated',
+            'email': 'updated@test.com',
+            'password': 'Updated@123',
+            'confirm_password': 'Updated@123',
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    # o token antigo aponta para o username anterior
+    user.username, user.clean_password = 'updated', 'Updated@123'
+    headers = login(replica_client, user)
+
+    response = replica_client.get(f'/users/{user.id}', headers=headers)
+    assert response.json()['username'] == 'updated'
+
+    # a listagem também foi marcada pela escrita
+    response = replica_client.get('/users/', headers=headers)
+    assert [u['username'] for u in response.json()['users']] == ['updated']
+
+
+@pytest.mark.asyncio
+async def test_write_cookie_pins_reads_on_any_worker(
+    replica_client, replica_session, user
+):
+    await seed_replica(replica_session, user)
+    headers = login(replica_client, user)
+
+    response = replica_client.post(
+        '/todos/',
+        headers=headers,
+        json={'title': 'from primary', 'description': '', 'state': 'todo'},
+    )
+    assert READ_PRIMARY_COOKIE in response.cookies
+
+    # outro worker não conhece a escrita, só o cookie
+    recent_writes.clear()
+    response = replica_client.get('/todos/', headers=headers)
+
+    assert [t['title'] for t in response.json()['todos']] == ['from primary']
+
+
+@pytest.mark.asyncio
+async def test_forged_write_cookie_is_ignored(
+    replica_client, replica_session, user
+):
+    await seed_replica(replica_session, user)
+    headers = login(replica_client, user)
+    replica_client.cookies.set(READ_PRIMARY_COOKIE, '99999999999999.forged')
+
+    response = replica_client.get('/todos/', headers=headers)
+
+    assert [t['title'] for t in response.json()['todos']] == ['from replica']
+
+
+def test_reads_do_not_set_write_cookie(client, token):
+    response = client.get(
+        '/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert READ_PRIMARY_COOKIE not in response.cookies
+
+
+def test_recent_writes_expire_after_window():
+    writes = RecentWrites(window=0)
+
+    writes.mark('todos:1')
+
+    assert 'todos:1' not in writes
+
+
+def test_recent_writes_keep_at_most_max_keys():
+    writes = RecentWrites(window=60, max_keys=2)
+
+    writes.mark('a')
+    writes.mark('b')
+    writes.mark('c')
+
+    assert 'a' not in writes
+    assert 'b' in writes
+    assert 'c' in writes
@@ -1,6 +1,22 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
 from jwt import decode
 
-from fastapi_course.security import create_access_token
+from fastapi_course import security
+from fastapi_course.models import User
+from fastapi_course.security import (
+    PasswordHashPool,
+    VerifiedTokenCache,
+    create_access_token,
+    get_password_hash_async,
+    token_cache,
+    verify_password_async,
+)
+from tests.conftest import TodoFactory
 
 
 def test_create_access_token(settings):
@@ -12,3 +28,208 @@ def test_create_access_token(settings):
 
     assert decoded['test'] == claim['test']
     assert 'exp' in decoded
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_does_not_load_todos(
+    session, client, user, token, count_queries
+):
+    session.add_all(TodoFactory.create_batch(50, user_id=user.id))
+    await session.commit()
+    # esvazia o mapa de identidade para o usuário ser carregado do zero
+    session.expunge_all()
+
+    with count_queries() as queries:
+        response = client.post(
+            '/auth/refresh_token', headers={'Authorization': f'Bearer {token}'}
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(queries) == 1
+    assert 'todos' not in queries[0]
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_query_count_is_fixed(
+    session, client, user, token, count_queries
+):
+    todo = TodoFactory(user_id=user.id)
+    session.add(todo)
+    await session.commit()
+    session.expunge_all()
+    # mede o caminho do banco, não o do cache de tokens
+    token_cache.clear()
+
+    with count_queries() as few_todos:
+        client.patch(
+            f'/todos/{todo.id}',
+            headers={'Authorization': f'Bearer {token}'},
+            json={'title': 'few'},
+        )
+
+    session.add_all(TodoFactory.create_batch(200, user_id=user.id))
+    await session.commit()
+    session.expunge_all()
+    token_cache.clear()
+
+    with count_queries() as many_todos:
+        client.patch(
+            f'/todos/{todo.id}',
+            headers={'Authorization': f'Bearer {token}'},
+            json={'title': 'many'},
+        )
+
+    assert len(few_todos) == len(many_todos)
+
+
+@pytest.mark.asyncio
+async def test_password_hash_async_roundtrip():
+    hashed = await get_password_hash_async('Test@123')
+
+    assert await verify_password_async('Test@123', hashed)
+    assert not await verify_password_async('wrong', hashed)
+
+
+@pytest.mark.asyncio
+async def test_password_hash_pool_rejects_when_saturated():
+    pool = PasswordHashPool(ThreadPoolExecutor(max_workers=1), max_pending=0)
+
+    with pytest.raises(HTTPException) as exc:
+        await pool.run(security.get_password_hash, 'Test@123')
+
+    assert exc.value.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert exc.value.headers == {'Retry-After': '1'}
+
+
+def test_login_returns_503_when_hash_pool_is_saturated(
+    client, user, monkeypatch
+):
+    monkeypatch.setattr(
+        security,
+        'password_hash_pool',
+        PasswordHashPool(ThreadPoolExecutor(max_workers=1), max_pending=0),
+    )
+
+    response = client.post(
+        '/auth/login/',
+        data={'username': user.username, 'password': user.clean_password},
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json() == {'detail': 'Server busy, try again later'}
+
+
+def test_token_cache_hit_skips_user_select(client, token, count_queries):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/auth/refresh_token', headers=headers)
+
+    with count_queries() as queries:
+        response = client.post('/auth/refresh_token', headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    assert queries == []
+    assert token_cache.stats()['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_token_cache_principal_is_persistent(
+    session, client, user, token
+):
+    # o PUT usa o principal do cache: a escrita precisa chegar ao banco
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/auth/refresh_token', headers=headers)
+    session.expunge_all()
+
+    response = client.put(
+        f'/users/{user.id}',
+        headers=headers,
+        json={
+            'username': 'renamed',
+            'email': 'renamed@example.com',
+            'password': 'Renamed@123',
+            'confirm_password': 'Renamed@123',
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert token_cache.stats()['hits'] == 1
+    session.expunge_all()
+    assert (await session.get(User, user.id)).username == 'renamed'
+
+
+def test_update_user_invalidates_cached_token(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/auth/refresh_token', headers=headers)
+
+    client.put(
+        f'/users/{user.id}',
+        headers=headers,
+        json={
+            'username': 'renamed',
+            'email': 'renamed@example.com',
+            'password': 'Renamed@123',
+            'confirm_password': 'Renamed@123',
+        },
+    )
+    # o token antigo ainda tem o sub do username anterior
+    response = client.post('/auth/refresh_token', headers=headers)
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert token_cache.stats()['invalidations'] == 1
+
+
+def test_delete_user_invalidates_cached_token(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/auth/refresh_token', headers=headers)
+
+    client.delete(f'/users/{user.id}', headers=headers)
+    response = client.post('/auth/refresh_token', headers=headers)
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert token_cache.stats()['entries'] == 0
+
+
+PRINCIPAL = {'id': 1, 'username': 'alice', 'email': 'alice@example.com'}
+
+
+def test_token_cache_expires_with_token_or_ttl(monkeypatch):
+    cache = VerifiedTokenCache(ttl=30, max_entries=10)
+    now = time.time()
+    cache.set('short', PRINCIPAL, now + 5, cache.version())
+    cache.set('long', PRINCIPAL, now + 3600, cache.version())
+    cache.set('expired', PRINCIPAL, now - 1, cache.version())
+
+    monotonic = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: monotonic + 10)
+    assert cache.get('short') is None
+    assert cache.get('long') == PRINCIPAL
+
+    monkeypatch.setattr(time, 'monotonic', lambda: monotonic + 31)
+    assert cache.get('long') is None
+    assert cache.get('expired') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = VerifiedTokenCache(ttl=30, max_entries=2)
+    exp = time.time() + 3600
+    cache.set('a', PRINCIPAL, exp, cache.version())
+    cache.set('b', {**PRINCIPAL, 'id': 2}, exp, cache.version())
+    cache.get('a')
+    cache.set('c', {**PRINCIPAL, 'id': 3}, exp, cache.version())
+
+    assert cache.get('b') is None
+    assert cache.get('a') == PRINCIPAL
+    assert cache.stats()['evictions'] == 1
+
+
+def test_token_cache_ignores_verification_older_than_invalidation():
+    cache = VerifiedTokenCache(ttl=30, max_entries=10)
+    exp = time.time() + 3600
+    version = cache.version()
+
+    # o usuário mudou enquanto o SELECT da verificação estava em andamento
+    cache.invalidate_user(PRINCIPAL['id'])
+    cache.set('token', PRINCIPAL, exp, version)
+
+    assert cache.get('token') is None
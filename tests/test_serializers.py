@@ -0,0 +1,50 @@
+from datetime import UTC, datetime
+
+from fastapi_course.models import TodoState
+from fastapi_course.schemas import TodoList, TodoPublic, UserList, UserPublic
+from fastapi_course.serializers import (
+    TODO_FIELDS,
+    USER_FIELDS,
+    FastJSONResponse,
+    todo_list_json,
+    user_list_json,
+)
+
+CREATED_AT = datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)
+UPDATED_AT = datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=UTC)
+
+
+def test_fields_follow_public_schemas():
+    assert list(TODO_FIELDS) == list(TodoPublic.model_fields)
+    assert list(USER_FIELDS) == list(UserPublic.model_fields)
+
+
+def test_todo_list_json_matches_pydantic():
+    rows = [
+        ('t1', 'with "quotes"', TodoState.doing, 1, CREATED_AT, UPDATED_AT),
+        ('título', 'descrição', TodoState.done, 2, CREATED_AT, CREATED_AT),
+    ]
+    expected = TodoList(
+        todos=[TodoPublic(**dict(zip(TODO_FIELDS, row))) for row in rows],
+        next_cursor='cursor',
+    )
+
+    assert todo_list_json(rows, 'cursor') == (
+        expected.model_dump_json().encode()
+    )
+
+
+def test_user_list_json_matches_pydantic():
+    rows = [(1, 'alice', 'alice@test.com'), (2, 'bob', 'bob@test.com')]
+    expected = UserList(
+        users=[UserPublic(**dict(zip(USER_FIELDS, row))) for row in rows]
+    )
+
+    assert user_list_json(rows) == expected.model_dump_json().encode()
+
+
+def test_fast_json_response_renders_compact_json():
+    response = FastJSONResponse({'at': CREATED_AT, 'state': TodoState.todo})
+
+    assert response.body == b'{"at":"2024-01-02T03:04:05Z","state":"todo"}'
+    assert response.media_type == 'application/json'
@@ -0,0 +1,137 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import httpx
+
+from fastapi_course.serve import parse_args
+
+
+def test_parse_args_defaults_to_one_worker_per_cpu(settings):
+    args = parse_args([])
+
+    assert args.workers == (settings.SERVER_WORKERS or os.cpu_count())
+    assert args.preload is settings.SERVER_PRELOAD
+    assert args.port == settings.SERVER_PORT
+
+
+def test_parse_args_overrides():
+    expected_workers = 3
+
+    args = parse_args(['--workers', '3', '--no-preload', '--port', '9000'])
+
+    assert args.workers == expected_workers
+    assert args.preload is False
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _serve(*args, pythonpath=None):
+    port = _free_port()
+    env = os.environ.copy()
+
+    if pythonpath:
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, [str(pythonpath), env.get('PYTHONPATH')])
+        )
+
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'fastapi_course.serve',
+            '--host',
+            '127.0.0.1',
+            '--port',
+            str(port),
+            *args,
+        ],
+        env=env,
+    )
+    return process, f'http://127.0.0.1:{port}'
+
+
+def _wait_ready(url):
+    deadline = time.monotonic() + 20
+    while True:
+        try:
+            return httpx.get(url)
+        except httpx.ConnectError:
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+
+
+def test_serve_multiple_workers_and_shutdown_gracefully():
+    process, url = _serve('--workers', '2')
+
+    try:
+        response = _wait_ready(f'{url}/')
+
+        assert response.status_code == HTTPStatus.OK
+    finally:
+        process.send_signal(signal.SIGTERM)
+        return_code = process.wait(timeout=20)
+
+    assert return_code == 0
+
+
+SLOW_APP = """
+import asyncio
+
+
+async def app(scope, receive, send):
+    if scope['type'] != 'http':
+        return
+
+    if scope['path'] == '/slow':
+        await asyncio.sleep(1.5)
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'done'})
+"""
+
+
+def test_serve_drains_in_flight_requests_on_sigterm(tmp_path):
+    (tmp_path / 'slow_app.py').write_text(SLOW_APP)
+    process, url = _serve(
+        '--workers', '2', '--app', 'slow_app:app', pythonpath=tmp_path
+    )
+
+    try:
+        _wait_ready(f'{url}/')
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            in_flight = executor.submit(httpx.get, f'{url}/slow', timeout=10)
+            # deixa a requisição chegar no worker antes do sinal
+            time.sleep(0.5)
+            process.send_signal(signal.SIGTERM)
+
+            response = in_flight.result()
+    finally:
+        return_code = process.wait(timeout=20)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.text == 'done'
+    assert return_code == 0
+
+
+def test_serve_gives_up_when_workers_crash_on_startup():
+    process, _ = _serve(
+        '--workers', '2', '--no-preload', '--app', 'missing_module:app'
+    )
+
+    try:
+        return_code = process.wait(timeout=30)
+    finally:
+        process.kill()
+
+    assert return_code != 0
@@ -0,0 +1,74 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
+
+from fastapi_course.throttling import LoginThrottle, MemoryTokenBuckets
+
+
+def test_token_bucket_refills_at_the_configured_rate():
+    buckets = MemoryTokenBuckets(burst=2, per_minute=6, max_keys=10)
+    seconds_per_token = 10
+
+    assert buckets.take('key', now=0) == 0
+    assert buckets.take('key', now=0) == 0
+    assert buckets.take('key', now=0) == seconds_per_token
+    assert buckets.take('key', now=5) == pytest.approx(5)
+    assert buckets.take('key', now=10) == 0
+    # outra chave tem o próprio balde
+    assert buckets.take('other', now=10) == 0
+
+    stats = buckets.stats()
+    assert (stats['allowed'], stats['rejected']) == (4, 2)
+
+
+def test_token_bucket_refill_is_capped_at_burst():
+    buckets = MemoryTokenBuckets(burst=1, per_minute=60, max_keys=10)
+
+    buckets.take('key', now=0)
+    assert buckets.take('key', now=3600) == 0
+    assert buckets.take('key', now=3600) > 0
+
+
+def test_token_buckets_evict_least_recently_used_keys():
+    max_keys = 2
+    buckets = MemoryTokenBuckets(burst=1, per_minute=1, max_keys=max_keys)
+
+    buckets.take('a', now=0)
+    buckets.take('b', now=0)
+    buckets.take('a', now=0)
+    buckets.take('c', now=0)
+
+    stats = buckets.stats()
+    assert stats['keys'] == max_keys
+    assert stats['evictions'] == 1
+    # 'b' foi descartada e volta com o balde cheio; 'a' continua vazia
+    assert buckets.take('b', now=0) == 0
+    assert buckets.take('c', now=0) > 0
+
+
+def test_login_throttle_rejects_with_retry_after():
+    throttle = LoginThrottle(
+        by_ip=MemoryTokenBuckets(burst=10, per_minute=60, max_keys=10),
+        by_username=MemoryTokenBuckets(burst=1, per_minute=2, max_keys=10),
+    )
+
+    throttle.check('1.2.3.4', 'alice')
+    throttle.check('1.2.3.4', 'bob')
+
+    with pytest.raises(HTTPException) as error:
+        throttle.check('5.6.7.8', 'alice')
+
+    assert error.value.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert error.value.headers == {'Retry-After': '30'}
+
+
+def test_login_throttle_disabled():
+    throttle = LoginThrottle(
+        by_ip=MemoryTokenBuckets(burst=0, per_minute=0, max_keys=10),
+        by_username=MemoryTokenBuckets(burst=0, per_minute=0, max_keys=10),
+        enabled=False,
+    )
+
+    throttle.check('1.2.3.4', 'alice')
+    assert throttle.stats()['ip']['allowed'] == 0
@@ -1,12 +1,23 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
 from http import HTTPStatus
 
 import pytest
+from sqlalchemy import select
 from sqlalchemy.exc import DataError
 
+from fastapi_course import importer
+from fastapi_course.cache import response_cache
+from fastapi_course.consistency import read_primary_cookie
+from fastapi_course.database import recent_writes
 from fastapi_course.models import Todo, TodoState, User
+from fastapi_course.schemas import DEFAULT_ACTIVITY_DAYS, MAX_ACTIVITY_DAYS
 from tests.conftest import TodoFactory
 
 
+@pytest.mark.query_budget(2)
 def test_create_todo(client, token, mock_db_time):
     with mock_db_time(model=Todo) as time:
         response = client.post(
@@ -30,6 +41,7 @@ def test_create_todo(client, token, mock_db_time):
         }
 
 
+@pytest.mark.query_budget(3)
 @pytest.mark.asyncio
 async def test_read_todos(mock_db_time, session, user, client, token):
     with mock_db_time(model=Todo) as time:
@@ -55,6 +67,7 @@ async def test_read_todos(mock_db_time, session, user, client, token):
         ]
 
 
+@pytest.mark.query_budget(3)
 @pytest.mark.asyncio
 async def test_list_todos_should_return_5_todos(session, client, user, token):
     expected_todos = 5
@@ -71,6 +84,7 @@ async def test_list_todos_should_return_5_todos(session, client, user, token):
     assert len(response.json()['todos']) == expected_todos
 
 
+@pytest.mark.query_budget(3)
 @pytest.mark.asyncio
 async def test_list_todos_should_return_2_todos(session, client, user, token):
     expected_todos = 2
@@ -88,6 +102,60 @@ async def test_list_todos_should_return_2_todos(session, client, user, token):
     assert len(response.json()['todos']) == expected_todos
 
 
+@pytest.mark.query_budget(3)
+@pytest.mark.asyncio
+async def test_list_todos_cursor_pagination(
+    session, client, user, token, mock_db_time
+):
+    # todas com o mesmo created_at: o id desempata a ordem do cursor
+    with mock_db_time(model=Todo):
+        todos = TodoFactory.create_batch(5, user_id=user.id)
+        session.add_all(todos)
+        await session.commit()
+
+    seen = []
+    url = '/todos/?limit=2'
+    while url:
+        response = client.get(
+            url, headers={'Authorization': f'Bearer {token}'}
+        )
+        assert response.status_code == HTTPStatus.OK
+
+        seen.extend(todo['id'] for todo in response.json()['todos'])
+        next_cursor = response.json()['next_cursor']
+        url = next_cursor and f'/todos/?limit=2&cursor={next_cursor}'
+
+    assert seen == sorted(todo.id for todo in todos)
+
+
+@pytest.mark.query_budget(2)
+def test_list_todos_invalid_cursor(client, token):
+    response = client.get(
+        '/todos/?cursor=not-a-cursor',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {'detail': 'Invalid cursor'}
+
+
+@pytest.mark.query_budget(3)
+@pytest.mark.asyncio
+async def test_list_todos_limit_is_capped(session, client, user, token):
+    max_page_size = 100
+    session.add_all(TodoFactory.create_batch(105, user_id=user.id))
+    await session.commit()
+
+    response = client.get(
+        '/todos/?limit=1000', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.json()['todos']) == max_page_size
+    assert response.json()['next_cursor'] is not None
+
+
+@pytest.mark.query_budget(3)
 @pytest.mark.asyncio
 async def test_list_todos_filter_title_should_return_5_todos(
     session, client, user, token
@@ -111,6 +179,7 @@ async def test_list_todos_filter_title_should_return_5_todos(
     assert len(response.json()['todos']) == expected_todos
 
 
+@pytest.mark.query_budget(3)
 @pytest.mark.asyncio
 async def test_list_todos_filter_description_should_return_5_todos(
     session, client, user, token
@@ -136,6 +205,7 @@ async def test_list_todos_filter_description_should_return_5_todos(
     assert len(response.json()['todos']) == expected_todos
 
 
+@pytest.mark.query_budget(3)
 @pytest.mark.asyncio
 async def test_list_todos_filter_state_should_return_5_todos(
     session, client, user, token
@@ -156,6 +226,7 @@ async def test_list_todos_filter_state_should_return_5_todos(
     assert len(response.json()['todos']) == expected_todos
 
 
+@pytest.mark.query_budget(2)
 def test_delete_todo_(client, token, todo):
     response = client.delete(
         f'/todos/{todo.id}', headers={'Authorization': f'Bearer {token}'}
@@ -165,6 +236,7 @@ def test_delete_todo_(client, token, todo):
     assert response.json() == {'message': 'Task has been deleted successfully'}
 
 
+@pytest.mark.query_budget(2)
 def test_delete_todo_error(client, token):
     response = client.delete(
         '/todos/100', headers={'Authorization': f'Bearer {token}'}
@@ -174,6 +246,7 @@ def test_delete_todo_error(client, token):
     assert response.json() == {'detail': 'Task not found'}
 
 
+@pytest.mark.query_budget(2)
 @pytest.mark.asyncio
 async def test_delete_other_user_todo(session, client, token, other_user):
     todo_other_user = TodoFactory(user_id=other_user.id)
@@ -189,6 +262,7 @@ async def test_delete_other_user_todo(session, client, token, other_user):
     assert response.json() == {'detail': 'Task not found'}
 
 
+@pytest.mark.query_budget(2)
 def test_patch_todo_error(client, token, todo):
     response = client.patch(
         f'/todos/{todo.id + 1}',
@@ -200,6 +274,7 @@ def test_patch_todo_error(client, token, todo):
     assert response.json() == {'detail': 'Task not found'}
 
 
+@pytest.mark.query_budget(2)
 def test_patch_todo_alter_title(client, todo, token):
     response = client.patch(
         f'/todos/{todo.id}',
@@ -211,6 +286,7 @@ def test_patch_todo_alter_title(client, todo, token):
     assert response.json()['title'] == 'New Title Test'
 
 
+@pytest.mark.query_budget(0)
 @pytest.mark.asyncio
 async def test_create_todo_error(session, user: User):
     todo = Todo(
@@ -226,6 +302,7 @@ async def test_create_todo_error(session, user: User):
         await session.commit()
 
 
+@pytest.mark.query_budget(1)
 def test_list_todos_title_min_lenght_error(client, token):
     tiny_string = 'a'
 
@@ -237,6 +314,7 @@ def test_list_todos_title_min_lenght_error(client, token):
     assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
 
 
+@pytest.mark.query_budget(1)
 def test_list_todos_title_max_lenght_error(client, token):
     large_string = 'a' * 31
 
@@ -246,3 +324,745 @@ def test_list_todos_title_max_lenght_error(client, token):
     )
 
     assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.query_budget(2)
+@pytest.mark.asyncio
+async def test_search_todos_ranks_title_matches_first(
+    session, client, user, token
+):
+    in_description = TodoFactory(
+        user_id=user.id, title='Groceries', description='buy milk and bread'
+    )
+    in_title = TodoFactory(
+        user_id=user.id, title='Milk the cows', description='farm chores'
+    )
+    session.add_all([
+        in_description,
+        in_title,
+        TodoFactory(user_id=user.id, title='Unrelated', description='none'),
+    ])
+    await session.commit()
+
+    response = client.get(
+        '/todos/search?q=milk', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    hits = response.json()['todos']
+    assert [hit['id'] for hit in hits] == [in_title.id, in_description.id]
+    assert hits[0]['rank'] > hits[1]['rank']
+    assert hits[0]['title_highlight'] == '<mark>Milk</mark> the cows'
+    assert '<mark>milk</mark>' in hits[1]['description_highlight']
+
+
+@pytest.mark.query_budget(2)
+@pytest.mark.asyncio
+async def test_search_todos_ignores_other_users_todos(
+    session, client, token, other_user
+):
+    session.add(
+        TodoFactory(user_id=other_user.id, title='secret', description='x')
+    )
+    await session.commit()
+
+    response = client.get(
+        '/todos/search?q=secret', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {'todos': []}
+
+
+@pytest.mark.query_budget(2)
+@pytest.mark.asyncio
+async def test_search_todos_filter_state(session, client, user, token):
+    expected_todos = 2
+
+    session.add_all(
+        TodoFactory.create_batch(
+            2, user_id=user.id, title='report', state=TodoState.done
+        )
+    )
+    session.add_all(
+        TodoFactory.create_batch(
+            3, user_id=user.id, title='report', state=TodoState.todo
+        )
+    )
+    await session.commit()
+
+    response = client.get(
+        '/todos/search?q=report&state=done',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.json()['todos']) == expected_todos
+
+
+@pytest.mark.query_budget(1)
+def test_search_todos_requires_query(client, token):
+    response = client.get(
+        '/todos/search?q=', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.query_budget(2)
+def test_create_todos_bulk(client, token):
+    response = client.post(
+        '/todos/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'todos': [
+                {'title': 'first', 'description': 'a', 'state': 'draft'},
+                {'title': 'second', 'description': 'b'},
+            ]
+        },
+    )
+
+    assert response.status_code == HTTPStatus.CREATED
+    results = response.json()['results']
+    assert [result['status'] for result in results] == [
+        HTTPStatus.CREATED,
+        HTTPStatus.CREATED,
+    ]
+    assert [result['todo']['title'] for result in results] == [
+        'first',
+        'second',
+    ]
+    assert results[1]['todo']['state'] == 'todo'
+    assert results[0]['id'] == results[0]['todo']['id']
+
+
+@pytest.mark.query_budget(1)
+def test_create_todos_bulk_limit(client, token):
+    response = client.post(
+        '/todos/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'todos': [{'title': 't', 'description': 'd'}] * 501},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.query_budget(2)
+@pytest.mark.asyncio
+async def test_update_todos_bulk(session, client, user, token, other_user):
+    mine = TodoFactory.create_batch(2, user_id=user.id, state=TodoState.todo)
+    not_mine = TodoFactory(user_id=other_user.id)
+    session.add_all([*mine, not_mine])
+    await session.commit()
+
+    response = client.patch(
+        '/todos/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'todos': [
+                {'id': mine[0].id, 'title': 'renamed'},
+                {'id': mine[1].id, 'state': 'done'},
+                {'id': not_mine.id, 'title': 'hijacked'},
+            ]
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    first, second, third = response.json()['results']
+    assert first['todo']['title'] == 'renamed'
+    assert first['todo']['description'] == mine[0].description
+    assert first['todo']['state'] == 'todo'
+    assert second['todo']['title'] == mine[1].title
+    assert second['todo']['state'] == 'done'
+    assert third == {
+        'id': not_mine.id,
+        'status': HTTPStatus.NOT_FOUND,
+        'detail': 'Task not found',
+        'todo': None,
+    }
+
+
+@pytest.mark.query_budget(1)
+def test_update_todos_bulk_duplicate_ids(client, token, todo):
+    response = client.patch(
+        '/todos/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'todos': [{'id': todo.id}, {'id': todo.id, 'title': 'x'}]},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {'detail': 'Duplicate todo ids'}
+
+
+@pytest.mark.query_budget(3)
+@pytest.mark.asyncio
+async def test_delete_todos_bulk(session, client, user, token, other_user):
+    mine = TodoFactory(user_id=user.id)
+    not_mine = TodoFactory(user_id=other_user.id)
+    session.add_all([mine, not_mine])
+    await session.commit()
+
+    response = client.request(
+        'DELETE',
+        '/todos/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ids': [mine.id, not_mine.id]},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [r['status'] for r in response.json()['results']] == [
+        HTTPStatus.OK,
+        HTTPStatus.NOT_FOUND,
+    ]
+
+    response = client.get(
+        '/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.json()['todos'] == []
+
+
+@pytest.mark.query_budget(2)
+def test_todo_writes_take_one_statement(client, token, todo, count_queries):
+    # a primeira escrita ainda verifica o token no banco (SELECT do
+    # usuário); as seguintes acham o principal no cache de tokens: sobra um
+    # único statement por escrita
+    expected_statements = (2, 1, 1)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    with count_queries() as created:
+        response = client.post(
+            '/todos/',
+            headers=headers,
+            json={'title': 't', 'description': 'd', 'state': 'draft'},
+        )
+    assert response.status_code == HTTPStatus.CREATED
+
+    with count_queries() as updated:
+        response = client.patch(
+            f'/todos/{todo.id}', headers=headers, json={'state': 'done'}
+        )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['state'] == 'done'
+
+    with count_queries() as deleted:
+        response = client.delete(f'/todos/{todo.id}', headers=headers)
+    assert response.status_code == HTTPStatus.OK
+
+    for statements, expected in zip(
+        (created, updated, deleted), expected_statements
+    ):
+        assert len(statements) == expected
+        assert 'RETURNING' in statements[-1]
+
+
+@pytest.mark.query_budget(3)
+def test_list_todos_etag_not_modified(client, token, todo, count_queries):
+    # no 304 sem cache de respostas: só o agregado do ETag (o usuário
+    # autenticado vem do cache de tokens)
+    expected_statements = 1
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.get('/todos/', headers=headers)
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"')
+    response_cache.clear()
+
+    with count_queries() as statements:
+        response = client.get(
+            '/todos/', headers={**headers, 'If-None-Match': etag}
+        )
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['ETag'] == etag
+    assert not response.content
+    assert len(statements) == expected_statements
+
+
+@pytest.mark.query_budget(3)
+def test_list_todos_etag_changes_on_write(client, token, todo):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get('/todos/', headers=headers).headers['ETag']
+
+    client.patch(f'/todos/{todo.id}', headers=headers, json={'title': 'new'})
+    response = client.get(
+        '/todos/', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+    etag = response.headers['ETag']
+
+    client.delete(f'/todos/{todo.id}', headers=headers)
+    response = client.get(
+        '/todos/', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['todos'] == []
+
+
+@pytest.mark.query_budget(3)
+def test_list_todos_etag_depends_on_filters(client, token, todo):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get('/todos/', headers=headers).headers['ETag']
+
+    response = client.get(
+        '/todos/?limit=1', headers={**headers, 'If-None-Match': etag}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+
+
+@pytest.mark.query_budget(3)
+def test_list_todos_served_from_cache(client, token, todo, count_queries):
+    # no hit nenhum statement: a resposta vem do cache de respostas e o
+    # usuário autenticado do cache de tokens
+    expected_statements = 0
+    headers = {'Authorization': f'Bearer {token}'}
+    first = client.get('/todos/', headers=headers)
+
+    with count_queries() as statements:
+        second = client.get('/todos/', headers=headers)
+
+    assert second.json() == first.json()
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert len(statements) == expected_statements
+
+
+@pytest.mark.query_budget(3)
+def test_todo_writes_invalidate_cached_lists(client, token, todo):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/todos/', headers=headers)
+
+    client.patch(f'/todos/{todo.id}', headers=headers, json={'title': 'new'})
+    response = client.get('/todos/', headers=headers)
+    assert response.json()['todos'][0]['title'] == 'new'
+
+    client.delete(f'/todos/{todo.id}', headers=headers)
+    response = client.get('/todos/', headers=headers)
+    assert response.json()['todos'] == []
+
+    client.post(
+        '/todos/',
+        headers=headers,
+        json={'title': 'created', 'description': 'd', 'state': 'draft'},
+    )
+    response = client.get('/todos/', headers=headers)
+    assert [t['title'] for t in response.json()['todos']] == ['created']
+
+
+@pytest.mark.query_budget(3)
+def test_empty_patch_is_not_a_write(client, token, todo):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/todos/', headers=headers)
+    invalidations = response_cache.stats()['invalidations']
+
+    response = client.patch(f'/todos/{todo.id}', headers=headers, json={})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['title'] == todo.title
+    assert f'todos:{todo.user_id}' not in recent_writes
+    assert response_cache.stats()['invalidations'] == invalidations
+
+
+@pytest.mark.query_budget(3)
+@pytest.mark.asyncio
+async def test_client_that_just_wrote_skips_response_cache(
+    session, client, token, todo
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/todos/', headers=headers)
+
+    # escrita atendida por outro worker: este cache não foi invalidado, mas
+    # o cliente volta com o cookie de read-your-writes
+    todo.title = 'written elsewhere'
+    await session.commit()
+    name, _, value = read_primary_cookie(5).split(';')[0].partition('=')
+    client.cookies.set(name, value)
+
+    response = client.get('/todos/', headers=headers)
+
+    assert response.json()['todos'][0]['title'] == 'written elsewhere'
+
+
+@pytest.mark.query_budget(2)
+@pytest.mark.asyncio
+async def test_export_todos_ndjson(session, client, user, token, other_user):
+    expected_todos = 3
+    session.add_all(TodoFactory.create_batch(expected_todos, user_id=user.id))
+    session.add(TodoFactory(user_id=other_user.id))
+    await session.commit()
+
+    response = client.get(
+        '/todos/export', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert response.headers['content-disposition'] == (
+        'attachment; filename="todos.ndjson"'
+    )
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == expected_todos
+    assert set(rows[0]) == {
+        'id',
+        'title',
+        'description',
+        'state',
+        'created_at',
+        'updated_at',
+    }
+    owned = {
+        todo.id
+        for todo in await session.scalars(
+            select(Todo).where(Todo.user_id == user.id)
+        )
+    }
+    assert {row['id'] for row in rows} == owned
+
+
+@pytest.mark.query_budget(2)
+@pytest.mark.asyncio
+async def test_export_todos_csv(session, client, user, token):
+    todo = TodoFactory(
+        user_id=user.id, title='a, "quoted"', state=TodoState.done
+    )
+    session.add(todo)
+    await session.commit()
+
+    response = client.get(
+        '/todos/export?format=csv',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'text/csv; charset=utf-8'
+    assert response.headers['content-disposition'] == (
+        'attachment; filename="todos.csv"'
+    )
+
+    header, row = csv.reader(io.StringIO(response.text))
+    assert header == [
+        'id',
+        'title',
+        'description',
+        'state',
+        'created_at',
+        'updated_at',
+    ]
+    assert row[:2] == [str(todo.id), 'a, "quoted"']
+    assert row[3] == 'done'
+
+
+@pytest.mark.query_budget(1)
+def test_export_todos_invalid_format(client, token):
+    response = client.get(
+        '/todos/export?format=xml',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_CONTENT
+
+
+@pytest.mark.query_budget(1)
+@pytest.mark.asyncio
+async def test_import_todos_ndjson_reports_rejected_lines(
+    session, client, user, token, monkeypatch
+):
+    # lotes pequenos para passar por mais de um COPY
+    monkeypatch.setattr(importer, 'IMPORT_CHUNK_SIZE', 2)
+    expected_imported = 3
+    expected_rejected = 2
+    lines = [
+        {'title': 'a', 'description': 'd', 'state': 'draft'},
+        {'title': 'b', 'description': 'd', 'state': 'done'},
+        {'title': 'c', 'description': 'd', 'state': 'unknown'},
+        {'title': 'd', 'description': 'd', 'state': 'todo'},
+    ]
+    body = '\n'.join(map(json.dumps, lines)) + '\n{not json}\n'
+
+    response = client.post(
+        '/todos/import',
+        headers={'Authorization': f'Bearer {token}'},
+        content=body,
+    )
+
+    assert response.status_code == HTTPStatus.CREATED
+    result = response.json()
+    assert result['imported'] == expected_imported
+    assert result['rejected'] == expected_rejected
+    assert [error['line'] for error in result['errors']] == [3, 5]
+    assert result['errors'][0]['detail'].startswith('state:')
+    assert result['rows_per_second'] > 0
+
+    titles = await session.scalars(
+        select(Todo.title).where(Todo.user_id == user.id).order_by(Todo.id)
+    )
+    assert titles.all() == ['a', 'b', 'd']
+
+
+@pytest.mark.query_budget(1)
+@pytest.mark.asyncio
+async def test_import_todos_csv(session, client, user, token):
+    expected_imported = 2
+    body = (
+        'title,description,state\r\n'
+        'first,"multi\nline, with comma",todo\r\n'
+        'too,many,columns,here\r\n'
+        '"say ""hi""",d,doing\r\n'
+    )
+
+    response = client.post(
+        '/todos/import?format=csv',
+        headers={'Authorization': f'Bearer {token}'},
+        content=body,
+    )
+
+    assert response.status_code == HTTPStatus.CREATED
+    assert response.json()['imported'] == expected_imported
+    assert response.json()['errors'] == [
+        {'line': 4, 'detail': 'Wrong number of columns'}
+    ]
+
+    todos = await session.scalars(
+        select(Todo).where(Todo.user_id == user.id).order_by(Todo.id)
+    )
+    assert [(t.title, t.description) for t in todos] == [
+        ('first', 'multi\nline, with comma'),
+        ('say "hi"', 'd'),
+    ]
+
+
+@pytest.mark.query_budget(1)
+def test_import_todos_invalid_format(client, token):
+    response = client.post(
+        '/todos/import?format=xml',
+        headers={'Authorization': f'Bearer {token}'},
+        content='',
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_CONTENT
+
+
+@pytest.mark.query_budget(2)
+def test_import_round_trips_export(client, token, todo):
+    headers = {'Authorization': f'Bearer {token}'}
+    exported = client.get('/todos/export?format=csv', headers=headers)
+
+    response = client.post(
+        '/todos/import?format=csv', headers=headers, content=exported.content
+    )
+
+    assert response.json()['imported'] == 1
+    assert response.json()['rejected'] == 0
+
+
+@pytest.mark.query_budget(3)
+def test_query_budget_lists_offending_statements(client, token, count_queries):
+    expected_statements = 3
+
+    with (
+        pytest.raises(pytest.fail.Exception) as failure,
+        count_queries(budget=1),
+    ):
+        client.get('/todos/', headers={'Authorization': f'Bearer {token}'})
+
+    message = str(failure.value)
+    assert f'{expected_statements} SQL statements, budget is 1' in message
+    assert '  1. SELECT users.' in message
+    assert f'  {expected_statements}. SELECT todos.' in message
+
+
+@pytest.mark.query_budget(2)
+def test_todo_stats_follow_every_write_path(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def stats():
+        response = client.get('/todos/stats', headers=headers)
+        assert response.status_code == HTTPStatus.OK
+        return response.json()
+
+    assert stats() == {
+        'counts': dict.fromkeys(TodoState, 0),
+        'total': 0,
+    }
+
+    created = client.post(
+        '/todos/', headers=headers, json={'title': 't', 'description': 'd'}
+    ).json()
+    bulk = client.post(
+        '/todos/bulk',
+        headers=headers,
+        json={
+            'todos': [
+                {'title': 'a', 'description': 'd', 'state': 'doing'},
+                {'title': 'b', 'description': 'd', 'state': 'doing'},
+                {'title': 'c', 'description': 'd', 'state': 'draft'},
+            ]
+        },
+    ).json()
+    doing_ids = [result['id'] for result in bulk['results'][:2]]
+    client.post(
+        '/todos/import',
+        headers=headers,
+        content=json.dumps({'title': 'i', 'description': 'd'}),
+    )
+    assert stats()['counts'] == {
+        'draft': 1,
+        'todo': 2,
+        'doing': 2,
+        'done': 0,
+        'trash': 0,
+    }
+
+    client.patch(
+        f'/todos/{created["id"]}', headers=headers, json={'state': 'done'}
+    )
+    client.patch(
+        '/todos/bulk',
+        headers=headers,
+        json={
+            'todos': [
+                {'id': todo_id, 'state': 'done'} for todo_id in doing_ids
+            ]
+        },
+    )
+    # mudar só o título não mexe nos contadores
+    client.patch(
+        f'/todos/{created["id"]}', headers=headers, json={'title': 'new'}
+    )
+    assert stats()['counts'] == {
+        'draft': 1,
+        'todo': 1,
+        'doing': 0,
+        'done': 3,
+        'trash': 0,
+    }
+
+    client.delete(f'/todos/{created["id"]}', headers=headers)
+    client.request(
+        'DELETE', '/todos/bulk', headers=headers, json={'ids': doing_ids}
+    )
+    assert stats() == {
+        'counts': {
+            'draft': 1,
+            'todo': 1,
+            'doing': 0,
+            'done': 0,
+            'trash': 0,
+        },
+        'total': 2,
+    }
+
+
+@pytest.mark.query_budget(2)
+@pytest.mark.asyncio
+async def test_todo_stats_read_only_the_counters(
+    session, client, user, token, count_queries
+):
+    todos_count = 30
+    session.add_all(
+        TodoFactory.create_batch(
+            todos_count, user_id=user.id, state=TodoState.todo
+        )
+    )
+    await session.commit()
+
+    with count_queries() as statements:
+        response = client.get(
+            '/todos/stats', headers={'Authorization': f'Bearer {token}'}
+        )
+
+    assert response.json()['counts']['todo'] == todos_count
+    assert response.json()['counts']['done'] == 0
+    assert response.json()['total'] == todos_count
+    assert 'FROM todo_counters' in statements[-1]
+    assert 'todos' not in statements[-1].replace('todo_counters', '')
+
+
+@pytest.mark.query_budget(2)
+def test_todo_activity_by_day(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    created = [
+        client.post(
+            '/todos/', headers=headers, json={'title': t, 'description': 'd'}
+        ).json()
+        for t in ('a', 'b')
+    ]
+    done = client.patch(
+        f'/todos/{created[0]["id"]}', headers=headers, json={'state': 'done'}
+    ).json()
+    created_day = date.fromisoformat(created[1]['created_at'][:10])
+    done_day = date.fromisoformat(done['updated_at'][:10])
+
+    response = client.get(
+        '/todos/activity',
+        headers=headers,
+        params={'from': str(created_day - timedelta(days=2))},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['granularity'] == 'day'
+    buckets = {
+        bucket['start']: (bucket['created'], bucket['completed'])
+        for bucket in response.json()['buckets']
+    }
+    assert buckets[str(created_day - timedelta(days=2))] == (0, 0)
+    assert buckets[str(created_day)][0] == len(created)
+    assert buckets[str(done_day)][1] == 1
+
+    response = client.get('/todos/activity', headers=headers)
+    assert len(response.json()['buckets']) == DEFAULT_ACTIVITY_DAYS
+
+
+@pytest.mark.query_budget(2)
+@pytest.mark.asyncio
+async def test_todo_activity_by_week(session, client, user, token):
+    # (created_at, updated_at, state); 2025-01-06 é uma segunda-feira
+    rows = [
+        (datetime(2025, 1, 5), datetime(2025, 1, 5), TodoState.todo),
+        (datetime(2025, 1, 6), datetime(2025, 1, 6), TodoState.draft),
+        (datetime(2025, 1, 8), datetime(2025, 1, 14), TodoState.done),
+        (datetime(2025, 3, 1), datetime(2025, 3, 1), TodoState.done),
+    ]
+    for created_at, updated_at, state in rows:
+        todo = TodoFactory(user_id=user.id, state=state)
+        todo.created_at = created_at
+        todo.updated_at = updated_at
+        session.add(todo)
+    await session.commit()
+
+    response = client.get(
+        '/todos/activity',
+        headers={'Authorization': f'Bearer {token}'},
+        params={
+            'from': '2025-01-01',
+            'to': '2025-01-15',
+            'granularity': 'week',
+        },
+    )
+
+    assert response.json() == {
+        'granularity': 'week',
+        'buckets': [
+            {'start': '2024-12-30', 'created': 1, 'completed': 0},
+            {'start': '2025-01-06', 'created': 2, 'completed': 0},
+            {'start': '2025-01-13', 'created': 0, 'completed': 1},
+        ],
+    }
+
+
+@pytest.mark.query_budget(1)
+def test_todo_activity_invalid_period(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    too_long = date(2025, 1, 1) + timedelta(days=MAX_ACTIVITY_DAYS)
+
+    for params in (
+        {'from': '2025-02-01', 'to': '2025-01-01'},
+        {'from': '2025-01-01', 'to': str(too_long)},
+        {'granularity': 'month'},
+    ):
+        response = client.get(
+            '/todos/activity', headers=headers, params=params
+        )
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_CONTENT
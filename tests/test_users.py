@@ -1,8 +1,11 @@
 from http import HTTPStatus
 
+import pytest
+
 from fastapi_course.schemas import UserPublic
 
 
+@pytest.mark.query_budget(2)
 def test_create_user(client):
     response = client.post(
         '/users/',
@@ -23,6 +26,7 @@ def test_create_user(client):
     }
 
 
+@pytest.mark.query_budget(0)
 def test_create_user_with_weak_password(client):
     response = client.post(
         '/users',
@@ -38,6 +42,7 @@ def test_create_user_with_weak_password(client):
     assert response.json() == {'detail': 'Weak password'}
 
 
+@pytest.mark.query_budget(0)
 def test_create_passwords_diff(client):
     response = client.post(
         '/users',
@@ -53,6 +58,7 @@ def test_create_passwords_diff(client):
     assert response.json() == {'detail': 'The passwords must be the same'}
 
 
+@pytest.mark.query_budget(2)
 def test_create_user_already_exists(client, user):
     response = client.post(
         '/users/',
@@ -68,6 +74,7 @@ def test_create_user_already_exists(client, user):
     assert response.json() == {'detail': 'Username or Email already exists'}
 
 
+@pytest.mark.query_budget(2)
 def test_read_users(client, user, token):
     user_schema = UserPublic.model_validate(user).model_dump()
 
@@ -77,9 +84,32 @@ def test_read_users(client, user, token):
 
     assert response.status_code == HTTPStatus.OK
 
-    assert response.json() == {'users': [user_schema]}
+    assert response.json() == {'users': [user_schema], 'next_cursor': None}
+
+
+@pytest.mark.query_budget(2)
+def test_read_users_with_cursor(client, user, other_user, token):
+    response = client.get(
+        '/users/?limit=1', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    first_page = response.json()
+    assert [u['id'] for u in first_page['users']] == [user.id]
+    assert first_page['next_cursor']
 
+    response = client.get(
+        f'/users/?limit=1&cursor={first_page["next_cursor"]}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
 
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'users': [UserPublic.model_validate(other_user).model_dump()],
+        'next_cursor': None,
+    }
+
+
+@pytest.mark.query_budget(2)
 def test_read_user_with_valid_id(client, user, token):
     user_schema = UserPublic.model_validate(user).model_dump()
 
@@ -92,6 +122,7 @@ def test_read_user_with_valid_id(client, user, token):
     assert response.json() == user_schema
 
 
+@pytest.mark.query_budget(2)
 def test_read_user_with_invalid_id(client, user, other_user, token):
     response = client.get(
         f'/users/{other_user.id + 1}',
@@ -102,6 +133,7 @@ def test_read_user_with_invalid_id(client, user, other_user, token):
     assert response.json() == {'detail': 'User not found'}
 
 
+@pytest.mark.query_budget(2)
 def test_update_user(client, user, token):
     response = client.put(
         f'/users/{user.id}',
@@ -121,6 +153,7 @@ def test_update_user(client, user, token):
     assert response.json() == user_schema
 
 
+@pytest.mark.query_budget(1)
 def test_update_user_password_diffs(client, user, token):
     response = client.put(
         f'/users/{user.id}',
@@ -139,6 +172,7 @@ def test_update_user_password_diffs(client, user, token):
 
 # o token gerado aqui é do user do conftest, logo, vai tem que dar erro ao
 # tentar atualizar o other_user
+@pytest.mark.query_budget(1)
 def test_update_user_with_wrong_user(client, other_user, token):
     response = client.put(
         f'/users/{other_user.id}',
@@ -155,6 +189,7 @@ def test_update_user_with_wrong_user(client, other_user, token):
     assert response.json() == {'detail': 'Not enough permissions'}
 
 
+@pytest.mark.query_budget(1)
 def test_update_user_weak_password(client, token, user):
     response = client.put(
         f'/users/{user.id}',
@@ -171,6 +206,7 @@ def test_update_user_weak_password(client, token, user):
     assert response.json() == {'detail': 'Weak password'}
 
 
+@pytest.mark.query_budget(2)
 def test_update_integrity_error(client, user, token, other_user):
     response = client.put(
         f'/users/{user.id}',
@@ -187,6 +223,7 @@ def test_update_integrity_error(client, user, token, other_user):
     response.json() == {'detail': 'Username or Email already exists'}
 
 
+@pytest.mark.query_budget(3)
 def test_delete_user(client, user, token):
     response = client.delete(
         f'/users/{user.id}', headers={'Authorization': f'Bearer {token}'}
@@ -196,6 +233,7 @@ def test_delete_user(client, user, token):
     assert response.json() == {'message': 'User deleted'}
 
 
+@pytest.mark.query_budget(2)
 def test_delete_another_user(client, other_user, token):
     response = client.delete(
         f'/users/{other_user.id}', headers={'Authorization': f'Bearer {token}'}
@@ -203,3 +241,54 @@ def test_delete_another_user(client, other_user, token):
 
     assert response.status_code == HTTPStatus.FORBIDDEN
     assert response.json() == {'detail': 'Not enough permissions'}
+
+
+@pytest.mark.query_budget(2)
+def test_read_user_etag(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get(f'/users/{user.id}', headers=headers).headers['ETag']
+
+    response = client.get(
+        f'/users/{user.id}', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['ETag'] == etag
+
+    client.put(
+        f'/users/{user.id}',
+        headers=headers,
+        json={
+            'username': user.username,
+            'email': 'changed@test.com',
+            'password': 'New@12345',
+            'confirm_password': 'New@12345',
+        },
+    )
+    response = client.get(
+        f'/users/{user.id}', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['email'] == 'changed@test.com'
+
+
+@pytest.mark.query_budget(2)
+def test_read_user_cache_invalidated_on_update(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get(f'/users/{user.id}', headers=headers)
+    client.get('/users/', headers=headers)
+
+    client.put(
+        f'/users/{user.id}',
+        headers=headers,
+        json={
+            'username': user.username,
+            'email': 'cached@test.com',
+            'password': 'New@12345',
+            'confirm_password': 'New@12345',
+        },
+    )
+
+    response = client.get(f'/users/{user.id}', headers=headers)
+    assert response.json()['email'] == 'cached@test.com'
+    response = client.get('/users/', headers=headers)
+    assert response.json()['users'][0]['email'] == 'cached@test.com'